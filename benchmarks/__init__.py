@@ -0,0 +1,16 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks to be ran with asv (airspeed velocity)
+
+See asv.conf.json at the top of the source tree.  E.g.
+
+    asv run master^!          # benchmark the tip of master
+    asv continuous master HEAD  # compare current state to master
+    asv publish && asv preview  # browse results across commits
+"""
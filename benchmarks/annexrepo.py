@@ -0,0 +1,98 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of AnnexRepo wrappers around git-annex commands
+
+Batched mode (a single long running annex process) is compared to running
+a new annex process per file.
+"""
+
+from os.path import join as opj
+
+from datalad.support.annexrepo import AnnexRepo
+
+from .common import mkdtemp, cache_path, create_files, create_annex, rmtree, HTTPServer
+
+_NFILES = [10, 100]
+
+
+class _AnnexRepos(object):
+    """Provides annex repositories with the number of files as a parameter"""
+
+    timeout = 600
+
+    def setup_cache(self):
+        # repositories are reused by all the benchmarks and repeats
+        paths = {}
+        for nfiles in _NFILES:
+            paths[nfiles] = cache_path('repo%d' % nfiles)
+            create_annex(paths[nfiles], nfiles)
+        return paths
+
+    def _setup_repo(self, paths, nfiles):
+        self.repo = AnnexRepo(paths[nfiles], create=False)
+        self.files = sorted(self.repo.get_indexed_files())[:nfiles]
+
+
+class AnnexInfo(_AnnexRepos):
+
+    params = (_NFILES, [False, True])
+    param_names = ['nfiles', 'batch']
+
+    def setup(self, paths, nfiles, batch):
+        self._setup_repo(paths, nfiles)
+
+    def teardown(self, paths, nfiles, batch):
+        self.repo.precommit()
+
+    def time_annex_info(self, paths, nfiles, batch):
+        for f in self.files:
+            self.repo.annex_info([f], batch=batch)
+        # batched processes get closed, so their startup is accounted for
+        self.repo.precommit()
+
+
+class AnnexLookupKey(_AnnexRepos):
+    """There is no batched lookupkey, so no batch parameter"""
+
+    params = _NFILES
+    param_names = ['nfiles']
+
+    def setup(self, paths, nfiles):
+        self._setup_repo(paths, nfiles)
+
+    def time_get_file_key(self, paths, nfiles):
+        for f in self.files:
+            self.repo.get_file_key(f)
+
+
+class AnnexAddurl(object):
+
+    params = ([10, 100], [False, True])
+    param_names = ['nfiles', 'batch']
+    number = 1
+    repeat = 3
+    timeout = 600
+
+    def setup(self, nfiles, batch):
+        self.topdir = mkdtemp()
+        self.files = create_files(opj(self.topdir, 'site'), nfiles)
+        self.server = HTTPServer(opj(self.topdir, 'site'))
+        self.url = self.server.start()
+        # a new repository for every repeat, so files are not yet known
+        self.repo = AnnexRepo(opj(self.topdir, 'repo'), create=True)
+
+    def teardown(self, nfiles, batch):
+        self.repo.precommit()
+        self.server.stop()
+        rmtree(self.topdir)
+
+    def time_addurl(self, nfiles, batch):
+        for f in self.files:
+            self.repo.annex_addurl_to_file(f, self.url + f, batch=batch)
+        self.repo.precommit()
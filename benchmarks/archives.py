@@ -0,0 +1,65 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of extraction of archives"""
+
+from os.path import join as opj
+
+from datalad.support.archives import compress_files
+from datalad.support.archives import decompress_file
+from datalad.support.archives import ExtractedArchive
+from datalad.utils import chpwd
+
+from .common import mkdtemp, cache_path, create_files, rmtree
+
+# number of files and their size
+_LAYOUTS = {
+    'few-large': (10, 1024 ** 2),
+    'many-small': (1000, 10 * 1024),
+}
+
+
+class Extraction(object):
+
+    params = (sorted(_LAYOUTS), ['tar.gz', 'zip'])
+    param_names = ['layout', 'format']
+    timeout = 600
+
+    def setup_cache(self):
+        archives = {}
+        for layout, (nfiles, size) in _LAYOUTS.items():
+            topdir = cache_path(layout)
+            create_files(opj(topdir, 'content'), nfiles, size=size)
+            for fmt in self.params[1]:
+                archive = opj(topdir, 'archive.' + fmt)
+                with chpwd(topdir):
+                    compress_files(['content'], archive)
+                archives[(layout, fmt)] = archive
+        return archives
+
+    def setup(self, archives, layout, format):
+        self.archive = archives[(layout, format)]
+        self.topdir = mkdtemp()
+        self._count = 0
+
+    def teardown(self, archives, layout, format):
+        rmtree(self.topdir)
+
+    def _get_path(self):
+        # a new directory for every call
+        self._count += 1
+        return opj(self.topdir, str(self._count))
+
+    def time_decompress_file(self, archives, layout, format):
+        decompress_file(self.archive, self._get_path())
+
+    def time_extracted_archive(self, archives, layout, format):
+        earchive = ExtractedArchive(self.archive, path=self._get_path())
+        earchive.assure_extracted()
+        list(earchive.get_extracted_files())
+        earchive.clean()
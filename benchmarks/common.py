@@ -0,0 +1,80 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Helpers shared by the benchmarks"""
+
+import multiprocessing
+import os
+import tempfile
+
+from os.path import join as opj
+
+from datalad.support.annexrepo import AnnexRepo
+from datalad.tests.utils import _multiproc_serve_path_via_http
+from datalad.utils import rmtree
+
+
+def mkdtemp():
+    return tempfile.mkdtemp(prefix='datalad_benchmark_')
+
+
+def cache_path(name):
+    """Return path for data created by setup_cache
+
+    asv runs setup_cache within a cache directory which it removes itself
+    once the benchmarks are done, so such data should not go into mkdtemp()
+    """
+    return opj(os.getcwd(), name)
+
+
+def create_files(path, n, size=10, prefix='file'):
+    """Create n files of size bytes under path, return their names"""
+    if not os.path.exists(path):
+        os.makedirs(path)
+    files = []
+    for i in range(n):
+        name = '%s%05d.dat' % (prefix, i)
+        with open(opj(path, name), 'wb') as f:
+            # content must differ, so files do not share a key in annex
+            f.write(('%d\n' % i).encode().ljust(size, b'x'))
+        files.append(name)
+    return files
+
+
+def create_annex(path, n, size=10):
+    """Create annex repository with n annexed files, return repo and files"""
+    repo = AnnexRepo(path, create=True)
+    files = create_files(path, n, size)
+    repo.annex_add(files)
+    repo.git_commit("Added %d files" % n)
+    return repo, files
+
+
+class HTTPServer(object):
+    """Serves a directory via http from a separate process"""
+
+    def __init__(self, path):
+        self.path = path
+        self._proc = None
+        self.url = None
+
+    def start(self):
+        queue = multiprocessing.Queue()
+        self._proc = multiprocessing.Process(
+            target=_multiproc_serve_path_via_http,
+            args=('127.0.0.1', self.path, queue))
+        self._proc.start()
+        self.url = 'http://127.0.0.1:%d/' % queue.get(timeout=60)
+        return self.url
+
+    def stop(self):
+        if self._proc is not None:
+            self._proc.terminate()
+            self._proc.join()
+            self._proc = None
+
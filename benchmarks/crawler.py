@@ -0,0 +1,40 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of the overhead of running crawler pipelines
+
+See also tools/time-pipeline
+"""
+
+from datalad.crawler.nodes.misc import range_node
+from datalad.crawler.pipeline import xrun_pipeline
+
+
+def passthrough(data):
+    yield data
+
+
+class Pipeline(object):
+
+    params = [1000, 100000]
+    param_names = ['nitems']
+
+    def setup(self, nitems):
+        self.outer = range_node(100, 'outer')
+        self.inner = range_node(max(1, nitems // 100), 'inner')
+
+    def time_flat(self, nitems):
+        for _ in xrun_pipeline([self.outer, self.inner] + [passthrough] * 5):
+            pass
+
+    def time_nested(self, nitems):
+        nested = [passthrough]
+        for i in range(5):
+            nested = [passthrough, nested]
+        for _ in xrun_pipeline([self.outer, self.inner, nested]):
+            pass
@@ -0,0 +1,39 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of downloads from a local http server"""
+
+from os.path import join as opj
+
+from datalad.downloaders.http import HTTPDownloader
+
+from .common import mkdtemp, create_files, rmtree, HTTPServer
+
+
+class HTTPDownload(object):
+
+    params = [1024, 10 * 1024 ** 2]
+    param_names = ['size']
+
+    def setup(self, size):
+        self.topdir = mkdtemp()
+        self.file = create_files(opj(self.topdir, 'site'), 1, size=size)[0]
+        self.server = HTTPServer(opj(self.topdir, 'site'))
+        self.url = self.server.start() + self.file
+        self.path = opj(self.topdir, 'downloaded')
+        self.downloader = HTTPDownloader()
+
+    def teardown(self, size):
+        self.server.stop()
+        rmtree(self.topdir)
+
+    def time_download(self, size):
+        self.downloader.download(self.url, self.path, overwrite=True)
+
+    def time_fetch(self, size):
+        self.downloader.fetch(self.url)
@@ -0,0 +1,68 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of listing of datasets"""
+
+from os.path import join as opj
+
+from datalad.api import ls
+from datalad.cmd import Runner
+from datalad.tests.utils_testrepos import NestedDataset
+from datalad.utils import swallow_outputs
+
+from .common import cache_path, create_annex
+
+
+def create_nested(path, nsubs, nfiles, depth=1):
+    """Create a dataset with nsubs subdatasets on every level down to depth"""
+    create_annex(path, nfiles)
+    if not depth:
+        return
+    runner = Runner(cwd=path)
+    for i in range(nsubs):
+        sub = 'sub%d' % i
+        create_nested(opj(path, sub), nsubs, nfiles, depth - 1)
+        runner.run(['git', 'submodule', 'add', './' + sub, sub],
+                   expect_stderr=True)
+    runner.run(['git', 'commit', '-m', 'Added subdatasets'])
+
+
+class LsRecursive(object):
+
+    params = [2, 5]
+    param_names = ['nsubs']
+    timeout = 600
+
+    def setup_cache(self):
+        paths = {}
+        for nsubs in self.params:
+            paths[nsubs] = cache_path('ds%d' % nsubs)
+            create_nested(paths[nsubs], nsubs, nfiles=10, depth=2)
+        return paths
+
+    def time_ls_recursive(self, paths, nsubs):
+        with swallow_outputs():
+            ls(paths[nsubs], recursive=True)
+
+
+class LsTestRepo(object):
+    """Listing of the nested test repository as used by the tests"""
+
+    def setup_cache(self):
+        path = cache_path('ds')
+        # copied from the template, built only once across the runs
+        NestedDataset(path).create()
+        return path
+
+    def time_ls_recursive(self, path):
+        with swallow_outputs():
+            ls(path, recursive=True)
+
+    def time_ls_recursive_all(self, path):
+        with swallow_outputs():
+            ls(path, recursive=True, all=True)
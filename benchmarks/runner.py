@@ -0,0 +1,35 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of the overhead of running external commands"""
+
+import subprocess
+import sys
+
+from datalad.cmd import Runner
+
+
+class RunnerRun(object):
+
+    params = [1, 10000]
+    param_names = ['nlines']
+
+    def setup(self, nlines):
+        self.runner = Runner()
+        self.cmd = [sys.executable, '-c',
+                    'for i in range(%d): print(i)' % nlines]
+
+    def time_subprocess(self, nlines):
+        # baseline to compare to
+        subprocess.check_output(self.cmd)
+
+    def time_run(self, nlines):
+        self.runner.run(self.cmd)
+
+    def time_run_log_online(self, nlines):
+        self.runner.run(self.cmd, log_online=True)
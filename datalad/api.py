@@ -8,45 +8,77 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 """Python DataLad API exposing user-oriented commands (also available via CLI)"""
 
-from importlib import import_module as _impmod
+import sys as _sys
+from types import ModuleType as _ModuleType
 
-from .interface.base import update_docstring_with_parameters as _update_docstring
 from .interface.base import get_interface_groups as _get_interface_groups
 from .interface.base import get_api_name as _get_api_name
-from .interface.base import alter_interface_docs_for_api \
-    as _alter_interface_docs_for_api
-from .distribution.dataset import Dataset
-
-# auto detect all available interfaces and generate a function-based
-# API from them
-
-for _grp_name, _grp_descr, _interfaces in _get_interface_groups():
-    for _intfspec in _interfaces:
-        # turn the interface spec into an instance
-        _mod = _impmod(_intfspec[0], package='datalad')
-        _intf = getattr(_mod, _intfspec[1])
-        _spec = getattr(_intf, '_params_', dict())
-
-        # FIXME no longer using an interface class instance
-        # convert the parameter SPEC into a docstring for the function
-        _update_docstring(_intf.__call__, _spec,
-                          prefix=_alter_interface_docs_for_api(
-                              _intf.__doc__),
-                          suffix=_alter_interface_docs_for_api(
-                              _intf.__call__.__doc__))
-        globals()[_get_api_name(_intfspec)] = _intf.__call__
-        # cleanup namespace
-        del _mod
-        del _intfspec
-        del _intf
-
-# be nice and clean up the namespace properly
-del _interfaces
-del _impmod
-del _get_interface_groups
-del _get_api_name
-del _grp_name
-del _grp_descr
-del _spec
-del _update_docstring
-del _alter_interface_docs_for_api
+
+
+def _load_interface_function(intfspec):
+    """Import an interface and provide its function-based API"""
+    from .interface.base import load_interface
+    from .interface.base import update_docstring_with_parameters
+    from .interface.base import alter_interface_docs_for_api
+    intf = load_interface(intfspec)
+    spec = getattr(intf, '_params_', dict())
+    # FIXME no longer using an interface class instance
+    # convert the parameter SPEC into a docstring for the function
+    update_docstring_with_parameters(
+        intf.__call__, spec,
+        prefix=alter_interface_docs_for_api(intf.__doc__),
+        suffix=alter_interface_docs_for_api(intf.__call__.__doc__))
+    return intf.__call__
+
+
+def _load_object(spec):
+    from importlib import import_module
+    return getattr(import_module(spec[0], package='datalad'), spec[1])
+
+
+class _LazyAPIModule(_ModuleType):
+    """Module which imports interfaces upon first access only
+
+    Importing all interfaces (and thus GitPython, requests, boto, ...) is
+    expensive, and most of the time only a single command is needed.
+    Every known interface is still listed by `dir()` and `__all__`.
+    """
+
+    # name: (loader, spec) for everything available upon access.
+    # Kept in the class so the module namespace stays clean
+    _lazy = {}
+
+    def __getattr__(self, name):
+        try:
+            loader, spec = self._lazy[name]
+        except KeyError:
+            raise AttributeError(
+                "module %r has no attribute %r" % (self.__name__, name))
+        obj = loader(spec)
+        setattr(self, name, obj)
+        return obj
+
+    def __dir__(self):
+        return sorted(set(self.__dict__).union(self._lazy))
+
+
+def _setup():
+    # auto detect all available interfaces and generate a function-based
+    # API from them
+    lazy = {'Dataset': (_load_object, ('datalad.distribution.dataset', 'Dataset'))}
+    for grp_name, grp_descr, interfaces in _get_interface_groups():
+        for intfspec in interfaces:
+            lazy[_get_api_name(intfspec)] = (_load_interface_function, intfspec)
+    _LazyAPIModule._lazy = lazy
+
+    module = _sys.modules[__name__]
+    lazy_module = _LazyAPIModule(__name__, __doc__)
+    for attr in ('__file__', '__package__', '__loader__', '__spec__'):
+        if hasattr(module, attr):
+            setattr(lazy_module, attr, getattr(module, attr))
+    lazy_module.__all__ = sorted(lazy)
+    # original module must stay alive since our helpers refer to its globals
+    _LazyAPIModule._module = module
+    _sys.modules[__name__] = lazy_module
+
+_setup()
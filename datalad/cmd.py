@@ -28,6 +28,8 @@ from .dochelpers import exc_str
 from .support.exceptions import CommandError
 from .support.protocol import NullProtocol, DryRunProtocol, \
     ExecutionTimeProtocol, ExecutionTimeExternalsProtocol
+from .support.protocol import get_trace_protocol
+from .support import profiling
 from .utils import on_windows
 from . import cfg
 
@@ -41,6 +43,38 @@ if PY2:
     # https://pypi.python.org/pypi/subprocess32/
     pass
 
+def get_protocol_name():
+    """Return name of the protocol to be used by default (cmd.protocol)
+
+    Could be specified via DATALAD_CMD_PROTOCOL environment variable or
+    cmd.protocol configuration: null, time, externals-time or trace
+    """
+    return os.environ.get('DATALAD_CMD_PROTOCOL') or \
+        cfg.get('cmd', 'protocol', default='null')
+
+
+def get_protocol_prefix():
+    """Return prefix for the files the protocols are written into"""
+    return os.environ.get('DATALAD_CMD_PROTOCOL_PREFIX') or \
+        cfg.get('cmd', 'protocol_prefix', default='protocol')
+
+
+def get_trace_filename():
+    """Return name of the JSON lines file to trace commands of this process into"""
+    return '%s-trace-%d.jsonl' % (get_protocol_prefix(), os.getpid())
+
+
+def get_default_trace_protocol():
+    """Return the TracingProtocol shared within the process if tracing is enabled
+
+    For the code which runs commands not through the Runner (e.g. persistent
+    processes of batched annex)
+    """
+    if get_protocol_name() == 'trace':
+        return get_trace_protocol(get_trace_filename())
+    return None
+
+
 class Runner(object):
     """Provides a wrapper for calling functions and commands.
 
@@ -74,20 +108,19 @@ class Runner(object):
         self.cwd = cwd
         self.env = env
         if protocol is None:
-            # TODO: config cmd.protocol = null
-            cfg = os.environ.get('DATALAD_CMD_PROTOCOL', 'null')
-            protocol = {
-                'externals-time': ExecutionTimeExternalsProtocol,
-                'time': ExecutionTimeProtocol,
-                'null': NullProtocol
-            }[cfg]()
-            if cfg != 'null':
+            protocol_name = get_protocol_name()
+            if protocol_name == 'trace':
+                # all runners of the process stream into the same file
+                protocol = get_trace_protocol(get_trace_filename())
+            else:
+                protocol = {
+                    'externals-time': ExecutionTimeExternalsProtocol,
+                    'time': ExecutionTimeProtocol,
+                    'null': NullProtocol
+                }[protocol_name]()
+            if protocol_name not in ('null', 'trace'):
                 # we need to dump it into a file at the end
-                # TODO: config cmd.protocol_prefix = protocol
-                filename = '%s-%s.log' % (
-                    os.environ.get('DATALAD_CMD_PROTOCOL_PREFIX', 'protocol'),
-                    id(self)
-                )
+                filename = '%s-%s.log' % (get_protocol_prefix(), id(self))
                 atexit.register(functools.partial(protocol.write_to_file, filename))
 
         self.protocol = protocol
@@ -165,7 +198,7 @@ class Runner(object):
 
     def run(self, cmd, log_stdout=True, log_stderr=True, log_online=False,
             expect_stderr=False, expect_fail=False,
-            cwd=None, env=None, shell=None):
+            cwd=None, env=None, shell=None, stdin=None):
         """Runs the command `cmd` using shell.
 
         In case of dry-mode `cmd` is just added to `commands` and it is
@@ -218,6 +251,10 @@ class Runner(object):
             Run command in a shell.  If not specified, then it runs in a shell
             only if command is specified as a string (not a list)
 
+        stdin: str or bytes, optional
+            Input to be fed to the command.  Output is then collected only
+            after command has finished, i.e. `log_online` has no effect
+
         Returns
         -------
         (stdout, stderr)
@@ -241,62 +278,77 @@ class Runner(object):
                 shell = isinstance(cmd, string_types)
 
             if self.protocol.records_ext_commands:
-                prot_exc = None
                 prot_id = self.protocol.start_section(
                     shlex.split(cmd, posix=not on_windows)
                     if isinstance(cmd, string_types)
                     else cmd)
 
+            prot_exc = None
             try:
-                proc = subprocess.Popen(cmd, stdout=outputstream,
-                                        stderr=errstream,
-                                        shell=shell,
-                                        cwd=cwd or self.cwd,
-                                        env=env or self.env)
+                try:
+                    proc = subprocess.Popen(cmd, stdout=outputstream,
+                                            stderr=errstream,
+                                            stdin=None if stdin is None
+                                            else subprocess.PIPE,
+                                            shell=shell,
+                                            cwd=cwd or self.cwd,
+                                            env=env or self.env)
+
+                except Exception as e:
+                    lgr.error("Failed to start %r%r: %s" %
+                              (cmd, " under %r" % cwd if cwd else '', exc_str(e)))
+                    raise
+
+                if stdin is not None:
+                    if not isinstance(stdin, binary_type):
+                        stdin = stdin.encode('utf-8')
+                    out = profiling.wait(cmd, proc.communicate, stdin)
+                elif log_online:
+                    out = profiling.wait(cmd, self._get_output_online,
+                                         proc, log_stdout, log_stderr,
+                                         expect_stderr=expect_stderr,
+                                         expect_fail=expect_fail)
+                else:
+                    out = profiling.wait(cmd, proc.communicate)
 
-            except Exception as e:
-                prot_exc = e
-                lgr.error("Failed to start %r%r: %s" %
-                          (cmd, " under %r" % cwd if cwd else '', exc_str(e)))
-                raise
+                status = proc.poll()
 
-            finally:
                 if self.protocol.records_ext_commands:
-                    self.protocol.end_section(prot_id, prot_exc)
-
-            if log_online:
-                out = self._get_output_online(proc, log_stdout, log_stderr,
-                                              expect_stderr=expect_stderr,
-                                              expect_fail=expect_fail)
-            else:
-                out = proc.communicate()
-
-            if PY3:
-                # Decoding was delayed to this point
-                def decode_if_not_None(x):
-                    return "" if x is None else binary_type.decode(x)
-                # TODO: check if we can avoid PY3 specific here
-                out = tuple(map(decode_if_not_None, out))
+                    self.protocol.add_details(
+                        prot_id, cwd=cwd or self.cwd, status=status,
+                        stdout=len(out[0] or ''), stderr=len(out[1] or ''))
+
+                if PY3:
+                    # Decoding was delayed to this point
+                    def decode_if_not_None(x):
+                        return "" if x is None else binary_type.decode(x)
+                    # TODO: check if we can avoid PY3 specific here
+                    out = tuple(map(decode_if_not_None, out))
+
+                # needs to be done after we know status
+                if not log_online:
+                    self._log_out(out[0])
+                    if status not in [0, None]:
+                        self._log_err(out[1], expected=expect_fail)
+                    else:
+                        # as directed
+                        self._log_err(out[1], expected=expect_stderr)
 
-            status = proc.poll()
-
-            # needs to be done after we know status
-            if not log_online:
-                self._log_out(out[0])
                 if status not in [0, None]:
-                    self._log_err(out[1], expected=expect_fail)
+                    msg = "Failed to run %r%s. Exit code=%d. out=%s err=%s" \
+                        % (cmd, " under %r" % (cwd or self.cwd), status, out[0], out[1])
+                    (lgr.debug if expect_fail else lgr.error)(msg)
+                    raise CommandError(str(cmd), msg, status, out[0], out[1])
                 else:
-                    # as directed
-                    self._log_err(out[1], expected=expect_stderr)
-
-            if status not in [0, None]:
-                msg = "Failed to run %r%s. Exit code=%d. out=%s err=%s" \
-                    % (cmd, " under %r" % (cwd or self.cwd), status, out[0], out[1])
-                (lgr.debug if expect_fail else lgr.error)(msg)
-                raise CommandError(str(cmd), msg, status, out[0], out[1])
-            else:
-                self.log("Finished running %r with status %s" % (cmd, status),
-                         level=8)
+                    self.log("Finished running %r with status %s" % (cmd, status),
+                             level=8)
+            except BaseException as e:
+                prot_exc = e
+                raise
+            finally:
+                # section gets closed whatever happens to the command
+                if self.protocol.records_ext_commands:
+                    self.protocol.end_section(prot_id, prot_exc)
 
         else:
             if self.protocol.records_ext_commands:
@@ -16,7 +16,6 @@ import logging
 import sys
 import os
 import textwrap
-from importlib import import_module
 
 import datalad
 from datalad.log import lgr
@@ -25,6 +24,7 @@ from datalad.cmdline import helpers
 from datalad.support.exceptions import InsufficientArgumentsError
 from ..utils import setup_exceptionhook, chpwd
 from ..dochelpers import exc_str
+from ..support.profiling import MODES as PROFILE_MODES
 
 def _license_info():
     return """\
@@ -50,10 +50,69 @@ THE SOFTWARE.
 """
 
 
-def setup_parser():
+def _get_requested_command(parser, args, cmd_names):
+    """Figure out which command (if any) is requested in `args`
+
+    Values of the global options (e.g. -C PATH) are skipped, so they are not
+    mistaken for a command.  Returns None if no known command was found.
+    """
+    args = iter(args)
+    for arg in args:
+        if arg in cmd_names:
+            return arg
+        if arg.startswith('-'):
+            action = parser._option_string_actions.get(arg)
+            if action is not None and action.dest in ('help', 'version'):
+                # global help needs to describe all the commands
+                return None
+            if action is not None and action.nargs != 0 and '=' not in arg:
+                # skip its value
+                next(args, None)
+            continue
+        # anything else is not a known command -- let argparse complain
+        return None
+    return None
+
+
+def _get_cmd_names():
+    from ..interface.base import get_interface_groups, get_cmdline_command_name
+    return [get_cmdline_command_name(_intfspec)
+            for _, _, _interfaces in get_interface_groups()
+            for _intfspec in _interfaces]
+
+
+def _expand_profile_arg(args, cmd_names):
+    """Provide the default mode to --profile given without a value
+
+    Only --profile preceding the command is the global option.  Those past
+    the command are options of the command (e.g. crawl --profile) and are
+    left intact
+    """
+    args = list(args)
+    for i, arg in enumerate(args):
+        if arg in cmd_names:
+            break
+        if arg == '--profile' and \
+                (i + 1 == len(args) or args[i + 1] not in PROFILE_MODES):
+            args[i] = '--profile=%s' % PROFILE_MODES[0]
+            break
+    return args
+
+
+def setup_parser(args=None):
+    """Setup the parser for the datalad command line
+
+    Parameters
+    ----------
+    args: list of str, optional
+      Command line arguments.  If provided and they request a specific
+      command, only the interface for that command gets imported and
+      only its subparser is set up, which makes startup considerably faster
+    """
     # Delay since can be a heavy import
     from ..interface.base import dedent_docstring, get_interface_groups, \
-        get_cmdline_command_name, alter_interface_docs_for_cmdline
+        get_cmdline_command_name, alter_interface_docs_for_cmdline, \
+        load_interface
     # setup cmdline args parser
     # main parser
     parser = argparse.ArgumentParser(
@@ -78,6 +137,15 @@ def setup_parser():
         parser.add_argument(
             '--dbg', action='store_true', dest='common_debug',
             help="do not catch exceptions and show exception traceback")
+    parser.add_argument(
+        '--profile', dest='common_profile', choices=PROFILE_MODES,
+        help="""profile the command and store the profile into
+        datalad-profile-<PID>.pstats (cprofile, the default) or, as collapsed
+        stacks for flame graphs, into datalad-profile-<PID>.collapsed
+        (sampling) under the temporary directory.  Prefix of the file could
+        be changed via DATALAD_PROFILE_PREFIX environment variable.  Use
+        DATALAD_PROFILE=cprofile|sampling environment variable to profile
+        the special remotes""")
     parser.add_argument(
         '-C', action='append', dest='change_path', metavar='PATH',
         help="""Run as if datalad was started in <path> instead
@@ -108,15 +176,25 @@ def setup_parser():
     # API from them
     grp_short_descriptions = []
     interface_groups = get_interface_groups()
+    # shell completion needs to know about all the commands
+    requested_cmd = None
+    if args is not None and '_ARGCOMPLETE' not in os.environ:
+        requested_cmd = _get_requested_command(
+            parser, args,
+            [get_cmdline_command_name(_intfspec)
+             for _, _, _interfaces in interface_groups
+             for _intfspec in _interfaces])
     for grp_name, grp_descr, _interfaces in interface_groups:
         # for all subcommand modules it can find
         cmd_short_descriptions = []
 
         for _intfspec in _interfaces:
-            # turn the interface spec into an instance
-            _mod = import_module(_intfspec[0], package='datalad')
-            _intf = getattr(_mod, _intfspec[1])
             cmd_name = get_cmdline_command_name(_intfspec)
+            if requested_cmd is not None and cmd_name != requested_cmd:
+                # no need to import and setup all other commands
+                continue
+            # turn the interface spec into an instance
+            _intf = load_interface(_intfspec)
             # deal with optional parser args
             if hasattr(_intf, 'parser_args'):
                 parser_args = _intf.parser_args
@@ -195,7 +273,9 @@ def setup_parser():
 
 def main(args=None):
     # PYTHON_ARGCOMPLETE_OK
-    parser = setup_parser()
+    args_ = _expand_profile_arg(sys.argv[1:] if args is None else args,
+                                _get_cmd_names())
+    parser = setup_parser(args_)
     try:
         import argcomplete
         argcomplete.autocomplete(parser)
@@ -203,11 +283,26 @@ def main(args=None):
         pass
 
     # parse cmd args
-    cmdlineargs = parser.parse_args(args)
+    cmdlineargs = parser.parse_args(args_)
     if not cmdlineargs.change_path is None:
         for path in cmdlineargs.change_path:
             chpwd(path)
 
+    profiler = None
+    if cmdlineargs.common_profile:
+        from ..support.profiling import Profiler
+        profiler = Profiler(cmdlineargs.common_profile)
+        profiler.start()
+    try:
+        _run(args, cmdlineargs)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.save()
+
+
+def _run(args, cmdlineargs):
+    """Run the command (and render its results) as given by parsed cmdlineargs"""
     ret = None
     if cmdlineargs.pbs_runner:
         from .helpers import run_via_pbs
@@ -64,6 +64,12 @@ class JsonBaseDB(object):
         self._assure_loaded()
         return self.__db
 
+    @property
+    def filepath(self):
+        """Path to the file the DB is stored in"""
+        self._assure_loaded()
+        return self._filepath
+
     def load(self):
         self._assure_loaded()
         with open(self._filepath) as f:
@@ -85,7 +91,7 @@ class JsonBaseDB(object):
         lgr.debug("Writing %s to %s" % (self.__class__.__name__, self._filepath))
         with open(self._filepath, 'w') as f:
             json.dump(db, f, indent=2, sort_keys=True, separators=(',', ': '))
-        self.repo.git_add(self._filepath)  # stage to be committed
+        self.repo.git_add(self._filepath, defer=True)  # stage to be committed
 
     @property
     def db_version(self):
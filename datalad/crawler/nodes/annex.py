@@ -14,6 +14,7 @@ via Annexificator class, which could be used to add files, checkout branches etc
 import os
 import time
 from os.path import expanduser, join as opj, exists, isabs, lexists, curdir, realpath
+from os.path import relpath
 from os.path import split as ops
 from os.path import isdir, islink
 from os import unlink, makedirs
@@ -43,6 +44,7 @@ from ...api import install
 from ...support.configparserinc import SafeConfigParserWithIncludes
 from ...support.gitrepo import GitRepo, _normalize_path
 from ...support.annexrepo import AnnexRepo
+from ...support.exceptions import CommandError
 from ...support.stats import ActivityStats
 from ...support.versions import get_versions
 from ...support.network import get_url_straight_filename, get_url_disposition_filename
@@ -466,9 +468,9 @@ class Annexificator(object):
     def _check_no_staged_changes_under_dir(self, dirpath, stats=None):
         """Helper to verify that we can "safely" remove a directory
         """
-        dirty_files = self._get_status()
-        dirty_files = sum(dirty_files, [])
         dirpath_normalized = _normalize_path(self.repo.path, dirpath)
+        dirty_files = self._get_status([dirpath_normalized])
+        dirty_files = sum(dirty_files, [])
         for dirty_file in dirty_files:
             if stats:
                 _call(stats.increment, 'removed')
@@ -499,10 +501,9 @@ class Annexificator(object):
                         # we have got a problem
                         # HANDLE THE SITUATION
                         # check if given file is not staged for a commit or dirty
-                        dirty_files = self._get_status()
-                        # it was a tuple of 3
-                        dirty_files = sum(dirty_files, [])
                         dirpath_normalized = _normalize_path(self.repo.path, dirpath)
+                        dirty_files = self._get_status([dirpath_normalized])
+                        dirty_files = sum(dirty_files, [])
                         if dirpath_normalized in dirty_files:
                             if self.auto_finalize:
                                 self.finalize()({'datalad_stats': stats})
@@ -718,35 +719,89 @@ class Annexificator(object):
         self.repo._git_custom_command(fpaths, ["git", "reset"])
 
     def _stage(self, fpaths):
-        self.repo.git_add(fpaths)
+        self.repo.git_add(fpaths, defer=True)
         # self.repo.cmd_call_wrapper.run(["git", "add"] + fpaths)
 
-    def _get_status(self):
-        """Custom check of status to see what files were staged, untracked etc
-        until
-        https://github.com/gitpython-developers/GitPython/issues/379#issuecomment-180101921
-        is resolved
+    def _get_status(self, paths=None):
+        """Return staged, notstaged, untracked and deleted files (under paths)
         """
-        #out, err = self.repo.cmd_call_wrapper.run(["git", "status", "--porcelain"])
-        out, err = self.repo._git_custom_command([], ["git", "status", "--porcelain"])
-        assert not err
-        staged, notstaged, untracked, deleted = [], [], [], []
-        for l in out.split('\n'):
+        return self.repo.get_status(paths)
+
+    def _get_index_entries(self, fpaths):
+        """Return {fpath: (mode, sha)} for the given files as staged in the index"""
+        if not fpaths:
+            return {}
+        fpaths = set(fpaths)
+        # list the whole index once instead of passing (possibly very many)
+        # paths on the command line
+        out, err = self.repo._git_custom_command(
+            [], ["git", "ls-files", "-s", "-z", "--full-name"])
+        entries = {}
+        for l in out.split('\0'):
             if not l:
                 continue
-            act = l[:2]  # first two characters is what is happening to the file
-            fname = l[3:]
-            try:
-                {'??': untracked,
-                 'A ': staged,
-                 'M ': staged,
-                 ' M': notstaged,
-                 ' D': deleted,
-                 }[act].append(fname)
-                # for the purpose of this use we don't even want MM or anything else
-            except KeyError:
-                raise RuntimeError("git status %r not yet supported. TODO" % act)
-        return staged, notstaged, untracked, deleted
+            info, fpath = l.split('\t', 1)
+            if fpath not in fpaths:
+                continue
+            mode, sha, stage = info.split(' ')
+            entries[fpath] = (mode, sha)
+        return entries
+
+    def _get_staged_deletions(self):
+        """Return files (relative to the top) which removal is staged"""
+        if self._get_head_commit() is None:
+            return []
+        out, err = self.repo._git_custom_command(
+            [], ["git", "diff", "--cached", "--name-only", "-z",
+                 "--diff-filter=D"])
+        return [f for f in out.split('\0') if f]
+
+    def _get_head_commit(self):
+        """Return hexsha of the HEAD commit or None if there is none yet"""
+        try:
+            out, err = self.repo._git_custom_command(
+                [], ["git", "rev-parse", "--verify", "-q", "HEAD"],
+                expect_fail=True)
+        except CommandError:
+            return None
+        return out.strip()
+
+    def _init_index(self, index_file, head, env):
+        """(Re)initialize index_file to correspond to the tree of the head commit"""
+        if lexists(index_file):
+            unlink(index_file)
+        if head:
+            self.repo._git_custom_command([], ["git", "read-tree", head], env=env)
+
+    def _commit_entries(self, entries, msg, parent, env, removed=()):
+        """Record entries into the index pointed by env and commit on top of parent
+
+        Files listed in `removed` get removed from the index.  Current branch
+        (HEAD) is then pointed to the new commit, which is returned.  Neither
+        the main index nor the work tree is modified.  Since no `git commit`
+        is run, commit hooks are not invoked
+        """
+        self._precommit()  # so that all batched annexes stop
+        if removed:
+            self.repo._git_custom_command(
+                [], ["git", "update-index", "-z", "--force-remove", "--stdin"],
+                env=env, stdin=''.join("%s\0" % f for f in removed))
+        if entries:
+            self.repo._git_custom_command(
+                [], ["git", "update-index", "-z", "--index-info"], env=env,
+                stdin=''.join("%s %s\t%s\0" % (mode, sha, fpath)
+                              for fpath, (mode, sha) in sorted(iteritems(entries))))
+        tree, err = self.repo._git_custom_command([], ["git", "write-tree"], env=env)
+        tree = tree.strip()
+        commit, err = self.repo._git_custom_command(
+            [], ["git", "commit-tree", tree]
+                + (["-p", parent] if parent else [])
+                + ["-m", msg])
+        commit = commit.strip()
+        self.repo._git_custom_command(
+            [], ["git", "update-ref", "-m", "commit: %s" % msg.split('\n', 1)[0], "HEAD", commit]
+                + ([parent] if parent else []))
+        return commit
 
     def commit_versions(self,
                         regex,
@@ -797,7 +852,11 @@ class Annexificator(object):
             if not dirs:
                 raise NotImplementedError("ATM matching will happen to dirnames as well")
 
-            versions = get_versions(staged, regex, **kwargs)
+            # removed files have no content to be versioned, and their removal
+            # gets committed along with the first version
+            removed = self._get_staged_deletions()
+            versions = get_versions([f for f in staged if f not in removed],
+                                    regex, **kwargs)
 
             if not versions:
                 # no versioned files were added, nothing to do really
@@ -852,53 +911,80 @@ class Annexificator(object):
                     yield d
                 return
 
-            # unstage all versioned files from the index
+            # Instead of unstaging all versioned files and then staging and
+            # committing them version by version, we build the tree of every
+            # version in a temporary index starting from HEAD and commit it
+            # directly.  Main index gets synchronized only at the end, and work
+            # tree is touched only to bring renamed files into the final state
+            entries = self._get_index_entries(staged)
+            versioned = set()
             nunstaged = 0
             for version, fpaths in iteritems(versions):
-                nfpaths = len(fpaths)
-                lgr.debug("Unstaging %d files for version %s", nfpaths, version)
-                nunstaged += nfpaths
-                _call(self._unstage, list(fpaths.values()))
+                versioned.update(fpaths.values())
+                nunstaged += len(fpaths)
+            # not versioned staged files go into the first commit
+            commit_entries = dict((f, e) for f, e in iteritems(entries)
+                                  if f not in versioned)
 
             stats = data.get('datalad_stats', None)
             stats_str = ('\n\n' + stats.as_str(mode='full')) if stats else ''
 
-            for iversion, (version, fpaths) in enumerate(iteritems(new_versions)):  # for all versions past previous
-                # stage/add files of that version to index
-                if rename:
-                    # we need to rename and create a new vfpaths
-                    vfpaths = []
+            index_file = opj(self.repo.repo.git_dir, 'index.datalad-versions')
+            env = dict(os.environ, GIT_INDEX_FILE=index_file)
+            head = self._get_head_commit()
+            _call(self._init_index, index_file, head, env)
+            renamed = {}  # fpath: vfpath of the last version it was committed from
+            try:
+                for iversion, (version, fpaths) in enumerate(iteritems(new_versions)):  # for all versions past previous
                     for fpath, vfpath in iteritems(fpaths):
-                        # ATM we do not allow unversioned -- should have failed earlier, if not HERE!
-                        # assert(not lexists(fpath))
-                        # nope!  it must be there from previous commit of a versioned file!
-                        # so rely on logic before
-                        lgr.debug("Renaming %s into %s" % (vfpath, fpath))
-                        os.rename(vfpath, fpath)
-                        vfpaths.append(fpath)
-                else:
-                    # so far we didn't bother about status, so just values would be sufficient
-                    vfpaths = list(fpaths.values())
-                nfpaths = len(vfpaths)
-                lgr.debug("Staging %d files for version %s", nfpaths, version)
-                nunstaged -= nfpaths
-                assert(nfpaths >= 0)
-                assert(nunstaged >= 0)
-                _call(self._stage, vfpaths)
-
-                # RF: with .finalize() to avoid code duplication etc
-                # ??? what to do about stats and states?  reset them or somehow tune/figure it out?
-                vmsg = "Multi-version commit #%d/%d: %s. Remaining unstaged: %d" % (iversion+1, nnew_versions, version, nunstaged)
+                        # ATM we do not allow unversioned -- should have failed earlier
+                        if rename:
+                            lgr.debug("Committing %s as %s" % (vfpath, fpath))
+                            commit_entries[fpath] = entries[vfpath]
+                            renamed[fpath] = vfpath
+                        else:
+                            commit_entries[vfpath] = entries[vfpath]
+                    nfpaths = len(fpaths)
+                    lgr.debug("Committing %d files for version %s", nfpaths, version)
+                    nunstaged -= nfpaths
+                    assert(nfpaths >= 0)
+                    assert(nunstaged >= 0)
 
-                if stats:
-                    _call(stats.reset)
+                    # RF: with .finalize() to avoid code duplication etc
+                    # ??? what to do about stats and states?  reset them or somehow tune/figure it out?
+                    vmsg = "Multi-version commit #%d/%d: %s. Remaining unstaged: %d" % (iversion+1, nnew_versions, version, nunstaged)
 
-                if version:
-                    _call(setattr, versions_db, 'version', version)
-                _call(self._commit, "%s (%s)%s" % (', '.join(self._states), vmsg, stats_str), options=[])
-                # unless we update data, no need to yield multiple times I guess
-                # but shouldn't hurt
-                yield data
+                    if stats:
+                        _call(stats.reset)
+
+                    if version:
+                        _call(setattr, versions_db, 'version', version)
+                        # which also staged updated DB in the main index
+                        commit_entries.update(self._get_index_entries(
+                            [relpath(versions_db.filepath, realpath(self.repo.path))]))
+                    head = _call(self._commit_entries, commit_entries,
+                                 "%s (%s)%s" % (', '.join(self._states), vmsg, stats_str),
+                                 head, env, removed)
+                    commit_entries = {}
+                    removed = []
+                    # unless we update data, no need to yield multiple times I guess
+                    # but shouldn't hurt
+                    yield data
+            finally:
+                if lexists(index_file):
+                    unlink(index_file)
+
+            if rename:
+                # only the last version of a file ends up in the work tree
+                for version, fpaths in iteritems(new_versions):
+                    for fpath, vfpath in iteritems(fpaths):
+                        if renamed[fpath] != vfpath:
+                            _call(unlink, opj(self.repo.path, vfpath))
+                for fpath, vfpath in iteritems(renamed):
+                    lgr.debug("Renaming %s into %s" % (vfpath, fpath))
+                    _call(os.rename, opj(self.repo.path, vfpath), opj(self.repo.path, fpath))
+            # so main index reflects the new HEAD (reusing stat info where possible)
+            _call(self.repo._git_custom_command, [], ["git", "read-tree", "-m", "HEAD"])
             assert(nunstaged == 0)  # we at the end committed all of them!
 
         return _commit_versions
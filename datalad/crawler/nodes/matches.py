@@ -19,6 +19,7 @@ from scrapy.selector import Selector
 from scrapy.http import Response
 
 from ...utils import updated
+from ..record import DataRecord
 from ...support.network import dlurljoin
 
 from logging import getLogger
@@ -40,7 +41,7 @@ class ExtractorMatch(object):
         self._csss = csss
         self._input = input
         self._output = output
-        self._pop_input = False
+        self._pop_input = pop_input
         self._min_count = min_count
         self._max_count = max_count
 
@@ -48,7 +49,16 @@ class ExtractorMatch(object):
         raise NotImplementedError
 
     def __call__(self, data):
-        input = data.pop(self._input) if self._pop_input else data[self._input]
+        if self._pop_input:
+            # input is not needed by anything down the stream, so do not pass it
+            # along, without modifying data which might be used elsewhere
+            if isinstance(data, DataRecord):
+                input, data = data.pop_input(self._input)
+            else:
+                data = data.copy()
+                input = data.pop(self._input)
+        else:
+            input = data[self._input]
 
         if isinstance(input, Response):
             selector = Selector(response=input)
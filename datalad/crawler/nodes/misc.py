@@ -10,6 +10,7 @@
 """
 
 import inspect
+import json
 import os
 import re
 
@@ -35,7 +36,8 @@ class Sink(object):
     """
 
     # TODO: add argument for selection of fields of data to keep
-    def __init__(self, keys=None, output=None, ignore_prefixes=['datalad_']):
+    def __init__(self, keys=None, output=None, ignore_prefixes=['datalad_'],
+                 spill=None):
         """
         Parameters
         ----------
@@ -46,14 +48,39 @@ class Sink(object):
           data
         ignore_prefixes : list, optional
           Keys with which prefixes to ignore.  By default all 'datalad_' ignored
+        spill : str, optional
+          Path to a file to store the data into (as JSON lines) instead of
+          keeping them in memory.  Values which are not JSON serializable get
+          stored as their str.  Data could be obtained via `iter_data`.
+          Cannot be used together with `output`
         """
+        if spill and output:
+            raise ValueError(
+                "output would keep all the sunk data in memory, so it cannot "
+                "be used with spill")
         self.data = []
         self.keys = keys
         self.output = output
         self.ignore_prefixes = ignore_prefixes or []
+        self.spill = spill
+        self._spill_file = None
+
+    def iter_data(self):
+        """Yield all collected data, either from memory or from the spill file"""
+        if not self.spill:
+            for data in self.data:
+                yield data
+            return
+        if self._spill_file is None:
+            # nothing was collected (yet)
+            return
+        self._spill_file.flush()
+        with open(self.spill) as f:
+            for line in f:
+                yield json.loads(line)
 
     def get_values(self, *keys):
-        return [[d[k] for k in keys] for d in self.data]
+        return [[d[k] for k in keys] for d in self.iter_data()]
 
     def __call__(self, data):
         # ??? for some reason didn't work when I made entire thing a list
@@ -63,7 +90,13 @@ class Sink(object):
             data_ = {k: v
                      for k, v in data.items()
                      if not any(k.startswith(p) for p in self.ignore_prefixes)}
-            self.data.append(data_)
+            if self.spill:
+                if self._spill_file is None:
+                    # anything left from previous runs is of no interest
+                    self._spill_file = open(self.spill, 'w')
+                self._spill_file.write(json.dumps(data_, default=str) + '\n')
+            else:
+                self.data.append(data_)
         if self.output:
             data = updated(data, {self.output: self.data})
         yield data
@@ -71,6 +104,11 @@ class Sink(object):
     def clean(self):
         """Clean out collected data"""
         self.data = []
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+        if self.spill and os.path.exists(self.spill):
+            os.unlink(self.spill)
 
 
 @auto_repr
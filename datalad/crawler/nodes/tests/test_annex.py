@@ -12,7 +12,7 @@ from datalad.tests.utils import with_tempfile, eq_, ok_, SkipTest
 
 from ..annex import initiate_handle
 from ..annex import Annexificator
-from ....tests.utils import assert_equal, assert_in
+from ....tests.utils import assert_equal, assert_in, assert_not_in
 from ....tests.utils import assert_raises
 from ....tests.utils import assert_true, assert_false
 from ....tests.utils import with_tree, serve_path_via_http
@@ -230,8 +230,58 @@ def test_add_dir_file(repo_path, p, topurl):
     list(annex.finalize()({}))  # so it gets committed
     ok_file_under_git(path1, annexed=True)
 
+@with_tree(tree={'README': 'r',
+                 'f_R1.0.dat': '1',
+                 'f_R1.1.dat': '11',
+                 'g_R1.1.dat': 'g'})
+def _test_commit_versions(rename, path):
+    annex = Annexificator(path=path)
+    annex.repo.git_add(['README', 'f_R1.0.dat', 'f_R1.1.dat', 'g_R1.1.dat'])
+    out = list(annex.commit_versions('_R(?P<version>\d+[\.\d]*)(?=[\._])',
+                                     rename=rename)({}))
+    eq_(len(out), 2)
+    # a commit per version, and work tree in agreement with the last one
+    ok_(not annex.repo.dirty)
+    commits = list(annex.repo.repo.iter_commits())
+    assert_in("Multi-version commit #1/2: 1.0", commits[1].message)
+    assert_in("Multi-version commit #2/2: 1.1", commits[0].message)
+    files1, files2 = [sorted(b.path for b in c.tree.traverse()
+                             if b.type == 'blob' and not b.path.startswith('.'))
+                      for c in commits[1::-1]]
+    if rename:
+        eq_(files1, ['README', 'f.dat'])
+        eq_(files2, ['README', 'f.dat', 'g.dat'])
+        ok_file_has_content(opj(path, 'f.dat'), '11')
+        assert_false(lexists(opj(path, 'f_R1.0.dat')))
+    else:
+        eq_(files1, ['README', 'f_R1.0.dat'])
+        eq_(files2, ['README', 'f_R1.0.dat', 'f_R1.1.dat', 'g_R1.1.dat'])
+
+
 def test_commit_versions():
-    raise SkipTest("TODO: is tested only as a part of test_openfmri.py")
+    for rename in True, False:
+        yield _test_commit_versions, rename
+
+
+@with_tree(tree={'README': 'r',
+                 'old.dat': 'o',
+                 'f_R1.0.dat': '1',
+                 'f_R1.1.dat': '11'})
+def test_commit_versions_with_removal(path):
+    annex = Annexificator(path=path)
+    annex.repo.git_add(['README', 'old.dat'])
+    annex.repo.git_commit("initial")
+    annex.repo.git_remove(['old.dat'])
+    annex.repo.git_add(['f_R1.0.dat', 'f_R1.1.dat'])
+    out = list(annex.commit_versions('_R(?P<version>\d+[\.\d]*)(?=[\._])')({}))
+    eq_(len(out), 2)
+    ok_(not annex.repo.dirty)
+    commits = list(annex.repo.repo.iter_commits())
+    # removal is committed along with the first version and stays removed
+    for c in commits[:2]:
+        assert_not_in('old.dat', [b.path for b in c.tree.traverse()])
+    assert_not_in('old.dat', annex.repo.get_indexed_files())
+    assert_false(lexists(opj(path, 'old.dat')))
 
 
 def test_remove_other_versions():
@@ -20,6 +20,7 @@ from ..misc import find_files
 from ..misc import switch
 from ..misc import assign
 from ..misc import rename
+from ..misc import Sink
 from ...pipeline import FinishPipeline
 from ....tests.utils import with_tree
 from ....utils import updated
@@ -30,6 +31,7 @@ from datalad.tests.utils import ok_generator
 from datalad.tests.utils import assert_in
 from datalad.tests.utils import assert_equal
 from datalad.tests.utils import assert_false
+from datalad.tests.utils import with_tempfile
 
 from nose.tools import eq_, assert_raises
 from nose import SkipTest
@@ -183,6 +185,25 @@ def test_find_files(d):
     assert_equal(list(ff({})), [])
 
 
+@with_tempfile
+def test_sink_spill(f):
+    assert_raises(ValueError, Sink, output='out', spill=f)
+    # leftovers of a previous run get overwritten
+    with open(f, 'w') as fp:
+        fp.write('{"a": 0}\n')
+    sink = Sink(spill=f)
+    eq_(list(sink.iter_data()), [])
+    out = list(sink({'a': 1, 'datalad_stats': 1, 'obj': object}))
+    eq_(out, [{'a': 1, 'datalad_stats': 1, 'obj': object}])
+    list(sink({'a': 2}))
+    eq_(sink.data, [])  # nothing kept in memory
+    eq_(list(sink.iter_data()), [{'a': 1, 'obj': str(object)}, {'a': 2}])
+    eq_(sink.get_values('a'), [[1], [2]])
+    sink.clean()
+    assert_false(os.path.exists(f))
+    eq_(list(sink.iter_data()), [])
+
+
 def test_switch():
     ran = []
 
@@ -11,7 +11,10 @@
 Pipeline is represented by a simple list or tuple of nodes or other nested pipelines.
 Each pipeline node is a callable which receives a dictionary (commonly named `data`),
 does some processing and yields (once or multiple times) a derived dictionary (commonly
-a shallow copy of original dict).  For a node to be parametrized it should be
+a shallow copy of original dict).  Pipeline runner passes `DataRecord`s, for which such
+copies share the items with the original, so they are cheap.  A node could also
+provide `drop_keys` attribute listing (large) items it has consumed, which are not needed
+by the subsequent nodes, so they get removed from its output.  For a node to be parametrized it should be
 implemented as a callable (i.e. define __call__) class, which could obtain parameters
 in its constructor.
 
@@ -43,6 +46,7 @@ provide informative logging.
 """
 
 import sys
+from collections import deque
 from glob import glob
 from os.path import dirname, join as opj, isabs, exists, curdir, basename
 from os import makedirs
@@ -55,11 +59,17 @@ from ..utils import parse_url_opts
 from ..dochelpers import exc_str
 from ..support.gitrepo import GitRepo
 from ..support.stats import ActivityStats
+from ..support.stats import StatsReporter
 from ..support.configparserinc import SafeConfigParserWithIncludes
+from .record import DataRecord
+from .timing import PipelineTimings
 
 from logging import getLogger
 lgr = getLogger('datalad.crawler.pipeline')
 
+# marker for stats of the data which were not looked up yet
+_UNKNOWN = object()
+
 # Name of the section in the config file which would define pipeline parameters
 CRAWLER_PIPELINE_SECTION = 'crawl:pipeline'
 CRAWLER_PIPELINE_SECTION_DEPRECATED = 'crawler'
@@ -101,19 +111,90 @@ def run_pipeline(*args, **kwargs):
 
     Byt default pipeline returns only its input (see PIPELINE_OPTS),
     so if no options for the pipeline were given to return additional
-    items, a `[{}]` will be provided as output
+    items, a `[{}]` will be provided as output.  See `consume_pipeline` for
+    the options and to not keep all the outputs in memory
     """
-    output = list(xrun_pipeline(*args, **kwargs))
-    if output:
-        if 'datalad_stats' in output[-1]:
-            stats = output[-1]['datalad_stats'].get_total()
-            stats_str = stats.as_str(mode='line')
-        else:
-            stats_str = 'no stats collected'
+    output = []
+    consume_pipeline(*args, sink=output.append, **kwargs)
+    return output if output else None
+
+
+def consume_pipeline(*args, **kwargs):
+    """Run pipeline consuming its outputs as they come
+
+    Unlike `run_pipeline`, outputs are not assembled into a list, so memory is
+    not occupied by all the outputs (e.g. with output='outputs') for the
+    duration of the run.
+
+    Parameters
+    ----------
+    sink : callable, optional
+      If provided, it gets called with every output of the pipeline.
+    timings : PipelineTimings, optional
+      To collect timings of the nodes into.  If not provided, but
+      crawl.profile configuration is set, timings get collected, reported
+      and, if crawl.profile output is specified, stored into that file
+      in crawl.profile format ('json' or 'chrome')
+    *args, **kwargs
+      Passed into `xrun_pipeline`.  If crawl.report interval configuration
+      is set, progress of the stats gets logged every that many seconds
+
+    Returns
+    -------
+    ActivityStats or None
+      Total stats of the last output, None if there were no stats
+    """
+    sink = kwargs.pop('sink', None)
+    timings = kwargs.get('timings', None)
+    report_timings = timings is None and cfg.getboolean('crawl', 'profile', default=False)
+    if report_timings:
+        timings_format = cfg.get('crawl', 'profile format', default='json')
+        timings = kwargs['timings'] = PipelineTimings(trace=timings_format == 'chrome')
+    reporter = _get_stats_reporter(args, kwargs)
+    last = None  # only the last output is kept
+    if reporter:
+        reporter.start()
+    try:
+        for last in xrun_pipeline(*args, **kwargs):
+            if sink is not None:
+                sink(last)
+    finally:
+        if reporter:
+            reporter.stop()
+    stats = last.get('datalad_stats', None) if last is not None else None
+    if stats is not None:
+        stats = stats.get_total()
+        stats_str = stats.as_str(mode='line')
+    elif last is not None:
+        stats_str = 'no stats collected'
     else:
         stats_str = "no output"
     lgr.info("Finished running pipeline: %s" % stats_str)
-    return output if output else None
+    if report_timings:
+        lgr.info("Timings of the pipeline nodes:\n%s", timings.as_str())
+        timings_output = cfg.get('crawl', 'profile output', default=None)
+        if timings_output:
+            timings.save(timings_output, format=timings_format)
+    return stats
+
+
+def _get_stats_reporter(args, kwargs):
+    """Return StatsReporter for the stats to be used by the pipeline if configured
+
+    If no stats were provided, they get initiated here (in kwargs) so we
+    could report on them
+    """
+    interval = float(cfg.get('crawl', 'report interval', default=0))
+    if not interval:
+        return None
+    data = kwargs.get('data', args[1] if len(args) > 1 else None) or {}
+    stats = data.get('datalad_stats', None) \
+        or kwargs.get('stats', args[2] if len(args) > 2 else None)
+    if stats is None:
+        if len(args) > 2:
+            return None
+        stats = kwargs['stats'] = ActivityStats()
+    return StatsReporter(stats, interval=interval, logger=lgr)
 
 
 def _get_pipeline_opts(pipeline):
@@ -128,165 +209,271 @@ def _get_pipeline_opts(pipeline):
     return opts, pipeline
 
 
-def xrun_pipeline(pipeline, data=None, stats=None, reset=True):
-    """Yield results from the pipeline.
+def compile_pipeline(pipeline):
+    """Compile pipeline definition into a `CompiledPipeline` ready to be ran
 
+    Options of the pipeline and of all its nested pipelines get validated
+    right away
     """
-    id_pipeline = "Pipe #%s" % id(pipeline)
-
-    def _log(msg, *args):
-        """Helper for uniform debug messages"""
-        lgr.log(5, "%s: " + msg, id_pipeline, *args)
+    return CompiledPipeline(pipeline)
 
-    _log("%s", pipeline)
 
-    if reset:
-        _log("Resetting pipeline")
-        reset_pipeline(pipeline)
+class CompiledPipeline(object):
+    """Execution plan of a pipeline
 
-    # just for paranoids and PEP8-disturbed, since theoretically every node
-    # should not change the data, so having default {} should be sufficient
-    data = data or {}
-
-    if 'datalad_stats' in data:
-        if stats is not None:
-            raise ValueError("We were provided stats to use, but data has already datalad_stats")
-    else:
-        data = updated(data, {'datalad_stats': stats or ActivityStats()})
+    Options are extracted and nested pipelines are compiled only once, so
+    running the pipeline does not need to re-inspect its definition for
+    every data item.  Steps are ran iteratively (depth first) using an
+    explicit stack instead of a recursion per node per data item.
+    """
 
-    if not len(pipeline):
-        return
+    __slots__ = ['pipeline', 'opts', 'output_sub', 'steps']
 
-    # options for this pipeline
-    opts, pipeline = _get_pipeline_opts(pipeline)
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        if not len(pipeline):
+            self.opts = self.output_sub = None
+            self.steps = []
+            return
 
-    # verify that we know about all specified options
-    unknown_opts = set(opts).difference(set(PIPELINE_OPTS))
-    if unknown_opts:
-        raise ValueError("Unknown pipeline options %s" % str(unknown_opts))
+        # options for this pipeline
+        opts, steps = _get_pipeline_opts(pipeline)
 
-    data_to_process = [data]
-    output = opts['output']
-    if output not in ('input',  'last-output', 'outputs', 'input+outputs'):
-        raise ValueError("Unknown output=%r" % output)
+        # verify that we know about all specified options
+        unknown_opts = set(opts).difference(set(PIPELINE_OPTS))
+        if unknown_opts:
+            raise ValueError("Unknown pipeline options %s" % str(unknown_opts))
 
-    if opts['loop'] and output == 'input':
-        lgr.debug("Assigning output='last-output' for sub-pipeline since we want to loop until pipeline returns anything")
-        output_sub = 'last-output'
-    else:
-        output_sub = output
+        output = opts['output']
+        if output not in ('input',  'last-output', 'outputs', 'input+outputs'):
+            raise ValueError("Unknown output=%r" % output)
 
-    log_level = lgr.getEffectiveLevel()
-    data_out = None
-    while data_to_process:
-        _log("processing data. %d left to go", len(data_to_process))
-        data_in = data_to_process.pop(0)
-        try:
-            for idata_out, data_out in enumerate(xrun_pipeline_steps(pipeline, data_in, output=output_sub)):
-                if log_level <= 3:
+        if opts['loop'] and output == 'input':
+            lgr.debug("Assigning output='last-output' for sub-pipeline since we want to loop until pipeline returns anything")
+            self.output_sub = 'last-output'
+        else:
+            self.output_sub = output
+        self.opts = opts
+        # (node or CompiledPipeline, is_pipeline, keys to drop from its output)
+        self.steps = [
+            (CompiledPipeline(step), True, None) if isinstance(step, PIPELINE_TYPES)
+            else (step, False, getattr(step, 'drop_keys', None))
+            for step in steps]
+
+    def xrun(self, data=None, stats=None, reset=True, timings=None):
+        """Yield results from the pipeline.
+
+        See `xrun_pipeline`
+        """
+        # logging calls are not free, so we check the level only once
+        log_level = lgr.getEffectiveLevel()
+
+        def _log(msg, *args):
+            """Helper for uniform debug messages"""
+            if log_level <= 5:
+                lgr.log(5, "Pipe #%s: " + msg, id(self.pipeline), *args)
+
+        _log("%s", self.pipeline)
+
+        if reset:
+            _log("Resetting pipeline")
+            reset_pipeline(self.pipeline)
+
+        # just for paranoids and PEP8-disturbed, since theoretically every node
+        # should not change the data, so having default {} should be sufficient.
+        # Nodes derive their output from the input data (copy, updated), which
+        # is cheap with records
+        if not isinstance(data, DataRecord):
+            data = DataRecord(data or {})
+
+        if 'datalad_stats' in data:
+            if stats is not None:
+                raise ValueError("We were provided stats to use, but data has already datalad_stats")
+        else:
+            data = updated(data, {'datalad_stats': stats or ActivityStats()})
+
+        if self.opts is None:
+            return
+
+        output = self.opts['output']
+        loop = self.opts['loop']
+        data_to_process = deque([data])
+
+        data_out = None
+        while data_to_process:
+            _log("processing data. %d left to go", len(data_to_process))
+            data_in = data_to_process.popleft()
+            try:
+                for idata_out, data_out in enumerate(
+                        self.xrun_steps(data_in, output=self.output_sub, timings=timings)):
+                    if log_level <= 3:
                         # provide details of what keys got changed
                         # TODO: unify with 2nd place where it was invoked
                         lgr.log(3, "O3: +%s, -%s, ch%s, ch?%s", *_compare_dicts(data_in, data_out))
 
-                _log("got new %dth output", idata_out)
-                if opts['loop']:
-                    _log("extending list of data to process due to loop option")
-                    data_to_process.append(data_out)
-                if 'outputs' in output:
-                    _log("yielding output")
-                    yield data_out
-        except FinishPipeline as e:
-            # TODO: decide what we would like to do -- skip that particular pipeline run
-            # or all subsequent or may be go back and only skip that generated result
-            _log("got a signal that pipeline is 'finished'")
-
-    # TODO: this implementation is somewhat bad since all the output logic is
-    # duplicated within xrun_pipeline_steps, but it is probably unavoidable because of
-    # loop option
-    if output == 'last-output':
-        if data_out:
-            _log("yielding last-output")
-            yield data_out
-
-    # Input should be yielded last since otherwise it might ruin the flow for typical
-    # pipelines which do not expect anything beyond going step by step
-    # We should yeild input data even if it was empty
-    if 'input' in output:
-        _log("finally yielding input data as instructed")
-        yield data
-
-
-def xrun_pipeline_steps(pipeline, data, output='input'):
-    """Actually run pipeline steps, feeding yielded results to the next node
-    and yielding results back
-
-    Recursive beast which runs a single node and then recurses to run the rest,
-    possibly multiple times if current node is a generator.
-    It yields output from the node/nested pipelines, as directed by output
-    argument.
-    """
-    if not len(pipeline):
-        return
-
-    node, pipeline_tail = pipeline[0], pipeline[1:]
-
-    if isinstance(node, (list, tuple)):
-        lgr.debug("Pipe: %s" % str(node))
-        # we have got a step which is yet another entire pipeline
-        pipeline_gen = xrun_pipeline(node, data, reset=False)
-        if pipeline_gen:
-            # should be similar to as running a node
-            data_in_to_loop = pipeline_gen
+                    _log("got new %dth output", idata_out)
+                    if loop:
+                        _log("extending list of data to process due to loop option")
+                        data_to_process.append(data_out)
+                    if 'outputs' in output:
+                        _log("yielding output")
+                        yield data_out
+            except FinishPipeline as e:
+                # TODO: decide what we would like to do -- skip that particular pipeline run
+                # or all subsequent or may be go back and only skip that generated result
+                _log("got a signal that pipeline is 'finished'")
+
+        # TODO: this implementation is somewhat bad since all the output logic is
+        # duplicated within xrun_steps, but it is probably unavoidable because of
+        # loop option
+        if output == 'last-output':
+            if data_out:
+                _log("yielding last-output")
+                yield data_out
+
+        # Input should be yielded last since otherwise it might ruin the flow for typical
+        # pipelines which do not expect anything beyond going step by step
+        # We should yeild input data even if it was empty
+        if 'input' in output:
+            _log("finally yielding input data as instructed")
+            yield data
+
+    def _start_step(self, istep, data, log_level, prev_stats=_UNKNOWN, timings=None):
+        """Start a step on data
+
+        `prev_stats` could be provided if stats of the data are known already,
+        to not look them up again.  If `timings` are provided, node gets
+        called through them.
+
+        Returns a frame (istep, data, prev_stats, iterator over step's output)
+        or None if step produced nothing to iterate over
+        """
+        node, is_pipeline, _ = self.steps[istep]
+        if is_pipeline:
+            if log_level <= 10:
+                lgr.debug("Pipe: %s", node.pipeline)
+            # should be similar to as running a node.
+            # We do not care to check if entire pipeline drops stats
+            # since it is done below at the node level
+            return istep, data, None, node.xrun(data, reset=False, timings=timings)
+
+        # it is a "node" which should generate (or return) us an iterable to feed
+        # its elements into the rest of the pipeline
+        if log_level <= 10:
+            lgr.debug("Node: %s", node)
+        if prev_stats is _UNKNOWN:
+            prev_stats = data.get('datalad_stats', None)  # so we could check if node doesn't dump it
+        if timings is None:
+            data_in_to_loop = node(data)
         else:
-            # pipeline can return None, and in such a case
-            # just do not process further, since if it completed
-            # normally, its input would have been provided back
-            lgr.log(7, "Pipeline generator %s returned None", node)
-            data_in_to_loop = []
-        prev_stats = None  # we do not care to check if entire pipeline drops stats
-                           # since it is done below at the node level
-    else:  # it is a "node" which should generate (or return) us an iterable to feed
-           # its elements into the rest of the pipeline
-        lgr.debug("Node: %s" % node)
-        prev_stats = data.get('datalad_stats', None)  # so we could check if node doesn't dump it
-        data_in_to_loop = node(data)
-
-    log_level = lgr.getEffectiveLevel()
-    data_out = None
-    if data_in_to_loop:
-        for data_ in data_in_to_loop:
+            data_in_to_loop = timings.call(node, data, prev_stats)
+        if not data_in_to_loop:
+            if istep + 1 < len(self.steps):
+                lgr.warning("%s returned None, although there is still a tail in the pipeline" % node)
+            return None
+        return istep, data, prev_stats, iter(data_in_to_loop)
+
+    def xrun_steps(self, data, output='input', timings=None):
+        """Actually run pipeline steps, feeding yielded results to the next step
+        and yielding results back
+
+        Every output of a step is passed through the rest of the steps before
+        the next output of that step is requested.  It yields output from the
+        last step, as directed by output argument.  Timings of the nodes get
+        collected into `timings` (PipelineTimings) if provided.
+        """
+        nsteps = len(self.steps)
+        if not nsteps:
+            return
+
+        log_level = lgr.getEffectiveLevel()
+        frame = self._start_step(0, data, log_level, timings=timings)
+        stack = [frame] if frame else []
+        try:
+            for data_out in self._xrun_stack(stack, nsteps, output, log_level, timings):
+                yield data_out
+        finally:
+            # e.g. on FinishPipeline -- close suspended generators of the steps
+            # (innermost first) so they could clean up right away
+            while stack:
+                close = getattr(stack.pop()[3], 'close', None)
+                if close is not None:
+                    close()
+
+    def _xrun_stack(self, stack, nsteps, output, log_level, timings):
+        """Run frames of the `stack` until it gets exhausted (see `xrun_steps`)"""
+        data_out = None
+        while stack:
+            istep, data_in, prev_stats, data_in_to_loop = stack[-1]
+            try:
+                data_ = next(data_in_to_loop)
+            except StopIteration:
+                stack.pop()
+                continue
+
             if prev_stats is not None:
                 new_stats = data_.get('datalad_stats', None)
                 if new_stats is None or new_stats is not prev_stats:
                     lgr.debug("Node %s has changed stats to %s from %s. Updating and using previous one",
-                              node, prev_stats, new_stats)
+                              self.steps[istep][0], prev_stats, new_stats)
                     if new_stats is not None:
                         prev_stats += new_stats
                     data_['datalad_stats'] = prev_stats
+            drop_keys = self.steps[istep][2]
+            if drop_keys:
+                # node hinted that those (possibly large) items are not needed any longer
+                data_ = _without(data_, drop_keys)
             if log_level <= 4:
                 # provide details of what keys got changed
                 stats_str = data_['datalad_stats'].as_str(mode='line') if 'datalad_stats' in data_ else ''
-                lgr.log(4, "O1: +%s, -%s, ch%s, ch?%s %s", *(_compare_dicts(data, data_) + (stats_str,)))
-            if pipeline_tail:
-                lgr.log(7, " pass %d keys into tail with %d elements", len(data_), len(pipeline_tail))
-                lgr.log(5, " passed keys: %s", data_.keys())
-                for data_out in xrun_pipeline_steps(pipeline_tail, data_, output=output):
-                    if log_level <= 3:
-                        # provide details of what keys got changed
-                        # TODO: difference from previous stats!
-                        stats_str = data_['datalad_stats'].as_str(mode='line') if 'datalad_stats' in data_ else ''
-                        lgr.log(3, "O2: +%s, -%s, ch%s, ch?%s %s", *(_compare_dicts(data, data_out) + (stats_str,)))
-                    if 'outputs' in output:
-                        yield data_out
-            else:
-                data_out = data_
-                if 'outputs' in output:
-                    yield data_out
-    elif pipeline_tail:
-        lgr.warning("%s returned None, although there is still a tail in the pipeline" % node)
-
-    if output == 'last-output' and data_out:
-        yield data_out
+                lgr.log(4, "O1: +%s, -%s, ch%s, ch?%s %s", *(_compare_dicts(data_in, data_) + (stats_str,)))
+
+            if istep + 1 < nsteps:
+                if log_level <= 7:
+                    lgr.log(7, " pass %d keys into tail with %d elements", len(data_), nsteps - istep - 1)
+                    lgr.log(5, " passed keys: %s", data_.keys())
+                # stats of data_ are known if we have checked them above
+                frame = self._start_step(
+                    istep + 1, data_, log_level,
+                    _UNKNOWN if prev_stats is None else prev_stats, timings)
+                if frame:
+                    stack.append(frame)
+                continue
+
+            data_out = data_
+            if log_level <= 3:
+                # provide details of what keys got changed by every step on the way
+                for frame in stack[:-1]:
+                    stats_str = data_out['datalad_stats'].as_str(mode='line') if 'datalad_stats' in data_out else ''
+                    lgr.log(3, "O2: +%s, -%s, ch%s, ch?%s %s", *(_compare_dicts(frame[1], data_out) + (stats_str,)))
+            if 'outputs' in output:
+                yield data_out
+
+        if output == 'last-output' and data_out:
+            yield data_out
+
+
+def xrun_pipeline(pipeline, data=None, stats=None, reset=True, timings=None):
+    """Yield results from the pipeline.
+
+    """
+    return compile_pipeline(pipeline).xrun(data, stats=stats, reset=reset, timings=timings)
+
+
+def xrun_pipeline_steps(pipeline, data, output='input', timings=None):
+    """Actually run pipeline steps, feeding yielded results to the next node
+    and yielding results back
+
+    See `CompiledPipeline.xrun_steps`
+    """
+    return compile_pipeline(pipeline).xrun_steps(data, output=output, timings=timings)
+
+
+def _without(data, keys):
+    """Return data without the given keys"""
+    if isinstance(data, DataRecord):
+        return data.without(*keys)
+    return dict((k, v) for k, v in data.items() if k not in keys)
 
 
 def _compare_dicts(d1, d2):
@@ -0,0 +1,193 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Data record passed between the nodes of a pipeline
+
+Nodes commonly derive the data they yield from the data they receive via
+`data.copy()` or `updated(data, {...})`.  With plain dictionaries that
+copies all the items (including possibly large ones, such as page bodies)
+for every item at every node.  `DataRecord` provides the dict API while
+sharing the items of the record it was copied from, so a copy costs only
+as much as the items which get changed in it.
+"""
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # PY2
+    from collections import MutableMapping
+
+__docformat__ = 'restructuredtext'
+
+
+class _Removed(object):
+    """Marker for an item removed from a record, while present in a parent"""
+    def __repr__(self):
+        return '<removed>'
+
+_REMOVED = _Removed()
+
+_NOVALUE = object()
+
+
+class DataRecord(MutableMapping):
+    """Dictionary which shares items with the record it was copied from
+
+    Similar to `collections.ChainMap`, items are looked up in a stack of
+    layers (own layer first).  `copy()` pushes a new empty layer on top of
+    the layers of the record, so the records share all their items.  Own
+    layer of a record gets copied only if it is modified after the record
+    was copied (copy-on-write), so derived records never see modifications
+    of the records they were derived from.
+
+    Number of layers is bounded (`max_depth`): when it is reached, layers
+    get flattened into a single one.  So time and memory needed per item
+    stay constant regardless of the length of the pipeline.  Flattened view
+    of the record (used to iterate over it) is cached until the record gets
+    modified, and shared with its copies.
+    """
+
+    __slots__ = ['_layer', '_parents', '_shared', '_flat']
+
+    # maximal number of parent layers before they get flattened into one
+    max_depth = 8
+
+    def __init__(self, *args, **kwargs):
+        self._layer = dict(*args, **kwargs)
+        self._parents = ()
+        self._shared = False
+        self._flat = None
+
+    @classmethod
+    def _from_layers(cls, layer, parents, flat=None):
+        record = cls.__new__(cls)
+        record._layer = layer
+        record._parents = parents
+        record._shared = False
+        record._flat = flat
+        return record
+
+    def _own_layer(self):
+        """Return own layer, which is safe to modify"""
+        self._flat = None  # it is about to change
+        if self._shared:
+            self._layer = dict(self._layer)
+            self._shared = False
+        return self._layer
+
+    # lookups are inlined in the methods below since they are used a lot
+    def __getitem__(self, key):
+        layer = self._layer
+        if key not in layer:
+            for layer in self._parents:
+                if key in layer:
+                    break
+            else:
+                raise KeyError(key)
+        value = layer[key]
+        if value is _REMOVED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        layer = self._layer
+        if key not in layer:
+            for layer in self._parents:
+                if key in layer:
+                    break
+            else:
+                return False
+        return layer[key] is not _REMOVED
+
+    def get(self, key, default=None):
+        layer = self._layer
+        if key not in layer:
+            for layer in self._parents:
+                if key in layer:
+                    break
+            else:
+                return default
+        value = layer[key]
+        return default if value is _REMOVED else value
+
+    def __setitem__(self, key, value):
+        self._own_layer()[key] = value
+
+    def update(self, *args, **kwargs):
+        self._own_layer().update(*args, **kwargs)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        layer = self._own_layer()
+        if self._parents:
+            layer[key] = _REMOVED
+        else:
+            del layer[key]
+
+    def __iter__(self):
+        return iter(self._get_flat())
+
+    def __len__(self):
+        return len(self._get_flat())
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self._get_flat())
+
+    def _get_flat(self):
+        """Return all the items as a dict, which must not be modified"""
+        if not self._parents:
+            return self._layer
+        if self._flat is None:
+            out = {}
+            for layer in reversed((self._layer,) + self._parents):
+                for key, value in layer.items():
+                    if value is _REMOVED:
+                        out.pop(key, None)
+                    else:
+                        out[key] = value
+            self._flat = out
+        return self._flat
+
+    def flatten(self):
+        """Return all the items of the record as a plain dict"""
+        return self._get_flat().copy()
+
+    def copy(self):
+        """Return a new record sharing all the items with this one"""
+        if not self._layer and self._parents:
+            # nothing of our own to share
+            return self._from_layers({}, self._parents, self._flat)
+        self._shared = True
+        parents = (self._layer,) + self._parents
+        if len(parents) > self.max_depth:
+            flat = self._get_flat()
+            return self._from_layers({}, (flat,), flat)
+        return self._from_layers({}, parents, self._flat)
+
+    def pop_input(self, key, default=_NOVALUE):
+        """Return value of the key and a new record without it
+
+        Unlike `pop`, the record itself (which other nodes might still use)
+        is not modified, and the new record does not refer to the layers
+        holding the value, so large values (e.g. page bodies) get freed as
+        soon as they are no longer needed by the nodes which consume them.
+        """
+        value = self.get(key, default)
+        if value is _NOVALUE:
+            raise KeyError(key)
+        return value, self.without(key)
+
+    def without(self, *keys):
+        """Return a new record with all the items but the given ones
+
+        See `pop_input`
+        """
+        items = self.flatten()
+        for key in keys:
+            items.pop(key, None)
+        return self.__class__(items)
@@ -12,6 +12,8 @@ from os.path import join as opj
 from ..nodes.crawl_url import crawl_url
 from ..nodes.matches import *
 from ..pipeline import run_pipeline, FinishPipeline
+from ..pipeline import consume_pipeline
+from ..pipeline import compile_pipeline
 
 from ..nodes.misc import Sink, assign, range_node, interrupt_if
 from ..nodes.annex import Annexificator, initiate_handle
@@ -94,8 +96,64 @@ def test_pipeline_linear_simple():
     eq_(sink.data, [{'out1': 0, 'out2': 0}, {'out1': 0, 'out2': 1}])
 
 
+def test_pipeline_stream():
+    pipeline = [{'output': 'outputs'}, range_node(3, "out1")]
+    sunk = []
+    stats = consume_pipeline(pipeline, {'datalad_stats': ActivityStats(files=1)},
+                             sink=sunk.append)
+    eq_(stats, ActivityStats(files=1).get_total())
+    eq_([d['out1'] for d in sunk], [0, 1, 2])
+    # stats get initiated if not provided
+    eq_(consume_pipeline(pipeline), ActivityStats().get_total())
+    # run_pipeline keeps all the outputs
+    eq_(run_pipeline(pipeline, {'datalad_stats': ActivityStats(files=1)}), sunk)
+
+
 def test_pipeline_unknown_opts():
     assert_raises(ValueError, run_pipeline, [{'xxx': 1}])
+    # options of nested pipelines get verified while compiling
+    assert_raises(ValueError, compile_pipeline, [range_node(1), [{'output': 'xxx'}]])
+
+
+def test_pipeline_compiled():
+    sink = Sink()
+    pipeline = compile_pipeline([range_node(2, "out1"), [range_node(2, "out2"), sink]])
+    all_pairs = [{'out1': 0, 'out2': 0}, {'out1': 0, 'out2': 1},
+                 {'out1': 1, 'out2': 0}, {'out1': 1, 'out2': 1}]
+    eq_(list(pipeline.xrun()), DEFAULT_OUTPUT)
+    eq_(sink.data, all_pairs)
+    # could be ran again
+    eq_(list(pipeline.xrun()), DEFAULT_OUTPUT)
+    eq_(sink.data, all_pairs * 2)
+
+
+def test_pipeline_finish_closes_generators():
+    closed = []
+
+    def closing_range(name):
+        def node(data):
+            try:
+                for i in range(3):
+                    yield updated(data, {name: i})
+            finally:
+                closed.append(name)
+        return node
+
+    def finish(data):
+        if data['inner'] == 1:
+            raise FinishPipeline
+        yield data
+
+    pipeline = compile_pipeline(
+        [closing_range('outer'), closing_range('inner'), finish])
+    with assert_raises(FinishPipeline):
+        list(pipeline.xrun_steps({}, output='outputs'))
+    # suspended generators got closed right away, innermost first
+    eq_(closed, ['inner', 'outer'])
+    # FinishPipeline is handled while running the pipeline
+    del closed[:]
+    eq_(len(list(pipeline.xrun())), 1)
+    eq_(closed, ['inner', 'outer'])
 
 
 def test_pipeline_linear_nested_order():
@@ -0,0 +1,89 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+from ..record import DataRecord
+from ..pipeline import run_pipeline
+from ..nodes.misc import Sink
+from ...utils import updated
+
+from ...tests.utils import eq_, ok_, assert_raises
+from ...tests.utils import assert_not_in
+
+
+def test_DataRecord():
+    r = DataRecord(a=1, b=2)
+    eq_(r, {'a': 1, 'b': 2})
+    r2 = updated(r, {'c': 3})
+    ok_(isinstance(r2, DataRecord))
+    eq_(r2, {'a': 1, 'b': 2, 'c': 3})
+    eq_(r, {'a': 1, 'b': 2})
+
+    # modifications of either record are not visible in the other
+    r['a'] = 10
+    del r2['b']
+    eq_(r, {'a': 10, 'b': 2})
+    eq_(r2, {'a': 1, 'c': 3})
+    assert_not_in('b', r2)
+    assert_raises(KeyError, r2.__getitem__, 'b')
+    eq_(r2.get('b', 'default'), 'default')
+    eq_(len(r2), 2)
+    eq_(sorted(r2), ['a', 'c'])
+
+    r3 = r2.copy()
+    eq_(r3.pop('c'), 3)
+    eq_(r3, {'a': 1})
+    eq_(r2, {'a': 1, 'c': 3})
+
+    value, r4 = r2.pop_input('a')
+    eq_(value, 1)
+    eq_(r4, {'c': 3})
+    eq_(r2, {'a': 1, 'c': 3})
+    assert_raises(KeyError, r2.pop_input, 'b')
+    eq_(r2.pop_input('b', None), (None, r2))
+
+
+def test_DataRecord_depth():
+    r = DataRecord(i=0)
+    for i in range(100):
+        r = updated(r, {'i': i + 1, 'k%d' % i: i})
+    eq_(r['i'], 100)
+    eq_(len(r), 101)
+    ok_(len(r._parents) <= DataRecord.max_depth)
+
+
+def test_DataRecord_flat_cached():
+    r = updated(DataRecord(a=1), {'b': 2})
+    eq_(sorted(r), ['a', 'b'])
+    # flattened view is shared with copies
+    r2 = r.copy()
+    ok_(r2._flat is r._flat)
+    eq_(len(r2), 2)
+    # and is refreshed upon modification
+    r2['c'] = 3
+    del r2['a']
+    eq_(sorted(r2), ['b', 'c'])
+    eq_(sorted(r), ['a', 'b'])
+    r.update(d=4)
+    eq_(sorted(r), ['a', 'b', 'd'])
+    eq_(len(r), 3)
+
+
+def test_pipeline_drop_keys():
+    def page(data):
+        yield updated(data, {'response': 'x' * 1000, 'url': 'http://example.com'})
+
+    class consume(object):
+        drop_keys = ('response',)
+
+        def __call__(self, data):
+            yield updated(data, {'size': len(data['response'])})
+
+    sink = Sink()
+    run_pipeline([page, consume(), sink])
+    eq_(sink.data, [{'url': 'http://example.com', 'size': 1000}])
@@ -0,0 +1,67 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import json
+import time
+
+from ..nodes.misc import range_node
+from ..pipeline import run_pipeline
+from ..timing import PipelineTimings
+
+from ...tests.utils import eq_, ok_, assert_raises
+from ...tests.utils import assert_in
+from ...tests.utils import with_tempfile
+
+
+def slow_download(data):
+    time.sleep(0.01)
+    data['datalad_stats'].downloaded_size += 10
+    yield data
+
+
+def drop(data):
+    return None
+
+
+@with_tempfile
+def test_timings(f):
+    outer = range_node(2, "out1")
+    inner = range_node(3, "out2")
+    timings = PipelineTimings(trace=True)
+    run_pipeline([outer, [inner, slow_download], drop], timings=timings)
+    eq_([t.name for t in timings], [repr(outer), repr(inner), 'slow_download', 'drop'])
+    t_outer, t_inner, t_slow, t_drop = timings
+    eq_((t_outer.items_in, t_outer.items_out), (1, 2))
+    eq_((t_inner.items_in, t_inner.items_out), (2, 6))
+    eq_((t_slow.items_in, t_slow.items_out), (6, 6))
+    # nested pipeline yields only its input by default
+    eq_((t_drop.items_in, t_drop.items_out), (2, 0))
+    eq_(t_slow.downloaded_size, 60)
+    eq_(t_inner.downloaded_size, 0)
+    ok_(t_slow.wall >= 0.06)
+    # time of subsequent nodes is not attributed to the preceding ones
+    ok_(t_inner.wall < t_slow.wall)
+    eq_(timings.get(drop), t_drop)
+
+    s = timings.as_str()
+    # the slowest first
+    ok_(s.startswith('slow_download: '))
+    assert_in('6->6 items 60 Bytes', s)
+    eq_(len(timings.as_str(mode='line').split('\n')), 1)
+
+    timings.save(f)
+    with open(f) as fp:
+        eq_(json.load(fp), timings.as_dict())
+
+    timings.save(f, format='chrome')
+    with open(f) as fp:
+        events = json.load(fp)['traceEvents']
+    # call, output and the end of the iteration for each of 6 items
+    eq_(sum(e['name'] == 'slow_download' for e in events), 18)
+    assert_raises(RuntimeError, PipelineTimings().to_chrome_trace, f)
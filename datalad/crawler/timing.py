@@ -0,0 +1,193 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Collection of per-node timings while running a pipeline
+
+Pipeline runner calls nodes (via `PipelineTimings.call`) only if timings
+were requested, so there is no overhead otherwise.  Since nodes are
+generators which are advanced one output at a time, all the time spent in
+the node (while producing its outputs) gets attributed to it, but not the
+time spent by the subsequent nodes.
+"""
+
+__docformat__ = 'restructuredtext'
+
+import json
+import os
+import time
+
+import humanize
+
+from logging import getLogger
+lgr = getLogger('datalad.crawler.timing')
+
+# CPU time of the process
+_cpu_time = getattr(time, 'process_time', None) or time.clock
+
+
+def _get_node_name(node):
+    """Return a name to report node under"""
+    name = getattr(node, '__name__', None)
+    if name is None:
+        # instances of node classes, which have descriptive reprs
+        name = repr(node)
+    return name
+
+
+class NodeTimings(object):
+    """Timings and counts for a single node"""
+
+    __slots__ = ['name', 'items_in', 'items_out', 'wall', 'cpu',
+                 'downloaded_size']
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.wall = 0.
+        self.cpu = 0.
+        self.downloaded_size = 0
+
+    def as_dict(self):
+        return dict((k, getattr(self, k)) for k in self.__slots__)
+
+
+class PipelineTimings(object):
+    """Timings of nodes of a pipeline
+
+    Collects for every node wall and CPU time, number of items it was
+    called on and it produced, and number of bytes downloaded (as reported
+    to the stats of the data) while running it.
+    """
+
+    def __init__(self, trace=False):
+        """
+        Parameters
+        ----------
+        trace : bool, optional
+          Either to record every invocation of the nodes, as needed for
+          `to_chrome_trace`.  Otherwise only the totals are collected
+        """
+        self._nodes = {}  # id(node): NodeTimings
+        self._order = []  # to report in order of appearance
+        self._events = [] if trace else None
+        self._t0 = time.time()
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def get(self, node):
+        """Return timings of the node"""
+        return self._nodes[id(node)]
+
+    def _get_timings(self, node):
+        timings = self._nodes.get(id(node))
+        if timings is None:
+            timings = self._nodes[id(node)] = NodeTimings(_get_node_name(node))
+            self._order.append(timings)
+        return timings
+
+    def _account(self, timings, t0, c0, stats, size0):
+        t1 = time.time()
+        timings.wall += t1 - t0
+        timings.cpu += _cpu_time() - c0
+        if stats is not None:
+            timings.downloaded_size += stats.downloaded_size - size0
+        if self._events is not None:
+            self._events.append((timings.name, t0, t1 - t0))
+
+    def call(self, node, data, stats=None):
+        """Call the node on data, collecting the timings
+
+        Returns output of the node, which (if it was an iterable) gets timed
+        while iterated over.
+
+        Parameters
+        ----------
+        stats : ActivityStats, optional
+          Stats of the data, to account for the downloads
+        """
+        timings = self._get_timings(node)
+        timings.items_in += 1
+        size0 = stats.downloaded_size if stats is not None else 0
+        t0, c0 = time.time(), _cpu_time()
+        out = node(data)
+        self._account(timings, t0, c0, stats, size0)
+        if not out:
+            return out
+        return self._iter(timings, iter(out), stats)
+
+    def _iter(self, timings, it, stats):
+        while True:
+            size0 = stats.downloaded_size if stats is not None else 0
+            t0, c0 = time.time(), _cpu_time()
+            try:
+                data = next(it)
+            except StopIteration:
+                self._account(timings, t0, c0, stats, size0)
+                return
+            self._account(timings, t0, c0, stats, size0)
+            timings.items_out += 1
+            yield data
+
+    def as_str(self, mode='full'):
+        """
+        Parameters
+        ----------
+        mode : {'full', 'line'}
+        """
+        # the slowest ones first
+        nodes = sorted(self._order, key=lambda t: t.wall, reverse=True)
+        out = []
+        for t in nodes:
+            s = "%s: %.2fs (cpu %.2fs) %d->%d items" \
+                % (t.name, t.wall, t.cpu, t.items_in, t.items_out)
+            if t.downloaded_size:
+                s += " %s" % humanize.naturalsize(t.downloaded_size)
+            out.append(s)
+        if mode == 'full':
+            return '\n'.join(out)
+        elif mode == 'line':
+            return ', '.join(out)
+        else:
+            raise ValueError("Unknown mode %s" % mode)
+
+    def as_dict(self):
+        return {'nodes': [t.as_dict() for t in self._order]}
+
+    def to_json(self, filename):
+        """Store totals per node into a JSON file"""
+        with open(filename, 'w') as f:
+            json.dump(self.as_dict(), f, indent=1)
+
+    def to_chrome_trace(self, filename):
+        """Store all the invocations of the nodes into a Chrome trace file
+
+        It could be loaded into chrome://tracing or alike.  Requires timings
+        to be collected with trace=True
+        """
+        if self._events is None:
+            raise RuntimeError("No trace was collected. Use trace=True")
+        pid = os.getpid()
+        events = [
+            {'name': name, 'cat': 'node', 'ph': 'X', 'pid': pid, 'tid': 0,
+             'ts': int((t0 - self._t0) * 1e6), 'dur': int(dur * 1e6)}
+            for name, t0, dur in self._events
+        ]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events}, f)
+
+    def save(self, filename, format='json'):
+        """Store timings into a file in the format ('json' or 'chrome')"""
+        if format == 'json':
+            self.to_json(filename)
+        elif format == 'chrome':
+            self.to_chrome_trace(filename)
+        else:
+            raise ValueError("Unknown format %s" % format)
+        lgr.info("Stored pipeline timings into %s", filename)
@@ -12,6 +12,7 @@ __docformat__ = 'restructuredtext'
 
 import os
 import re
+import threading
 from os.path import exists, join as opj, basename, abspath
 
 from six.moves.urllib.parse import quote as urlquote, unquote as urlunquote
@@ -20,9 +21,11 @@ import logging
 lgr = logging.getLogger('datalad.customremotes.archive')
 
 from ..cmd import link_file_load, Runner
+from ..support.cache import DictCache
 from ..support.exceptions import CommandError
-from ..support.archives import ArchivesCache
+from ..dochelpers import exc_str
 from ..utils import getpwd
+from ..utils import swallow_logs
 from ..utils import parse_url_opts
 from .base import AnnexCustomRemote
 from .base import URI_PREFIX
@@ -30,6 +33,137 @@ from .base import URI_PREFIX
 
 # TODO: RF functionality not specific to being a custom remote (loop etc)
 #       into a separate class
+class _ArchivePrefetch(object):
+    """Fetching and extraction of an archive running in a background thread
+    """
+
+    def __init__(self, akey, fetch, cache):
+        """
+        Parameters
+        ----------
+        akey : str
+          Key of the archive
+        fetch : callable
+          To be called with the key to fetch the archive if necessary.  Must
+          return path to the archive
+        cache : ArchivesCache
+          To extract the archive into
+        """
+        self.akey = akey
+        self.akey_path = None
+        self.fetch_error = None
+        self.extract_error = None
+        self.fetched = threading.Event()
+        self.extracted = threading.Event()
+        self._fetch = fetch
+        self._cache = cache
+        self._thread = threading.Thread(target=self._run,
+                                        name="prefetch-%s" % akey)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.akey)
+
+    def _run(self):
+        try:
+            try:
+                self.akey_path = self._fetch(self.akey)
+            except Exception as exc:
+                self.fetch_error = exc
+                return
+            finally:
+                self.fetched.set()
+            try:
+                self._cache[self.akey_path].assure_extracted()
+            except Exception as exc:
+                self.extract_error = exc
+        finally:
+            self.extracted.set()
+
+    def get_file(self, afile, path):
+        """Provide `afile` from the archive under `path`
+
+        While the archive is still being extracted, the file gets extracted
+        from it on its own, if the type of the archive allows for that
+        """
+        self.fetched.wait()
+        if self.fetch_error:
+            raise self.fetch_error
+        if not self.extracted.is_set():
+            # to not wait for the entire archive to get extracted
+            from ..support.archives import extract_file
+            try:
+                if extract_file(self.akey_path, afile, path):
+                    lgr.debug("Extracted %s from %s on its own", afile, self)
+                    return
+            except Exception as exc:
+                lgr.debug("Failed to extract %s from %s on its own: %s",
+                          afile, self, exc_str(exc))
+        self.extracted.wait()
+        if self.extract_error:
+            raise self.extract_error
+        pwd = getpwd()
+        lgr.debug("Getting file {afile} from {self.akey_path} while PWD={pwd}".format(**locals()))
+        apath = self._cache[self.akey_path].get_extracted_file(afile)
+        link_file_load(apath, path)
+
+    def release(self):
+        """Wait for the extraction to finish and release it
+
+        Extracted archive gets removed unless the cache is persistent
+        """
+        self._thread.join()
+        if self.akey_path:
+            del self._cache[self.akey_path]
+
+
+class ArchiveTransferScheduler(object):
+    """Schedules fetching and extraction of archives for the transfers
+
+    git-annex requests files one at a time, commonly many files from the same
+    archive in a row (a burst).  With the first request for an archive it
+    gets fetched and extracted in the background, while files are provided
+    to annex as soon as possible.  Extractions are kept (so could be reused
+    if files from the same archive are requested later on again) until
+    released when communication with annex stops.
+    """
+
+    def __init__(self, fetch, cache):
+        """
+        Parameters
+        ----------
+        fetch : callable
+          To be called (in a background thread) with the key of an archive to
+          fetch it if necessary.  Must return path to the archive
+        cache : ArchivesCache
+          To extract archives into
+        """
+        self._fetch = fetch
+        self._cache = cache
+        self._prefetches = {}
+
+    def get_prefetch(self, akey):
+        """Return the (possibly still running) prefetch of the archive"""
+        prefetch = self._prefetches.get(akey)
+        if prefetch is not None and prefetch.extracted.is_set() \
+                and (prefetch.fetch_error or prefetch.extract_error):
+            # failed the last time, so try again
+            prefetch.release()
+            prefetch = None
+        if prefetch is None:
+            lgr.debug("Starting to prefetch %s", akey)
+            prefetch = self._prefetches[akey] = \
+                _ArchivePrefetch(akey, self._fetch, self._cache)
+        return prefetch
+
+    def release(self):
+        """Release all the archives"""
+        prefetches, self._prefetches = self._prefetches, {}
+        for prefetch in prefetches.values():
+            prefetch.release()
+
+
 class ArchiveAnnexCustomRemote(AnnexCustomRemote):
     """Special custom remote allowing to obtain files from archives
 
@@ -50,11 +184,18 @@ class ArchiveAnnexCustomRemote(AnnexCustomRemote):
         # heuristic let's use the most recently asked one
 
         self._last_url = None  # for heuristic to choose among multiple URLs
-        self._cache = ArchivesCache(self.path, persistent=persistent_cache)
+        self._persistent_cache = persistent_cache
+        self._cache = None  # to be initiated upon first use
+        self._scheduler = None  # to be initiated upon first transfer
+        # CHECKPRESENT responses per archive key
+        self._akeys_presence = DictCache(size_limit=1000)
 
     def stop(self, *args):
         """Stop communication with annex"""
-        self._cache.clean()
+        if self._scheduler is not None:
+            self._scheduler.release()
+        if self._cache is not None:
+            self._cache.clean()
         super(ArchiveAnnexCustomRemote, self).stop(*args)
 
     def get_file_url(self, archive_file=None, archive_key=None, file=None, size=None):
@@ -88,8 +229,20 @@ class ArchiveAnnexCustomRemote(AnnexCustomRemote):
 
     @property
     def cache(self):
+        if self._cache is None:
+            # delayed since requires patool etc
+            from ..support.archives import ArchivesCache
+            self._cache = ArchivesCache(self.path,
+                                        persistent=self._persistent_cache)
         return self._cache
 
+    @property
+    def scheduler(self):
+        if self._scheduler is None:
+            self._scheduler = ArchiveTransferScheduler(self._fetch_archive,
+                                                       self.cache)
+        return self._scheduler
+
     def _parse_url(self, url):
         """Parse url and return archive key, file within archive and additional attributes (such as size)
         """
@@ -212,10 +365,24 @@ class ArchiveAnnexCustomRemote(AnnexCustomRemote):
         akey, afile = self._get_akey_afile(key)
         if self.get_contentlocation(akey):
             self.send("CHECKPRESENT-SUCCESS", key)
-        else:
-            # TODO: proxy the same to annex itself to verify check for archive.
-            # If archive is no longer available -- then CHECKPRESENT-FAILURE
-            self.send("CHECKPRESENT-UNKNOWN", key)
+            return
+        # all the files from the same archive share its availability, so ask
+        # only once per archive, and without touching the network
+        resp = self._akeys_presence.get(akey)
+        if resp is None:
+            resp = self._akeys_presence[akey] = self._get_akey_presence(akey)
+        self.send(resp, key)
+
+    def _get_akey_presence(self, akey):
+        """Answer CHECKPRESENT for the archive key from annex location log"""
+        try:
+            with swallow_logs():
+                whereis = self.repo.annex_whereis([akey], key=True)[0]
+        except Exception as exc:
+            lgr.debug("Failed to figure out where %s is: %s", akey, exc_str(exc))
+            return "CHECKPRESENT-UNKNOWN"
+        # If archive is no longer available anywhere -- then CHECKPRESENT-FAILURE
+        return "CHECKPRESENT-SUCCESS" if whereis else "CHECKPRESENT-FAILURE"
 
     def req_REMOVE(self, key):
         """
@@ -259,41 +426,42 @@ class ArchiveAnnexCustomRemote(AnnexCustomRemote):
             self.send("WHEREIS-FAILURE")
         """
 
-    def _transfer(self, cmd, key, path):
-
-        akey, afile = self._get_akey_afile(key)
+    def _fetch_archive(self, akey):
+        """Return path to the archive, fetching it if necessary"""
         akey_fpath = self.get_contentlocation(akey)
-        if akey_fpath:  # present
-            akey_path = opj(self.path, akey_fpath)
-        else:
+        if not akey_fpath:
             # TODO: make it more stringent?
             # Command could have fail to run if key was not present locally yet
             # Thus retrieve the key using annex
-            try:
-                # TODO: we need to report user somehow about this happening and progress on the download
-                self.runner(["git-annex", "get", "--key", akey],
-                            cwd=self.path, expect_stderr=True)
-            except Exception as e:
-                #from celery.contrib import rdb
-                #rdb.set_trace()
-                self.error("Failed to fetch {akey} containing {key}: {e}".format(**locals()))
-                return
+            # TODO: we need to report user somehow about this happening and progress on the download
+            self.runner(["git-annex", "get", "--key", akey],
+                        cwd=self.path, expect_stderr=True)
             akey_fpath = self.get_contentlocation(akey)
             if not akey_fpath:
                 raise RuntimeError("We were reported to fetch it alright but now can't get its location.  Check logic")
 
         akey_path = opj(self.repo.path, akey_fpath)
         assert exists(akey_path), "Key file %s is not present" % akey_path
+        return akey_path
+
+    def _transfer(self, cmd, key, path):
+
+        akey, afile = self._get_akey_afile(key)
+        # archive gets fetched and extracted in the background, so subsequent
+        # requests for the files from the same archive do not wait for it
+        prefetch = self.scheduler.get_prefetch(akey)
+        prefetch.fetched.wait()
+        if prefetch.fetch_error:
+            e = prefetch.fetch_error
+            self.error("Failed to fetch {akey} containing {key}: {e}".format(**locals()))
+            return
 
         # Extract that bloody file from the bloody archive
-        # TODO: implement/use caching, for now a simple one
         #  actually patool doesn't support extraction of a single file
         #  https://github.com/wummel/patool/issues/20
-        # so
-        pwd = getpwd()
-        lgr.debug("Getting file {afile} from {akey_path} while PWD={pwd}".format(**locals()))
-        apath = self.cache[akey_path].get_extracted_file(afile)
-        link_file_load(apath, path)
+        # so the entire archive gets extracted, unless we could get the file
+        # on its own
+        prefetch.get_file(afile, path)
         self.send('TRANSFER-SUCCESS', cmd, key)
 
 
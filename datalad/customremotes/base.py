@@ -23,9 +23,7 @@ from six.moves.urllib.parse import urlparse, urlunparse
 from ..cmd import Runner
 from ..support.exceptions import CommandError
 from ..support.protocol import ProtocolInterface
-from ..support.annexrepo import AnnexRepo
 from ..support.cache import DictCache
-from ..cmdline.helpers import get_repo_instance
 
 import logging
 
@@ -195,11 +193,11 @@ class AnnexCustomRemote(object):
         self.fin = sys.stdin
         self.fout = sys.stdout
 
-        self.repo = get_repo_instance(class_=AnnexRepo) \
-            if not path \
-            else AnnexRepo(path, create=False, init=False)
-
-        self.path = self.repo.path
+        # repository gets instantiated upon first need only, since many
+        # requests (e.g. INITREMOTE, GETCOST) could be answered without it
+        # and special remotes get started by annex quite often
+        self._path = path
+        self._repo = None
 
         self._progress = 0  # transmission to be reported back if available
         self.cost = cost
@@ -214,6 +212,21 @@ class AnnexCustomRemote(object):
 
         self._contentlocations = DictCache(size_limit=100)  # TODO: config ?
 
+    @property
+    def repo(self):
+        """AnnexRepo this custom remote is serving"""
+        if self._repo is None:
+            # delayed since heavy imports
+            from ..support.annexrepo import AnnexRepo
+            from ..cmdline.helpers import get_repo_instance
+            self._repo = get_repo_instance(class_=AnnexRepo) \
+                if not self._path \
+                else AnnexRepo(self._path, create=False, init=False)
+        return self._repo
+
+    @property
+    def path(self):
+        return self.repo.path
 
     @classmethod
     def _get_custom_scheme(cls, prefix):
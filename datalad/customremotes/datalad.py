@@ -12,21 +12,85 @@ __docformat__ = 'restructuredtext'
 
 import os
 import re
-from os.path import exists, join as opj, basename, abspath
+import threading
+import time
+from os.path import exists, lexists, join as opj, basename, abspath
+
+from six.moves.queue import Queue, Empty
 
 from six.moves.urllib.parse import quote as urlquote, unquote as urlunquote
 
 import logging
 lgr = logging.getLogger('datalad.customremotes.datalad')
 
+# do not store hosts health more often (seconds), besides upon stop
+_HOSTS_HEALTH_SAVE_INTERVAL = 60
+
+from .. import cfg
 from ..cmd import link_file_load, Runner
 from ..support.exceptions import CommandError
+from ..support.cache import PersistentCache
+from ..support.parallel import map_jobs
 from ..utils import swallow_logs, swallow_outputs
 from .base import AnnexCustomRemote
 from ..dochelpers import exc_str
 
-from ..downloaders.providers import Providers
-from ..downloaders.base import TargetFileAbsent
+
+class _StatusProber(object):
+    """Probes statuses of URLs in background threads, ahead of the requests
+    """
+
+    def __init__(self, probe, jobs):
+        """
+        Parameters
+        ----------
+        probe : callable
+          To be called with the URL, must return its status and not raise
+        jobs : int
+          Number of threads to probe with
+        """
+        self._probe = probe
+        self._jobs = jobs
+        self._queue = Queue()
+        # url: (event set when probed, [status])
+        self._results = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def schedule(self, urls):
+        """Schedule probing of the urls, unless already scheduled"""
+        with self._lock:
+            for url in urls:
+                if url not in self._results:
+                    entry = self._results[url] = (threading.Event(), [None])
+                    self._queue.put((url, entry))
+            while len(self._threads) < self._jobs:
+                thread = threading.Thread(
+                    target=self._run, name="status-prober-%d" % len(self._threads))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            url, (event, result) = self._queue.get()
+            try:
+                result[0] = self._probe(url)
+            finally:
+                event.set()
+
+    def pop(self, url):
+        """Return status of the scheduled url, waiting for it if needed
+
+        Returns None if it was not scheduled
+        """
+        with self._lock:
+            entry = self._results.pop(url, None)
+        if entry is None:
+            return None
+        event, result = entry
+        event.wait()
+        return result[0]
 
 
 class DataladAnnexCustomRemote(AnnexCustomRemote):
@@ -39,14 +103,50 @@ class DataladAnnexCustomRemote(AnnexCustomRemote):
 
     AVAILABILITY = "global"
 
-    def __init__(self, persistent_cache=True, **kwargs):
+    def __init__(self, persistent_cache=True, hosts_health=None,
+                 status_cache=None, **kwargs):
         super(DataladAnnexCustomRemote, self).__init__(**kwargs)
         # annex requests load by KEY not but URL which it originally asked
-        # about.  So for a key we might get back multiple URLs and as a
-        # heuristic let's use the most recently asked one
+        # about.  So for a key we might get back multiple URLs and we choose
+        # among them based on previous experience with their hosts
 
-        self._last_url = None  # for heuristic to choose among multiple URLs
-        self._providers = Providers.from_config_files()
+        self._providers = None  # to be loaded upon first use
+        self._status_cache = status_cache
+        # for probing statuses of the keys which annex is likely to ask about
+        # next, all loaded upon first use
+        self._prober = None
+        self._keys = None
+        self._keys_order = None
+        self._keys_urls = {}
+        # to rank multiple URLs, loaded upon first use
+        self._hosts_health = hosts_health
+        self._hosts_health_saved = time.time()
+        # targets of hedged downloads which are still running
+        self._hedge_targets = set()
+        self._hedge_lock = threading.Lock()
+
+    def stop(self, *args):
+        """Stop communication with annex"""
+        self._save_hosts_health()
+        # downloads which lost the race die along with the process, so
+        # remove what they have downloaded so far
+        with self._hedge_lock:
+            targets, self._hedge_targets = self._hedge_targets, set()
+        from ..downloaders.base import BaseDownloader
+        for target in targets:
+            for f in target, BaseDownloader._get_temp_download_filename(target):
+                if lexists(f):
+                    lgr.debug("Removing unfinished download %s", f)
+                    os.unlink(f)
+        super(DataladAnnexCustomRemote, self).stop(*args)
+
+    @property
+    def providers(self):
+        if self._providers is None:
+            # delayed since it imports all the downloaders (requests, boto, ...)
+            from ..downloaders.providers import Providers
+            self._providers = Providers.from_config_files()
+        return self._providers
 
     #
     # Helper methods
@@ -75,7 +175,7 @@ class DataladAnnexCustomRemote(AnnexCustomRemote):
 
         try:
             with swallow_logs():
-                status = self._providers.get_status(url)
+                status = self.providers.get_status(url)
             size = str(status.size) if status.size is not None else 'UNKNOWN'
             resp = ["CHECKURL-CONTENTS", size] + \
                    ([status.filename] if status.filename else [])
@@ -100,31 +200,134 @@ class DataladAnnexCustomRemote(AnnexCustomRemote):
             present in the remote. (Perhaps the remote cannot be contacted.)
         """
         lgr.debug("VERIFYING key %s" % key)
-        resp = None
-        for url in self.get_URLS(key):
-            # somewhat duplicate of CHECKURL
-            try:
-                with swallow_logs():
-                    status = self._providers.get_status(url)
-                if status:  # TODO:  anything specific to check???
-                    resp = "CHECKPRESENT-SUCCESS"
-                    break
-                # TODO:  for CHECKPRESENT-FAILURE we somehow need to figure out that
-                # we can connect to that server but that specific url is N/A,
-                # probably check the connection etc
-            except TargetFileAbsent as exc:
-                self.debug("Target url %s file seems to be missing: %s" % (url, exc_str(exc)))
-                if not resp:
-                    # if it is already marked as UNKNOWN -- let it stay that way
-                    # but if not -- we might as well say that we can no longer access it
-                    resp = "CHECKPRESENT-FAILURE"
-            except Exception as exc:
-                resp = "CHECKPRESENT-UNKNOWN"
-                self.debug("Failed to check status of url %s: %s" % (url, exc_str(exc)))
-        if resp is None:
+        urls = self._keys_urls.pop(key, None) or self.get_URLS(key)
+        self._prefetch_statuses(key)
+        statuses = self._get_url_statuses(urls)
+        if 'present' in statuses:
+            resp = "CHECKPRESENT-SUCCESS"
+        elif 'unknown' in statuses or not statuses:
+            # TODO:  for CHECKPRESENT-FAILURE we somehow need to figure out that
+            # we can connect to that server but that specific url is N/A,
+            # probably check the connection etc
             resp = "CHECKPRESENT-UNKNOWN"
+        else:
+            # we could access all of them and none has the file
+            resp = "CHECKPRESENT-FAILURE"
         self.send(resp, key)
 
+    @property
+    def status_cache(self):
+        """Cache of the statuses of the URLs shared by all the remote processes
+
+        Only absent URLs get cached by default, since git-annex relies on
+        CHECKPRESENT e.g. to verify numcopies before dropping.  Present ones
+        get cached only if datalad.status cache present is set.  Entries
+        expire after datalad.status cache ttl seconds (a day by default), and
+        0 disables caching
+        """
+        if self._status_cache is None:
+            ttl = float(cfg.get('datalad', 'status cache ttl', default=24 * 3600))
+            if not ttl:
+                return None
+            self._status_cache = PersistentCache(
+                opj(cfg.dirs.user_cache_dir, 'url_statuses.sqlite'), ttl=ttl)
+        return self._status_cache
+
+    def _probe_url(self, url):
+        """Return 'present', 'absent' or 'unknown' for the URL
+
+        Known (present or absent) ones get cached
+        """
+        from ..downloaders.base import TargetFileAbsent
+        cache = self.status_cache
+        try:
+            with swallow_logs():
+                status = self.providers.get_status(url)
+            # TODO:  anything specific to check???
+            result = 'present' if status else 'unknown'
+        except TargetFileAbsent as exc:
+            self.debug("Target url %s file seems to be missing: %s" % (url, exc_str(exc)))
+            result = 'absent'
+        except Exception as exc:
+            self.debug("Failed to check status of url %s: %s" % (url, exc_str(exc)))
+            result = 'unknown'
+        if cache is not None and (
+                result == 'absent'
+                or (result == 'present' and cfg.getboolean(
+                    'datalad', 'status cache present', default=False))):
+            cache.set(url, result)
+        return result
+
+    def _get_keys_order(self):
+        """Return {key: position} in the order annex goes through the keys
+
+        Commands like fsck or copy go through the files in the order of
+        the index, as does annex find
+        """
+        if self._keys_order is None:
+            try:
+                out, err = self.runner.run(
+                    ['git', 'annex', 'find', '--include=*', '--format=${key}\\n'],
+                    cwd=self.path, expect_fail=True, expect_stderr=True)
+                keys = out.splitlines()
+            except Exception as exc:
+                self.debug("Failed to get keys of the repository: %s" % exc_str(exc))
+                keys = []
+            self._keys = keys
+            self._keys_order = dict((k, i) for i, k in enumerate(keys))
+        return self._keys_order
+
+    def _prefetch_statuses(self, key):
+        """Schedule probing of the URLs of the keys likely to be asked next
+
+        Up to datalad.status prefetch (10 by default, 0 disables) keys
+        following the given one are considered.  Their URLs are requested
+        from annex right away (it is cheap), while probing itself runs in the
+        background (datalad.status jobs threads)
+        """
+        ahead = int(cfg.get('datalad', 'status prefetch', default=10))
+        if not ahead:
+            return
+        i = self._get_keys_order().get(key)
+        if i is None:
+            return
+        if self._prober is None:
+            self._prober = _StatusProber(
+                self._probe_url,
+                int(cfg.get('datalad', 'status jobs', default=4)))
+        for next_key in self._keys[i + 1:i + 1 + ahead]:
+            if next_key in self._keys_urls:
+                continue
+            try:
+                urls = self.get_URLS(next_key)
+            except ValueError:
+                # no URLs of ours
+                urls = []
+            self._keys_urls[next_key] = urls
+            cache = self.status_cache
+            self._prober.schedule(
+                [url for url in urls
+                 if cache is None or cache.get(url) is None])
+
+    def _get_url_statuses(self, urls):
+        """Return 'present', 'absent' or 'unknown' per each URL
+
+        Statuses are taken from the cache if known, and the rest are probed
+        concurrently (datalad.status jobs, 4 by default)
+        """
+        cache = self.status_cache
+        statuses = [cache.get(url) if cache is not None else None for url in urls]
+        to_probe = [url for url, status in zip(urls, statuses) if status is None]
+        if to_probe:
+            # those probed ahead
+            probed = dict((url, self._prober.pop(url)) for url in to_probe) \
+                if self._prober is not None else {}
+            to_probe = [url for url in to_probe if probed.get(url) is None]
+            jobs = int(cfg.get('datalad', 'status jobs', default=4))
+            probed.update(zip(to_probe, map_jobs(self._probe_url, to_probe, jobs=jobs)))
+            statuses = [status or probed[url] for url, status in zip(urls, statuses)]
+        return statuses
+
     def req_REMOVE(self, key):
         """
         REMOVE-SUCCESS Key
@@ -152,26 +355,153 @@ class DataladAnnexCustomRemote(AnnexCustomRemote):
 
         # TODO: We might want that one to be a generator so we do not bother requesting
         # all possible urls at once from annex.
-        urls = self.get_URLS(key)
+        urls = self.hosts_health.rank(self.get_URLS(key))
+
+        url = self._download(urls, path)
+        if time.time() - self._hosts_health_saved > _HOSTS_HEALTH_SAVE_INTERVAL:
+            self._save_hosts_health()
+        if url:
+            lgr.info("Succesfully downloaded %s into %s" % (url, path))
+            self.send('TRANSFER-SUCCESS', cmd, key)
+        else:
+            self.send('TRANSFER-FAILURE', cmd, key,
+                      "Failed to download from any of %d locations" % len(urls))
 
-        if self._last_url in urls:
-            # place it first among candidates... some kind of a heuristic
-            urls.pop(self._last_url)
-            urls = [self._last_url] + urls
+    def _save_hosts_health(self):
+        """Share our experience with other (e.g. -J) instances"""
+        if self._hosts_health is None:
+            return
+        self._hosts_health_saved = time.time()
+        try:
+            self.hosts_health.save()
+        except Exception as exc:
+            lgr.debug("Failed to save hosts health: %s" % exc_str(exc))
+
+    def _record_failure(self, url, exc):
+        from ..downloaders.base import TargetFileAbsent
+        if not isinstance(exc, TargetFileAbsent):
+            # host might be just fine, but not have the file
+            self.hosts_health.record_failure(url)
+
+    def _get_hedge_timeout(self, url):
+        """Return how long to wait for a download from url before trying the next one"""
+        timeout = float(cfg.get('datalad', 'download hedge timeout', default=30))
+        rec = self.hosts_health.get(url)
+        if timeout and rec and rec['duration']:
+            # do not give up on a host sooner than it usually takes
+            timeout = max(timeout, 2 * rec['duration'])
+        return timeout
 
-        # TODO: priorities etc depending on previous experience or settings
+    def _download_url(self, url, path):
+        t0 = time.time()
+        self.providers.download(url, path=path, overwrite=True)
+        self.hosts_health.record_success(url, time.time() - t0)
 
-        for url in urls:
+    def _download(self, urls, path):
+        """Download from the first URL which works (into path)
+
+        If a download takes longer than the hedge timeout, download from the
+        next URL gets started in parallel and the one which finishes first
+        wins.  Every download goes into its own file, so the slower one(s)
+        do not interfere.
+
+        Returns
+        -------
+        str or None
+          URL which was downloaded from
+        """
+        if not urls:
+            self.debug("No URLs to download from")
+            return None
+        if len(urls) == 1 or not self._get_hedge_timeout(urls[0]):
+            # nothing to race
+            for url in urls:
+                try:
+                    self._download_url(url, path)
+                    return url
+                except Exception as exc:
+                    self._record_failure(url, exc)
+                    self.debug("Failed to download url %s: %s" % (url, exc_str(exc)))
+            return None
+
+        results = Queue()
+        done = threading.Event()
+        # makes checking for the winner and reporting the result atomic, so
+        # no result gets reported after the winner drained the queue
+        lock = threading.Lock()
+
+        def download(url, target):
             try:
-                downloaded_path = self._providers.download(url, path=path, overwrite=True)
-                lgr.info("Succesfully downloaded %s into %s" % (url, downloaded_path))
-                self.send('TRANSFER-SUCCESS', cmd, key)
-                return
-            except Exception as exc:
-                self.debug("Failed to download url %s for key %s: %s" % (url, key, exc_str(exc)))
+                self._download_url(url, target)
+                exc = None
+            except Exception as exc_:
+                self._record_failure(url, exc_)
+                exc = exc_
+            with lock:
+                lost = done.is_set()
+                if not lost:
+                    results.put((url, target, exc))
+            if lost and exists(target):
+                # we lost the race
+                os.unlink(target)
+            if lost:
+                with self._hedge_lock:
+                    self._hedge_targets.discard(target)
+
+        def start(i):
+            target = '%s.datalad-hedge-%d' % (path, i)
+            with self._hedge_lock:
+                self._hedge_targets.add(target)
+            thread = threading.Thread(target=download, args=(urls[i], target))
+            thread.daemon = True
+            thread.start()
+
+        start(0)
+        inext, running = 1, 1
+        while running:
+            try:
+                timeout = self._get_hedge_timeout(urls[inext - 1]) \
+                    if inext < len(urls) else None
+                url, target, exc = results.get(timeout=timeout)
+            except Empty:
+                self.debug("Download from %s takes long, trying %s in parallel"
+                           % (urls[inext - 1], urls[inext]))
+                start(inext)
+                inext, running = inext + 1, running + 1
+                continue
+            running -= 1
+            if exc is None:
+                with lock:
+                    done.set()
+                os.rename(target, path)
+                finished = [target]
+                # those which finished before we have declared the winner.
+                # The ones still running clean up after themselves
+                while not results.empty():
+                    target = results.get()[1]
+                    finished.append(target)
+                    if exists(target):
+                        os.unlink(target)
+                with self._hedge_lock:
+                    self._hedge_targets.difference_update(finished)
+                return url
+            self.debug("Failed to download url %s: %s" % (url, exc_str(exc)))
+            if exists(target):
+                # do not leave partial downloads behind
+                os.unlink(target)
+            with self._hedge_lock:
+                self._hedge_targets.discard(target)
+            if inext < len(urls) and not running:
+                start(inext)
+                inext, running = inext + 1, running + 1
+        return None
 
-        self.send('TRANSFER-FAILURE', cmd, key,
-                  "Failed to download from any of %d locations" % len(urls))
+    @property
+    def hosts_health(self):
+        if self._hosts_health is None:
+            from ..downloaders.health import HostsHealth
+            self._hosts_health = HostsHealth()
+        return self._hosts_health
 
 
 from .main import main as super_main
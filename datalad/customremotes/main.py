@@ -22,6 +22,7 @@ from ..cmdline.main import _license_info
 
 from ..utils import setup_exceptionhook
 from ..utils import use_cassette
+from ..support.profiling import Profiler
 from ..ui import ui
 
 backends = ['archive']
@@ -119,15 +120,22 @@ def main(args=None, backend=None):
 
     ui.set_backend('annex')  # stdin/stdout will be used for interactions with annex
 
-    if args.common_debug:
-        # So we could see/stop clearly at the point of failure
-        setup_exceptionhook()
-        _main(args, backend)
-    else:
-        # Otherwise - guard and only log the summary. Postmortem is not
-        # as convenient if being caught in this ultimate except
-        try:
+    # we are ran by annex, so profiling could be requested only via environment
+    profiler = Profiler.from_env()
+    try:
+        if args.common_debug:
+            # So we could see/stop clearly at the point of failure
+            setup_exceptionhook()
             _main(args, backend)
-        except Exception as exc:
-            lgr.error('%s (%s)' % (str(exc), exc.__class__.__name__))
-            sys.exit(1)
+        else:
+            # Otherwise - guard and only log the summary. Postmortem is not
+            # as convenient if being caught in this ultimate except
+            try:
+                _main(args, backend)
+            except Exception as exc:
+                lgr.error('%s (%s)' % (str(exc), exc.__class__.__name__))
+                sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.save()
@@ -12,6 +12,7 @@ from ..archives import ArchiveAnnexCustomRemote
 from ...support.annexrepo import AnnexRepo
 from ...consts import ARCHIVES_SPECIAL_REMOTE
 from ...tests.utils import *
+from os.path import dirname
 
 from . import _get_custom_runner
 
@@ -118,3 +119,61 @@ def test_no_rdflib_loaded():
         # print cmo.out
         assert_not_in("rdflib", cmo.out)
         assert_not_in("rdflib", cmo.err)
+
+
+@with_tree(tree=(('a.tar.gz', (('d', (('1.txt', '1'), ('2.txt', '2'))),)),
+                 ('b.tar.gz', (('d', (('3.txt', '3'),)),)),
+                 ('broken.tar.gz', 'not an archive')))
+@with_tempfile(mkdir=True)
+def test_ArchiveTransferScheduler(d, outdir):
+    from ..archives import ArchiveTransferScheduler
+    from ...support.archives import ArchivesCache
+    fetched = []
+
+    def fetch(akey):
+        fetched.append(akey)
+        if akey == 'missing':
+            raise RuntimeError("no %s" % akey)
+        return opj(d, akey)
+
+    cache = ArchivesCache()
+    scheduler = ArchiveTransferScheduler(fetch, cache)
+    prefetch = scheduler.get_prefetch('a.tar.gz')
+    # the same archive is fetched and extracted only once
+    ok_(scheduler.get_prefetch('a.tar.gz') is prefetch)
+    for f in '1.txt', '2.txt':
+        prefetch.get_file(opj('a', 'd', f), opj(outdir, f))
+        ok_file_has_content(opj(outdir, f), f[0])
+    prefetch.extracted.wait()
+    eq_(prefetch.extract_error, None)
+    extracted_path = cache[opj(d, 'a.tar.gz')].path
+    ok_(exists(extracted_path))
+
+    prefetch_a = prefetch
+    prefetch = scheduler.get_prefetch('b.tar.gz')
+    prefetch.get_file(opj('b', 'd', '3.txt'), opj(outdir, '3.txt'))
+    ok_file_has_content(opj(outdir, '3.txt'), '3')
+    # extraction of the previous archive is kept for its next burst
+    ok_(exists(extracted_path))
+    ok_(scheduler.get_prefetch('a.tar.gz') is prefetch_a)
+
+    # failed extraction leaves nothing behind to be taken for extracted
+    with swallow_logs():
+        prefetch = scheduler.get_prefetch('broken.tar.gz')
+        prefetch.extracted.wait()
+    ok_(prefetch.extract_error is not None)
+    broken_path = cache[opj(d, 'broken.tar.gz')].path
+    ok_(not exists(broken_path))
+    eq_(sorted(os.listdir(dirname(broken_path))),
+        sorted(basename(cache[opj(d, a)].path) for a in ('a.tar.gz', 'b.tar.gz')))
+
+    prefetch = scheduler.get_prefetch('missing')
+    assert_raises(RuntimeError, prefetch.get_file, '1.txt', opj(outdir, '4.txt'))
+    # failed ones get tried again
+    prefetch = scheduler.get_prefetch('missing')
+    assert_raises(RuntimeError, prefetch.get_file, '1.txt', opj(outdir, '4.txt'))
+    eq_(fetched, ['a.tar.gz', 'b.tar.gz', 'broken.tar.gz', 'missing', 'missing'])
+
+    scheduler.release()
+    ok_(not exists(extracted_path))
+    cache.clean()
@@ -12,7 +12,13 @@ from ...support.annexrepo import AnnexRepo
 from ...consts import DATALAD_SPECIAL_REMOTE
 from ...tests.utils import *
 
+import time
+
+from mock import patch
+
 from . import _get_custom_runner
+from ..base import AnnexRemoteQuit
+from ... import cfg
 from ...support.exceptions import CommandError
 from ...downloaders.tests.utils import get_test_providers
 
@@ -52,3 +58,163 @@ def test_basic_scenario():
     yield check_basic_scenario, False
     if not on_windows:
         yield check_basic_scenario, True
+
+
+@with_tempfile(mkdir=True)
+def test_lazy_initialization(d):
+    from ..datalad import DataladAnnexCustomRemote
+    from six.moves import StringIO
+    remote = DataladAnnexCustomRemote(path=d)
+    remote.fin = StringIO("GETCOST\n\n")
+    remote.fout = StringIO()
+    remote.main()
+    eq_(remote.fout.getvalue(), "VERSION 1\nCOST 100\n")
+    # neither repository nor providers were needed to answer
+    ok_(remote._repo is None)
+    ok_(remote._providers is None)
+
+
+class _Providers(object):
+    """Providers which download from the URLs after the given delays"""
+
+    def __init__(self, delays):
+        self.delays = delays
+
+    def download(self, url, path=None, overwrite=False):
+        delay = self.delays[url]
+        if delay is None:
+            raise IOError("Failed to download %s" % url)
+        elif delay == 'absent':
+            from ...downloaders.base import TargetFileAbsent
+            raise TargetFileAbsent("No %s" % url)
+        time.sleep(delay)
+        with open(path, 'w') as f:
+            f.write(url)
+        return path
+
+
+@with_tempfile(mkdir=True)
+def test_download_ranked_hedged(d):
+    from ..datalad import DataladAnnexCustomRemote
+    from ...downloaders.health import HostsHealth
+    remote = DataladAnnexCustomRemote(
+        path=d, hosts_health=HostsHealth(opj(d, 'health.json')))
+    remote._providers = _Providers({
+        'http://slow.com/f': 1, 'http://fast.com/f': 0, 'http://dead.com/f': None})
+    remote._get_hedge_timeout = lambda url: 0.1
+    target = opj(d, 'target')
+
+    # the first one is slow, so the next one gets tried in parallel and wins
+    eq_(remote._download(['http://slow.com/f', 'http://fast.com/f'], target),
+        'http://fast.com/f')
+    ok_file_has_content(target, 'http://fast.com/f')
+    # the slow one finishes later but does not interfere
+    time.sleep(1.2)
+    ok_file_has_content(target, 'http://fast.com/f')
+    eq_(sorted(os.listdir(d)), ['target'])
+
+    # failures are remembered, so next time dead host gets tried last
+    eq_(remote._download(['http://dead.com/f', 'http://fast.com/f'], target),
+        'http://fast.com/f')
+    eq_(remote.hosts_health.get('http://dead.com/')['failures'], 1)
+    eq_(remote._download(['http://dead.com/f'], target), None)
+    # nothing to download from
+    eq_(remote._download([], target), None)
+    eq_(remote.hosts_health.rank(
+        ['http://dead.com/f', 'http://slow.com/f', 'http://fast.com/f']),
+        ['http://fast.com/f', 'http://slow.com/f', 'http://dead.com/f'])
+    # host which just lacks the file is not considered failing
+    remote._providers.delays['http://fast.com/absent'] = 'absent'
+    eq_(remote._download(['http://fast.com/absent'], target), None)
+    eq_(remote.hosts_health.get('http://fast.com/')['failures'], 0)
+    # health is not stored after every download, but upon stop
+    assert_false(exists(opj(d, 'health.json')))
+
+    # downloads still running upon stop get cleaned up
+    remote._providers.delays['http://slower.com/f'] = 2
+    remote._download(['http://slower.com/f', 'http://fast.com/f'], target)
+    ok_(remote._hedge_targets)
+    with open(list(remote._hedge_targets)[0] + '.datalad-download-temp', 'w'):
+        pass
+    assert_raises(AnnexRemoteQuit, remote.stop)
+    eq_(sorted(os.listdir(d)), ['health.json', 'target'])
+    ok_(HostsHealth(opj(d, 'health.json')).get('http://dead.com/')['failures'])
+
+
+@with_tempfile(mkdir=True)
+def test_url_statuses_cached(d):
+    from ..datalad import DataladAnnexCustomRemote
+    from ...downloaders.base import TargetFileAbsent
+    from ...support.cache import PersistentCache
+    probed = []
+
+    class _StatusProviders(object):
+        def get_status(self, url):
+            probed.append(url)
+            if 'absent' in url:
+                raise TargetFileAbsent("no %s" % url)
+            elif 'down' in url:
+                raise IOError("cannot connect")
+            return {'size': 1}
+
+    cache = PersistentCache(opj(d, 'statuses.sqlite'), ttl=100)
+    remote = DataladAnnexCustomRemote(path=d, status_cache=cache)
+    remote._providers = _StatusProviders()
+    urls = ['http://absent.com/f', 'http://down.com/f', 'http://up.com/f']
+    eq_(remote._get_url_statuses(urls), ['absent', 'unknown', 'present'])
+    eq_(sorted(probed), sorted(urls))
+    # absent ones are taken from the cache, shared with other remotes
+    del probed[:]
+    remote = DataladAnnexCustomRemote(
+        path=d, status_cache=PersistentCache(cache.path, ttl=100))
+    remote._providers = _StatusProviders()
+    eq_(remote._get_url_statuses(urls), ['absent', 'unknown', 'present'])
+    eq_(sorted(probed), ['http://down.com/f', 'http://up.com/f'])
+    # present ones only if asked for, since annex relies on them e.g. to drop
+    with patch.object(cfg, 'getboolean', return_value=True):
+        remote._get_url_statuses(urls)
+    del probed[:]
+    eq_(remote._get_url_statuses(urls), ['absent', 'unknown', 'present'])
+    eq_(probed, ['http://down.com/f'])
+    # but not the expired ones
+    del probed[:]
+    remote.status_cache.ttl = 0
+    eq_(remote._get_url_statuses(urls[:1]), ['absent'])
+    eq_(probed, urls[:1])
+
+
+@with_tempfile(mkdir=True)
+def test_checkpresent_prefetched(d):
+    from ..datalad import DataladAnnexCustomRemote
+    from ...support.cache import PersistentCache
+    from six.moves import StringIO
+    probed = []
+
+    class _StatusProviders(object):
+        def get_status(self, url):
+            probed.append(url)
+            return {'size': 1}
+
+    remote = DataladAnnexCustomRemote(
+        path=d, status_cache=PersistentCache(opj(d, 'statuses.sqlite'), ttl=100))
+    remote._providers = _StatusProviders()
+    remote.fout = StringIO()
+    remote._in_the_loop = True
+    keys = ['K%d' % i for i in range(4)]
+    remote._keys, remote._keys_order = keys, dict((k, i) for i, k in enumerate(keys))
+    asked = []
+
+    def get_URLS(key):
+        asked.append(key)
+        return ['http://example.com/%s' % key]
+    remote.get_URLS = get_URLS
+
+    with patch.object(cfg, 'get', lambda s, o, default=None: {
+            'status prefetch': '2'}.get(o, default)):
+        for key in keys:
+            remote.req_CHECKPRESENT(key)
+    eq_(remote.fout.getvalue(),
+        ''.join('CHECKPRESENT-SUCCESS %s\n' % k for k in keys))
+    # URLs of every key were requested and probed only once, mostly ahead
+    eq_(asked, keys)
+    eq_(sorted(probed), ['http://example.com/%s' % k for k in keys])
@@ -14,6 +14,7 @@ __docformat__ = 'restructuredtext'
 
 import logging
 
+from distutils.version import LooseVersion
 from os.path import join as opj, abspath, basename, relpath, normpath
 
 from six.moves.urllib.parse import urlparse
@@ -22,10 +23,9 @@ from datalad.support.param import Parameter
 from datalad.support.constraints import EnsureStr, EnsureNone, EnsureBool
 from datalad.support.constraints import EnsureChoice
 from datalad.support.gitrepo import GitRepo
-from datalad.cmd import Runner
+from datalad.support.sshconnector import SSHManager
 from ..interface.base import Interface
 from datalad.distribution.dataset import EnsureDataset, Dataset, datasetmethod
-from datalad.cmd import CommandError
 from datalad.utils import not_supported_on_windows, getpwd
 from .add_sibling import AddSibling
 
@@ -154,7 +154,6 @@ class CreatePublicationTargetSSHWebserver(Interface):
 
         # determine target parameters:
         parsed_target = urlparse(sshurl)
-        host_name = parsed_target.netloc
 
         # TODO: Sufficient to fail on this condition?
         if not parsed_target.netloc:
@@ -188,135 +187,15 @@ class CreatePublicationTargetSSHWebserver(Interface):
         # setup SSH Connection:
         # TODO: Make the entire setup a helper to use it when pushing via
         # publish?
-
-        # - build control master:
-        from datalad.utils import assure_dir
         not_supported_on_windows("TODO")
-        from os import geteuid  # Linux specific import
-        var_run_user_datalad = "/var/run/user/%s/datalad" % geteuid()
-        assure_dir(var_run_user_datalad)
-        control_path = "%s/%s" % (var_run_user_datalad, host_name)
-        control_path += ":%s" % parsed_target.port if parsed_target.port else ""
-
-        # - start control master:
-        cmd = "ssh -o ControlMaster=yes -o \"ControlPath=%s\" " \
-              "-o ControlPersist=yes %s exit" % (control_path, host_name)
-        lgr.debug("Try starting control master by calling:\n%s" % cmd)
-        import subprocess
-        proc = subprocess.Popen(cmd, shell=True)
-        proc.communicate(input="\n")  # why the f.. this is necessary?
-
-        runner = Runner()
-        ssh_cmd = ["ssh", "-S", control_path, host_name]
-
-        lgr.info("Creating target datasets ...")
-        for current_dataset in datasets:
-            if not replicate_local_structure:
-                path = target_dir.replace("%NAME",
-                                          current_dataset.replace("/", "-"))
-            else:
-                # TODO: opj depends on local platform, not the remote one.
-                # check how to deal with it. Does windows ssh server accept
-                # posix paths? vice versa? Should planned SSH class provide
-                # tools for this issue?
-                path = normpath(opj(target_dir,
-                                    relpath(datasets[current_dataset].path,
-                                            start=ds.path)))
-
-            if path != '.':
-                # check if target exists
-                # TODO: Is this condition valid for != '.' only?
-                path_exists = True
-                cmd = ssh_cmd + ["ls", path]
-                try:
-                    out, err = runner.run(cmd, expect_fail=True,
-                                          expect_stderr=True)
-                except CommandError as e:
-                    if "No such file or directory" in e.stderr and \
-                                    path in e.stderr:
-                        path_exists = False
-                    else:
-                        raise  # It's an unexpected failure here
-
-                if path_exists:
-                    if existing == 'raise':
-                        raise RuntimeError(
-                            "Target directory %s already exists." % path)
-                    elif existing == 'skip':
-                        continue
-                    elif existing == 'replace':
-                        pass
-                    else:
-                        raise ValueError("Do not know how to hand existing=%s" % repr(existing))
-
-                cmd = ssh_cmd + ["mkdir", "-p", path]
-                try:
-                    runner.run(cmd)
-                except CommandError as e:
-                    lgr.error("Remotely creating target directory failed at "
-                              "%s.\nError: %s" % (path, str(e)))
-                    continue
-
-            # init git repo
-            cmd = ssh_cmd + ["git", "-C", path, "init"]
-            if shared:
-                cmd.append("--shared=%s" % shared)
-            try:
-                runner.run(cmd)
-            except CommandError as e:
-                lgr.error("Remotely initializing git repository failed at %s."
-                          "\nError: %s\nSkipping ..." % (path, str(e)))
-                continue
-
-            # check git version on remote end:
-            cmd = ssh_cmd + ["git", "version"]
-            try:
-                out, err = runner.run(cmd)
-                git_version = out.lstrip("git version").strip()
-                lgr.debug("Detected git version on server: %s" % git_version)
-                if git_version < "2.4":
-                    lgr.error("Git version >= 2.4 needed to configure remote."
-                              " Version detected on server: %s\nSkipping ..."
-                              % git_version)
-                    continue
-
-            except CommandError as e:
-                lgr.warning(
-                    "Failed to determine git version on remote.\n"
-                    "Error: {0}\nTrying to configure anyway "
-                    "...".format(e.message))
-
-            # allow for pushing to checked out branch
-            cmd = ssh_cmd + ["git", "-C", path, "config",
-                             "receive.denyCurrentBranch",
-                             "updateInstead"]
-            try:
-                runner.run(cmd)
-            except CommandError as e:
-                lgr.warning("git config failed at remote location %s.\n"
-                            "You will not be able to push to checked out "
-                            "branch." % path)
-
-            # enable post-update hook:
-            cmd = ssh_cmd + ["mv", opj(path, ".git/hooks/post-update.sample"),
-                             opj(path, ".git/hooks/post-update")]
-            try:
-                runner.run(cmd)
-            except CommandError as e:
-                lgr.error("Failed to enable post update hook.\n"
-                          "Error: %s" % e.message)
-
-            # initially update server info "manually":
-            cmd = ssh_cmd + ["git", "-C", path, "update-server-info"]
-            try:
-                runner.run(cmd)
-            except CommandError as e:
-                lgr.error("Failed to update server info.\n"
-                          "Error: %s" % e.message)
-
-        # stop controlmaster (close ssh connection):
-        cmd = ["ssh", "-O", "stop", "-S", control_path, host_name]
-        out, err = runner.run(cmd, expect_stderr=True)
+        ssh_manager = SSHManager()
+        ssh = ssh_manager.get_connection(sshurl)
+        try:
+            _create_targets(ssh, ds, datasets, target_dir,
+                            replicate_local_structure, existing, shared)
+        finally:
+            # stop controlmaster (close ssh connection):
+            ssh_manager.close()
 
         if target:
             # add the sibling(s):
@@ -332,3 +211,116 @@ class CreatePublicationTargetSSHWebserver(Interface):
                                          force=existing in {'replace'})
 
         # TODO: Return value!?
+
+
+def _create_targets(ssh, ds, datasets, target_dir, replicate_local_structure,
+                    existing, shared):
+    """Create target datasets on the server using the SSH connection
+
+    All the checks are done within a single round trip, and then all the
+    targets get created within another one
+    """
+    paths = []
+    for current_dataset in datasets:
+        if not replicate_local_structure:
+            path = target_dir.replace("%NAME",
+                                      current_dataset.replace("/", "-"))
+        else:
+            # TODO: opj depends on local platform, not the remote one.
+            # check how to deal with it. Does windows ssh server accept
+            # posix paths? vice versa? Should planned SSH class provide
+            # tools for this issue?
+            path = normpath(opj(target_dir,
+                                relpath(datasets[current_dataset].path,
+                                        start=ds.path)))
+        paths.append(path)
+
+    # check git version on remote end and which targets exist
+    # TODO: Is this condition valid for != '.' only?
+    checked_paths = [path for path in paths if path != '.']
+    results = ssh.run_batch(
+        [["git", "version"]] + [["test", "-e", path] for path in checked_paths])
+    status, out, err = results[0]
+    configure = True
+    if status == 0:
+        git_version = out.strip()[len("git version"):].strip()
+        lgr.debug("Detected git version on server: %s" % git_version)
+        if LooseVersion(git_version) < LooseVersion("2.4"):
+            lgr.error("Git version >= 2.4 needed to configure remote."
+                      " Version detected on server: %s\nSkipping ..."
+                      % git_version)
+            configure = False
+    else:
+        lgr.warning(
+            "Failed to determine git version on remote.\n"
+            "Error: {0}\nTrying to configure anyway "
+            "...".format(err))
+    existing_paths = set()
+    for path, (status, out, err) in zip(checked_paths, results[1:]):
+        if status is None or status > 1:
+            raise RuntimeError("Failed to check if %s exists: %s" % (path, err))
+        elif status == 0:
+            existing_paths.add(path)
+
+    # commands to run per each target: (cmd, error message, skip the rest)
+    steps = []
+    for path in paths:
+        if path in existing_paths:
+            if existing == 'raise':
+                raise RuntimeError(
+                    "Target directory %s already exists." % path)
+            elif existing == 'skip':
+                continue
+            elif existing == 'replace':
+                pass
+            else:
+                raise ValueError("Do not know how to hand existing=%s" % repr(existing))
+
+        path_steps = []
+        if path != '.':
+            path_steps.append(
+                (["mkdir", "-p", path],
+                 "Remotely creating target directory failed at %s." % path,
+                 True))
+        # init git repo
+        cmd = ["git", "-C", path, "init"]
+        if shared:
+            cmd.append("--shared=%s" % shared)
+        path_steps.append(
+            (cmd,
+             "Remotely initializing git repository failed at %s." % path,
+             True))
+        if configure:
+            path_steps += [
+                # allow for pushing to checked out branch
+                (["git", "-C", path, "config",
+                  "receive.denyCurrentBranch", "updateInstead"],
+                 "git config failed at remote location %s.\n"
+                 "You will not be able to push to checked out branch." % path,
+                 False),
+                # enable post-update hook:
+                (["mv", opj(path, ".git/hooks/post-update.sample"),
+                  opj(path, ".git/hooks/post-update")],
+                 "Failed to enable post update hook.",
+                 False),
+                # initially update server info "manually":
+                (["git", "-C", path, "update-server-info"],
+                 "Failed to update server info.",
+                 False),
+            ]
+        steps.append(path_steps)
+
+    lgr.info("Creating target datasets ...")
+    results = iter(ssh.run_batch(
+        [cmd for path_steps in steps for cmd, _, _ in path_steps]))
+    for path_steps in steps:
+        failed = False
+        for cmd, msg, required in path_steps:
+            status, out, err = next(results)
+            if failed:
+                # the rest of the steps for this target were doomed
+                continue
+            if status != 0:
+                lgr.error("%s\nError: %s" % (msg, err))
+                if required:
+                    failed = True
@@ -50,6 +50,21 @@ def resolve_path(path, ds=None):
         return normpath(opj(ds.path, path))
 
 
+_interface_specs = None
+
+
+def _get_interface_specs():
+    """Return {api name: spec} for all the known interfaces"""
+    global _interface_specs
+    if _interface_specs is None:
+        from datalad.interface.base import get_interface_groups
+        from datalad.interface.base import get_api_name
+        _interface_specs = dict(
+            (get_api_name(spec), spec)
+            for _, _, specs in get_interface_groups() for spec in specs)
+    return _interface_specs
+
+
 class Dataset(object):
     __slots__ = ['_path', '_repo']
 
@@ -60,6 +75,22 @@ class Dataset(object):
     def __repr__(self):
         return "<Dataset path=%s>" % self.path
 
+    def __getattr__(self, attr):
+        if hasattr(self.__class__, attr):
+            # AttributeError was raised e.g. within a property, so let it
+            # through as is
+            return object.__getattribute__(self, attr)
+        # methods provided by interfaces get bound (see `datasetmethod`) only
+        # upon import of their modules, which is delayed (see datalad.api)
+        intfspec = _get_interface_specs().get(attr)
+        if intfspec is not None:
+            from datalad.interface.base import load_interface
+            load_interface(intfspec)
+            if attr in Dataset.__dict__:
+                return getattr(self, attr)
+        raise AttributeError(
+            "%r object has no attribute %r" % (self.__class__.__name__, attr))
+
     @property
     def path(self):
         """path to the dataset"""
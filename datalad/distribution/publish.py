@@ -16,11 +16,12 @@ __docformat__ = 'restructuredtext'
 import logging
 
 from os import curdir
-from os.path import join as opj, abspath, exists, relpath
+from os.path import join as opj, abspath, exists, relpath, sep
 
 from six import string_types
 from datalad.support.param import Parameter
 from datalad.support.constraints import EnsureStr, EnsureNone, EnsureListOf
+from datalad.support.constraints import EnsureInt
 from datalad.support.gitrepo import GitRepo
 from datalad.support.annexrepo import AnnexRepo, FileInGitError, \
     FileNotInAnnexError
@@ -28,6 +29,7 @@ from datalad.interface.base import Interface
 from datalad.distribution.dataset import EnsureDataset, Dataset, \
     datasetmethod, resolve_path
 from datalad.distribution.install import get_containing_subdataset
+from datalad.support.parallel import map_jobs
 from datalad.cmd import CommandError
 
 lgr = logging.getLogger('datalad.distribution.publish')
@@ -86,14 +88,19 @@ class Publish(Interface):
             args=("--with-data",),
             doc="shell pattern",
             constraints=EnsureListOf(string_types) | EnsureNone(),
-            nargs='*'),)
+            nargs='*'),
+        jobs=Parameter(
+            args=("-J", "--jobs"),
+            doc="""number of parallel jobs to use for publishing subdatasets
+            and for copying data to the target""",
+            constraints=EnsureInt() | EnsureNone()),)
 
     @staticmethod
     @datasetmethod(name='publish')
     def __call__(dataset=None, dest=None, path=None,
                  # Note: add remote currently disabled in publish
                  # dest_url=None, dest_pushurl=None,
-                 with_data=None, recursive=False):
+                 with_data=None, recursive=False, jobs=None):
 
         # Note: add remote currently disabled in publish
         # if dest is None and (dest_url is not None
@@ -118,7 +125,8 @@ class Publish(Interface):
                     # dest_url=dest_url,
                     # dest_pushurl=dest_pushurl,
                     with_data=with_data,
-                    recursive=recursive) for p in path]
+                    recursive=recursive,
+                    jobs=jobs) for p in path]
 
         # resolve the location against the provided dataset
         if path is not None:
@@ -152,7 +160,8 @@ class Publish(Interface):
                                          # dest_url=dest_url,
                                          # dest_pushurl=dest_pushurl,
                                          with_data=with_data,
-                                         recursive=recursive)
+                                         recursive=recursive,
+                                         jobs=jobs)
 
         # now, we know, we have to operate on ds. So, ds needs to be installed,
         # since we cannot publish anything from a not installed dataset,
@@ -264,36 +273,46 @@ class Publish(Interface):
         # Figure out, what to publish
         if path is None or path == ds.path:
             # => publish the dataset itself
-            # push local state:
-            # TODO: Rework git_push in GitRepo
-            cmd = ['git', 'push']
-            if set_upstream:
-                # no upstream branch yet
-                cmd.append("--set-upstream")
-            cmd += [dest_resolved, ds.repo.git_get_active_branch()]
-            ds.repo._git_custom_command('', cmd)
-            # push annex branch:
-            if isinstance(ds.repo, AnnexRepo):
-                ds.repo.git_push("%s +git-annex:git-annex" % dest_resolved)
+            if not set_upstream and _is_up_to_date(ds, dest_resolved):
+                lgr.info("%s is up to date in '%s'. Skipping push."
+                         % (ds, dest_resolved))
+            else:
+                # push local state:
+                # TODO: Rework git_push in GitRepo
+                cmd = ['git', 'push']
+                if set_upstream:
+                    # no upstream branch yet
+                    cmd.append("--set-upstream")
+                cmd += [dest_resolved, ds.repo.git_get_active_branch()]
+                ds.repo._git_custom_command('', cmd)
+                # push annex branch:
+                if isinstance(ds.repo, AnnexRepo):
+                    ds.repo.git_push("%s +git-annex:git-annex" % dest_resolved)
 
             # TODO: if with_data is a shell pattern, we get a list, when called
             # from shell, right?
             # => adapt the following and check constraints to allow for that
             if with_data:
-                ds.repo._git_custom_command('', ["git", "annex", "copy"] +
-                                            with_data + ["--to", dest_resolved])
+                if _has_data_to_copy(ds, dest_resolved, with_data):
+                    jobs_opts = ["-J%d" % jobs] if jobs and jobs > 1 else []
+                    ds.repo._git_custom_command('', ["git", "annex", "copy"] +
+                                                jobs_opts + with_data +
+                                                ["--to", dest_resolved])
+                else:
+                    lgr.info("All requested data is present in '%s' already."
+                             % dest_resolved)
 
-            if recursive and ds.get_dataset_handles() != []:
-                results = [ds]
+            subdatasets = ds.get_dataset_handles(recursive=True) \
+                if recursive else []
+            if subdatasets:
                 # Note: add remote currently disabled in publish
                 # modify URL templates:
                 # if dest_url:
                 #     dest_url = dest_url.replace('%NAME', basename(ds.path) + '-%NAME')
                 # if dest_pushurl:
                 #     dest_pushurl = dest_pushurl.replace('%NAME', basename(ds.path) + '-%NAME')
-                for subds in ds.get_dataset_handles():
-                    results.append(Dataset(opj(ds.path,
-                                              subds)).publish(
+                def publish_subds(subds):
+                    return Dataset(opj(ds.path, subds)).publish(
                         dest=dest,
                         # Note: use `dest` instead of `dest_resolved` in case
                         # dest was None, so subdatasets would use their default
@@ -302,8 +321,14 @@ class Publish(Interface):
                         # dest_url=dest_url,
                         # dest_pushurl=dest_pushurl,
                         with_data=with_data,
-                        recursive=recursive))
-                return results
+                        recursive=False,
+                        jobs=jobs)
+                # subdatasets (at any depth) are independent, so they all get
+                # published concurrently by a single pool, instead of every
+                # level of recursion starting a pool of its own
+                results = dict(zip(subdatasets,
+                                   map_jobs(publish_subds, subdatasets, jobs)))
+                return _nest_results(ds, '', subdatasets, results)
 
             return ds
 
@@ -329,3 +354,79 @@ class Publish(Interface):
             # nothing to publish found
             lgr.warning("Nothing to publish found at %s." % path)
             return None
+
+
+def _nest_results(result, path, subdatasets, results):
+    """Nest results of publishing subdatasets as if published recursively
+
+    Parameters
+    ----------
+    result
+      Result of publishing the dataset at `path`
+    path : str
+      Path of the dataset relative to the top one ('' for the top one)
+    subdatasets : list of str
+      Paths of all subdatasets, as returned by recursive
+      `get_dataset_handles`, i.e. each one followed by its own subdatasets
+    results : dict
+      Result of publishing per each subdataset
+
+    Returns
+    -------
+    `result` if dataset has no subdatasets, or a list of it followed by
+    (nested) results of its subdatasets
+    """
+    prefix = path + sep if path else ''
+    # immediate subdatasets are those not within another subdataset of path
+    children = []
+    for sub in subdatasets:
+        if sub.startswith(prefix) and sub != path and \
+                not any(sub.startswith(c + sep) for c in children):
+            children.append(sub)
+    if not children:
+        return result
+    return [result] + [_nest_results(results[c], c, subdatasets, results)
+                       for c in children]
+
+
+def _is_up_to_date(ds, dest):
+    """Return True if `dest` already has all the branches we would push
+
+    A single `git ls-remote` call is used to compare the active branch (and
+    git-annex branch if any) against the remote, so datasets without changes
+    do not require a (costly) push.
+    """
+    try:
+        remote_refs = ds.repo.git_ls_remote(dest)
+    except CommandError as e:
+        lgr.debug("Failed to list references of '%s': %s" % (dest, e))
+        return False
+    branches = [ds.repo.git_get_active_branch()]
+    if isinstance(ds.repo, AnnexRepo):
+        branches.append('git-annex')
+    for branch in branches:
+        try:
+            local_hexsha = ds.repo.git_get_hexsha(branch)
+        except ValueError:
+            return False
+        if remote_refs.get('refs/heads/%s' % branch) != local_hexsha:
+            return False
+    return True
+
+
+def _has_data_to_copy(ds, dest, with_data):
+    """Return True if any annexed file among `with_data` is not known to be
+    present in `dest`
+
+    Uses a single `git annex find` call instead of trying to copy each file.
+    """
+    if not isinstance(ds.repo, AnnexRepo):
+        return True
+    try:
+        out, err = ds.repo._run_annex_command(
+            'find', annex_options=['--not', '--in=%s' % dest] + with_data)
+    except CommandError as e:
+        lgr.debug("Failed to figure out which files are missing in '%s': %s"
+                  % (dest, e))
+        return True
+    return bool(out.strip())
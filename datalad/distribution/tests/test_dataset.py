@@ -195,3 +195,20 @@ def test_subdatasets(path):
     assert_true(ds.is_installed())
     eq_(ds.get_dataset_handles(), [])
     # TODO actual submodule checkout is still there
+
+
+def test_dataset_getattr():
+    ds = Dataset('/nonexistent')
+    assert_raises(AttributeError, getattr, ds, 'bogus')
+    assert_raises(AttributeError, getattr, ds, '_bogus')
+    # methods of interfaces get bound upon first use
+    ok_(callable(ds.install))
+
+    # AttributeError raised within a property is not masked
+    class BrokenDataset(Dataset):
+        @property
+        def broken(self):
+            return self.path.bogus
+    with assert_raises(AttributeError) as cm:
+        BrokenDataset('/nonexistent').broken
+    assert_in("no attribute 'bogus'", str(cm.exception))
@@ -150,6 +150,12 @@ def test_publish_recursive(origin, src_path, dst_path, sub1_pub, sub2_pub):
     eq_(list(sub2_target.git_get_branch_commits("git-annex")),
         list(sub2.git_get_branch_commits("git-annex")))
 
+    # publishing again in parallel has nothing to push, but yields the same
+    res_ = publish(dataset=source, dest="target", recursive=True, jobs=2)
+    eq_([r.path for r in res_], [r.path for r in res])
+    eq_(list(sub2_target.git_get_branch_commits("master")),
+        list(sub2.git_get_branch_commits("master")))
+
 
 @with_testrepos('submodule_annex', flavors=['clone'])
 @with_tempfile(mkdir=True)
@@ -330,3 +336,12 @@ def test_publish_file_handle(origin, src_path, dst_path):
 #         list(sub2.git_get_branch_commits("master")))
 #     eq_(list(sub2_target.git_get_branch_commits("git-annex")),
 #         list(sub2.git_get_branch_commits("git-annex")))
+
+
+def test_nest_results():
+    from ..publish import _nest_results
+    subdatasets = ['a', opj('a', 'b'), opj('a', 'b', 'c'), opj('a', 'd'), 'e']
+    results = dict((s, s.upper()) for s in subdatasets)
+    eq_(_nest_results('TOP', '', subdatasets, results),
+        ['TOP', ['A', [opj('A', 'B'), opj('A', 'B', 'C')], opj('A', 'D')], 'E'])
+    eq_(_nest_results('TOP', '', [], {}), 'TOP')
@@ -135,3 +135,49 @@ def test_target_ssh_recursive(origin, src_path, target_path):
     for repo in [source.repo, sub1.repo, sub2.repo]:
         assert_not_in("local_target", repo.git_get_remotes())
 
+
+
+class _LocalConnection(object):
+    """Stand-in for an SSHConnection, running commands locally"""
+
+    def __init__(self):
+        self.nbatches = 0
+
+    def run_batch(self, cmds):
+        from datalad.cmd import Runner
+        from datalad.support.sshconnector import get_batch_script, \
+            parse_batch_output
+        self.nbatches += 1
+        out, err = Runner().run(["sh", "-s"], stdin=get_batch_script(cmds),
+                                expect_stderr=True)
+        return parse_batch_output(out, err, len(cmds))
+
+
+@skip_if_on_windows
+@with_tempfile(mkdir=True)
+@with_tempfile(mkdir=True)
+def test_create_targets_batched(src_path, target_path):
+    from datalad.distribution.create_publication_target_sshwebserver \
+        import _create_targets
+    ds = Dataset(src_path)
+    datasets = dict((name, Dataset(opj(src_path, name)))
+                    for name in ('ds', 'ds/sub1', 'ds/sub2'))
+    os.makedirs(opj(target_path, 'ds-sub2'))
+    ssh = _LocalConnection()
+    with assert_raises(RuntimeError) as cm:
+        _create_targets(ssh, ds, datasets, opj(target_path, '%NAME'), False,
+                        'raise', False)
+    eq_("Target directory %s already exists." % opj(target_path, 'ds-sub2'),
+        str(cm.exception))
+
+    _create_targets(ssh, ds, datasets, opj(target_path, '%NAME'), False,
+                    'skip', False)
+    # checks and creation of all the targets took a round trip each
+    eq_(ssh.nbatches, 3)
+    for name in ('ds', 'ds-sub1'):
+        repo = GitRepo(opj(target_path, name), create=False)
+        ok_(os.path.exists(opj(repo.path, '.git', 'hooks', 'post-update')))
+        eq_(repo.repo.git.config('receive.denyCurrentBranch'),
+            'updateInstead')
+    assert_raises(Exception, GitRepo, opj(target_path, 'ds-sub2'),
+                  create=False)
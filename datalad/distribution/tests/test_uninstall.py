@@ -0,0 +1,98 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Test uninstall action
+
+"""
+
+from os.path import join as opj, realpath
+
+from mock import patch
+
+from ..dataset import Dataset
+from .. import uninstall as uninstall_mod
+from ..uninstall import Uninstall
+from datalad.support.annexrepo import AnnexRepo
+from datalad.support.gitrepo import GitRepo
+
+from nose.tools import eq_
+from datalad.tests.utils import with_tree
+from datalad.tests.utils import assert_raises
+from datalad.tests.utils import swallow_logs
+
+
+class _FakeAnnex(AnnexRepo):
+    """Records drops instead of running annex.  'git*' files are not annexed"""
+
+    def __init__(self, path, failing):
+        self.path = path
+        self.failing = failing
+        self.dropped = []
+
+    def is_under_annex(self, files, normalize_paths=True):
+        return [not f.split('/')[-1].startswith('git') for f in files]
+
+    def drop(self, files, options=None):
+        self.dropped.append(files)
+        return dict((f, (f not in self.failing, 'failed' if f in self.failing else None))
+                    for f in files)
+
+
+class _FakeDataset(object):
+
+    repos = {}
+
+    def __init__(self, path):
+        self.repo = self.repos[path]
+
+
+@with_tree(tree={
+    'a': 'a', 'b': 'b', 'gita': 'gita', 'dir': {'c': 'c'},
+    'sub': {'d': 'd', 'e': 'e', 'gitf': 'gitf'}})
+def test_uninstall_paths(path):
+    GitRepo(path, create=True)
+    GitRepo(opj(path, 'sub'), create=True)
+    top, sub = realpath(path), realpath(opj(path, 'sub'))
+    ds = Dataset(path)
+    individually = []
+
+    def uninstall(dataset=None, path=None, data_only=True, recursive=False):
+        individually.append(path)
+        return 'uninstalled ' + path
+
+    def run(paths, failing=()):
+        del individually[:]
+        _FakeDataset.repos = {}
+        for p in top, sub:
+            # bypass the flyweight registry of the repositories
+            repo = _FakeDataset.repos[p] = object.__new__(_FakeAnnex)
+            repo.__init__(p, failing)
+        with patch.object(uninstall_mod, 'Dataset', _FakeDataset), \
+                patch.object(Uninstall, '__call__', staticmethod(uninstall)):
+            return uninstall_mod._uninstall_paths(
+                ds, paths, True, False, 2)
+
+    paths = ['a', 'sub/d', 'gita', 'dir', 'b', 'sub/e', 'sub/gitf']
+    results = run(paths)
+    # a single drop per dataset
+    eq_(_FakeDataset.repos[top].dropped, [['a', 'b']])
+    eq_(_FakeDataset.repos[sub].dropped, [['d', 'e']])
+    # directories and files not under annex are uninstalled one at a time
+    eq_(individually, ['gita', 'dir', 'sub/gitf'])
+    # results are reported per each path, in order
+    eq_(results,
+        [opj(top, 'a'), opj(sub, 'd'), 'uninstalled gita',
+         'uninstalled dir', opj(top, 'b'), opj(sub, 'e'),
+         'uninstalled sub/gitf'])
+
+    # failures to drop do not stop dropping of others, but all get reported
+    with swallow_logs(), assert_raises(RuntimeError) as cm:
+        run(paths, failing=('b', 'e'))
+    eq_(str(cm.exception),
+        "Failed to drop 2 file(s): %s, %s" % (opj(top, 'b'), opj(sub, 'e')))
+    eq_(individually, ['gita', 'dir', 'sub/gitf'])
@@ -144,3 +144,42 @@ def test_update_fetch_all(src, remote_1, remote_2):
     ds.repo.get_file_key("first.txt")  # raises if unknown
     eq_([False], ds.repo.file_has_content(["first.txt"]))
 
+
+
+@with_tempfile(mkdir=True)
+@with_tempfile
+def test_update_skips_unchanged(origin_path, clone_path):
+    from datalad.distribution.update import _is_fetched
+
+    origin = GitRepo(origin_path, create=True)
+    with open(opj(origin_path, 'file.txt'), 'w') as f:
+        f.write('content')
+    origin.git_add('file.txt')
+    origin.git_commit("initial")
+    clone = GitRepo(clone_path, url=origin_path)
+    ok_(_is_fetched(clone, 'origin', None, None))
+    ok_(_is_fetched(clone, 'origin', 'master', None))
+
+    # origin changes, so there is something to fetch
+    with open(opj(origin_path, 'file.txt'), 'w') as f:
+        f.write('changed')
+    origin.git_add('file.txt')
+    origin.git_commit("changed")
+    assert_false(_is_fetched(clone, 'origin', None, None))
+    assert_false(_is_fetched(clone, 'origin', 'master', None))
+    update(dataset=clone_path, jobs=2)
+    eq_(clone.repo.commit('origin/master').hexsha, origin.git_get_hexsha())
+    ok_(_is_fetched(clone, 'origin', None, None))
+    # or a new branch
+    origin.git_checkout('new', '-b')
+    assert_false(_is_fetched(clone, 'origin', None, None))
+    ok_(_is_fetched(clone, 'origin', 'master', None))
+    # or a new tag
+    origin.git_checkout('master')
+    origin._git_custom_command('', ['git', 'tag', '1.0'])
+    assert_false(_is_fetched(clone, 'origin', None, None))
+    assert_false(_is_fetched(clone, 'origin', 'master', None))
+    clone.git_fetch('origin', '--tags')
+    ok_(_is_fetched(clone, 'origin', 'master', None))
+    # nonexistent remote
+    assert_false(_is_fetched(clone, 'bogus', None, None))
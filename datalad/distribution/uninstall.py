@@ -13,12 +13,16 @@
 __docformat__ = 'restructuredtext'
 
 import logging
+from collections import OrderedDict
 from os.path import join as opj, abspath, exists, isabs, relpath, pardir, isdir
+from os.path import basename, dirname, lexists, realpath, sep
 from datalad.support.gitrepo import GitRepo
 from datalad.support.annexrepo import AnnexRepo, FileInGitError, \
     FileNotInAnnexError
 from datalad.support.param import Parameter
 from datalad.support.constraints import EnsureStr, EnsureNone, EnsureBool
+from datalad.support.constraints import EnsureInt
+from datalad.support.parallel import map_jobs
 from datalad.distribution.dataset import Dataset, EnsureDataset, \
     datasetmethod, resolve_path
 from datalad.distribution.install import get_containing_subdataset
@@ -71,11 +75,17 @@ class Uninstall(Interface):
             args=("-r", "--recursive"),
             doc="""If set, uninstall recursively, including all subdatasets.
             The value of `data` is used for recursive uninstallation, too.""",
-            action="store_true"))
+            action="store_true"),
+        jobs=Parameter(
+            args=("-J", "--jobs"),
+            doc="""number of datasets to uninstall data from in parallel,
+            whenever multiple paths are given""",
+            constraints=EnsureInt() | EnsureNone()))
 
     @staticmethod
     @datasetmethod(name='uninstall')
-    def __call__(dataset=None, path=None, data_only=True, recursive=False):
+    def __call__(dataset=None, path=None, data_only=True, recursive=False,
+                 jobs=None):
 
         # Note: copy logic from install to resolve dataset and path:
         # shortcut
@@ -91,12 +101,7 @@ class Uninstall(Interface):
                     "insufficient information for uninstallation (needs at "
                     "least a dataset or a path")
         elif isinstance(path, list):
-            # TODO: not sure. might be possible to deal with that list directly
-            return [Uninstall.__call__(
-                    dataset=ds,
-                    path=p,
-                    data_only=data_only,
-                    recursive=recursive) for p in path]
+            return _uninstall_paths(ds, path, data_only, recursive, jobs)
 
         # resolve the target location against the provided dataset
         if path is not None:
@@ -230,3 +235,75 @@ class Uninstall(Interface):
             raise ValueError("Cannot uninstall %s" % path)
 
 
+
+
+def _uninstall_paths(ds, paths, data_only, recursive, jobs):
+    """Uninstall multiple paths
+
+    Data of annexed files is dropped by a single annex call per each dataset
+    containing them (datasets are processed in parallel), while all other
+    paths are uninstalled one at a time.
+
+    Returns
+    -------
+    list
+      result per each path, as if it was uninstalled on its own
+    """
+    results = [None] * len(paths)
+    # dataset path: [(index, path relative to the dataset)]
+    to_drop = OrderedDict()
+    # indices of the paths to be uninstalled one at a time
+    individually = []
+    toppaths = {}  # cache of the datasets per directory
+    # toppaths have symlinks resolved
+    ds_path = realpath(ds.path) if ds is not None else None
+    for i, p in enumerate(paths):
+        path = resolve_path(p, ds)
+        if not data_only or not lexists(path) or isdir(path):
+            individually.append(i)
+            continue
+        d = dirname(path)
+        if d not in toppaths:
+            toppaths[d] = GitRepo.get_toppath(d)
+        dspath = toppaths[d]
+        if dspath is None or \
+                (ds_path is not None and dspath != ds_path and
+                 not dspath.startswith(ds_path + sep)):
+            individually.append(i)
+            continue
+        to_drop.setdefault(dspath, []).append(
+            (i, relpath(opj(realpath(d), basename(path)), start=dspath)))
+
+    def drop(item):
+        dspath, files = item
+        repo = Dataset(dspath).repo
+        if not isinstance(repo, AnnexRepo):
+            return [], [i for i, _ in files]
+        annexed = repo.is_under_annex([f for _, f in files],
+                                      normalize_paths=False)
+        to_drop = [(i, f) for (i, f), a in zip(files, annexed) if a]
+        lgr.info("Dropping data of %d file(s) from %s", len(to_drop), dspath)
+        dropped = repo.drop([f for _, f in to_drop]) if to_drop else {}
+        return [(i, opj(dspath, f), dropped[f]) for i, f in to_drop], \
+               [i for (i, f), a in zip(files, annexed) if not a]
+
+    failed = []
+    for dropped, rest in map_jobs(drop, to_drop.items(), jobs):
+        for i, path, (success, note) in dropped:
+            if success:
+                results[i] = path
+            else:
+                lgr.error("Failed to drop %s: %s" % (path, note))
+                failed.append(path)
+        individually.extend(rest)
+
+    for i in sorted(individually):
+        results[i] = Uninstall.__call__(
+            dataset=ds,
+            path=paths[i],
+            data_only=data_only,
+            recursive=recursive)
+    if failed:
+        raise RuntimeError("Failed to drop %d file(s): %s"
+                           % (len(failed), ', '.join(failed)))
+    return results
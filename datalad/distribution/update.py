@@ -14,10 +14,18 @@ __docformat__ = 'restructuredtext'
 
 
 import logging
+import threading
 
 from os.path import join as opj
+
+from six.moves.urllib.parse import urlparse
+
+from datalad import cfg
 from datalad.support.param import Parameter
 from datalad.support.constraints import EnsureStr, EnsureNone
+from datalad.support.constraints import EnsureInt
+from datalad.support.parallel import map_jobs
+from datalad.support.sshconnector import SSHManager
 from datalad.support.gitrepo import GitRepo
 from datalad.support.exceptions import CommandError
 from datalad.interface.base import Interface
@@ -61,13 +69,19 @@ class Update(Interface):
         reobtain_data=Parameter(
             args=("--reobtain-data",),
             action="store_true",
-            doc="TODO"),)
+            doc="TODO"),
+        jobs=Parameter(
+            args=("-J", "--jobs"),
+            doc="""number of datasets to update in parallel.  Fetches from
+            the same host are additionally limited by datalad.fetch host jobs
+            configuration (4 by default)""",
+            constraints=EnsureInt() | EnsureNone()),)
 
     @staticmethod
     @datasetmethod(name='update')
     def __call__(name=None, dataset=None,
                  merge=False, recursive=False, fetch_all=False,
-                 reobtain_data=False):
+                 reobtain_data=False, jobs=None):
         """
         """
         # TODO: Is there an 'update filehandle' similar to install and publish?
@@ -105,72 +119,191 @@ class Update(Interface):
                                 for sub_path in
                                 ds.get_dataset_handles(recursive=True)]
 
-        for repo in repos_to_update:
-            # get all remotes:
-            remotes = repo.git_get_remotes()
-            if name and name not in remotes:
-                lgr.warning("'%s' not known to dataset %s.\nSkipping" %
-                            (name, repo.path))
-                continue
-
-            # Currently '--merge' works for single remote only:
-            # TODO: - condition still incomplete
-            #       - We can merge if a remote was given or there is a
-            #         tracking branch
-            #       - we also can fetch all remotes independently on whether or
-            #         not we merge a certain remote
-            if not name and len(remotes) > 1 and merge:
-                lgr.debug("Found multiple remotes:\n%s" % remotes)
-                raise NotImplementedError("No merge strategy for multiple "
-                                          "remotes implemented yet.")
-            lgr.info("Updating handle '%s' ..." % repo.path)
-
-            # fetch remote(s):
-            repo.git_fetch(name if name else '',
-                           "--all" if fetch_all else '')
-
-            # if it is an annex and there is a tracking branch, and we didn't
-            # fetch the entire remote anyway, explicitly fetch git-annex
-            # branch:
-            # TODO: Is this logic correct? Shouldn't we fetch git-annex from
-            # `name` if there is any (or if there is no tracking branch but we
-            # have a `name`?
-            if knows_annex(repo.path) and not fetch_all:
-                # check for tracking branch's remote:
-                try:
-                    std_out, std_err = \
-                        repo._git_custom_command('',
-                        ["git", "config", "--get",
-                         "branch.{active_branch}.remote".format(
-                             active_branch=repo.git_get_active_branch())])
-                except CommandError as e:
-                    if e.code == 1 and e.stdout == "":
-                        std_out = None
-                    else:
-                        raise
-                if std_out:  # we have a "tracking remote"
-                    repo.git_fetch("%s git-annex" % std_out.strip())
-
-            # merge:
-            if merge:
-                lgr.info("Applying changes from tracking branch...")
-                cmd_list = ["git", "pull"]
-                if name:
-                    cmd_list.append(name)
-                    # branch needed, if not default remote
-                    # => TODO: use default remote/tracking branch to compare
-                    #          (see above, where git-annex is fetched)
-                    # => TODO: allow for passing a branch
-                    # (or more general refspec?)
-                    # For now, just use the same name
-                    cmd_list.append(repo.git_get_active_branch())
-
-                out, err = repo._git_custom_command('', cmd_list)
-                lgr.info(out)
-                if knows_annex(repo.path):
-                    # annex-apply:
-                    lgr.info("Updating annex ...")
-                    out, err = repo._git_custom_command('', ["git", "annex", "merge"])
-                    lgr.info(out)
-
-            # TODO: return value?
+        fetcher = _Fetcher()
+        try:
+            map_jobs(lambda repo: _update_repo(repo, name, merge, fetch_all,
+                                               fetcher),
+                     repos_to_update, jobs)
+        finally:
+            fetcher.close()
+
+        # TODO: return value?
+
+
+def _update_repo(repo, name, merge, fetch_all, fetcher):
+    # get all remotes:
+    remotes = repo.git_get_remotes()
+    if name and name not in remotes:
+        lgr.warning("'%s' not known to dataset %s.\nSkipping" %
+                    (name, repo.path))
+        return
+
+    # Currently '--merge' works for single remote only:
+    # TODO: - condition still incomplete
+    #       - We can merge if a remote was given or there is a
+    #         tracking branch
+    #       - we also can fetch all remotes independently on whether or
+    #         not we merge a certain remote
+    if not name and len(remotes) > 1 and merge:
+        lgr.debug("Found multiple remotes:\n%s" % remotes)
+        raise NotImplementedError("No merge strategy for multiple "
+                                  "remotes implemented yet.")
+    lgr.info("Updating handle '%s' ..." % repo.path)
+
+    # check for tracking branch's remote:
+    try:
+        std_out, std_err = \
+            repo._git_custom_command('',
+            ["git", "config", "--get",
+             "branch.{active_branch}.remote".format(
+                 active_branch=repo.git_get_active_branch())])
+    except CommandError as e:
+        if e.code == 1 and e.stdout == "":
+            std_out = None
+        else:
+            raise
+    tracking_remote = std_out.strip() if std_out else None
+
+    # fetch remote(s), each separately so they could be checked for changes
+    # and use connections to their hosts:
+    if fetch_all:
+        to_fetch = remotes
+    elif name:
+        to_fetch = [name]
+    elif tracking_remote:
+        to_fetch = [tracking_remote]
+    else:
+        # the one git fetch would fetch by default
+        default_remotes = ['origin'] if 'origin' in remotes \
+            else remotes if len(remotes) == 1 else []
+        if not default_remotes:
+            lgr.debug("No default remote to fetch from for %s" % repo.path)
+        to_fetch = default_remotes
+    # if it is an annex and there is a tracking branch, and we didn't
+    # fetch the entire remote anyway, explicitly fetch git-annex
+    # branch:
+    # TODO: Is this logic correct? Shouldn't we fetch git-annex from
+    # `name` if there is any (or if there is no tracking branch but we
+    # have a `name`?
+    fetch_annex = knows_annex(repo.path) and tracking_remote \
+        and tracking_remote not in to_fetch
+    for remote in to_fetch:
+        fetcher.fetch(repo, remote)
+    if fetch_annex:
+        fetcher.fetch(repo, tracking_remote, 'git-annex')
+
+    # merge:
+    if merge:
+        lgr.info("Applying changes from tracking branch...")
+        cmd_list = ["git", "pull"]
+        if name:
+            cmd_list.append(name)
+            # branch needed, if not default remote
+            # => TODO: use default remote/tracking branch to compare
+            #          (see above, where git-annex is fetched)
+            # => TODO: allow for passing a branch
+            # (or more general refspec?)
+            # For now, just use the same name
+            cmd_list.append(repo.git_get_active_branch())
+
+        out, err = repo._git_custom_command('', cmd_list)
+        lgr.info(out)
+        if knows_annex(repo.path):
+            # annex-apply:
+            lgr.info("Updating annex ...")
+            out, err = repo._git_custom_command('', ["git", "annex", "merge"])
+            lgr.info(out)
+
+
+class _Fetcher(object):
+    """Fetches from remotes of (possibly many) repositories concurrently
+
+    Fetches from the same host are limited by datalad.fetch host jobs, and
+    fetches from SSH remotes on the same host share a single multiplexed
+    connection.  A remote is not fetched from, if `git ls-remote` shows that
+    its branches did not change since the last fetch.
+    """
+
+    def __init__(self):
+        self._host_jobs = int(cfg.get('datalad', 'fetch host jobs', default=4))
+        self._semaphores = {}
+        self._ssh_manager = SSHManager()
+        self._lock = threading.Lock()
+
+    def _get_host_env(self, url):
+        """Return host of the URL and environment for git to access it"""
+        ssh_url = self._ssh_manager.get_ssh_url(url)
+        if ssh_url is None:
+            # local path or e.g. http:// -- the host (if any) would do
+            return urlparse(url).netloc, None
+        ssh = self._ssh_manager.get_connection(ssh_url)
+        ssh.open()
+        return urlparse(ssh_url).netloc, ssh.get_git_env()
+
+    def _get_semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self._host_jobs)
+            return self._semaphores[host]
+
+    def fetch(self, repo, remote, branch=None):
+        """Fetch from the remote (only the `branch` if specified)"""
+        try:
+            url = repo.git_get_remote_url(remote)
+        except ValueError:
+            # let git fetch complain
+            url = remote
+        host, env = self._get_host_env(url)
+        with self._get_semaphore(host):
+            if _is_fetched(repo, remote, branch, env):
+                lgr.info("Nothing changed in '%s' of %s. Skipping fetch.",
+                         remote, repo.path)
+                return
+            repo.git_fetch("%s %s" % (remote, branch) if branch else remote,
+                           env=env)
+
+    def close(self):
+        """Stop SSH master connections started by the fetcher
+
+        Those which were already running (e.g. started by another process)
+        are left running
+        """
+        self._ssh_manager.close()
+
+
+def _is_fetched(repo, remote, branch, env):
+    """Return True if the branches and tags of the remote are as they were last fetched
+
+    A single `git ls-remote` call is used to compare the branches (or only the
+    `branch` if specified) against the remote branches we have, and tags of
+    the remote against our tags
+    """
+    try:
+        remote_refs = repo.git_ls_remote(
+            remote, options='--heads --tags', env=env)
+    except CommandError as e:
+        lgr.debug("Failed to list references of '%s': %s" % (remote, e))
+        return False
+    out, err = repo._git_custom_command(
+        '', ["git", "for-each-ref", "--format=%(objectname) %(refname)",
+             "refs/remotes/%s/" % remote, "refs/tags/"])
+    prefix = 'refs/remotes/%s/' % remote
+    fetched_refs, tags = {}, {}
+    for line in out.splitlines():
+        hexsha, ref = line.split(None, 1)
+        if ref.startswith('refs/tags/'):
+            tags[ref] = hexsha
+        elif ref != prefix + 'HEAD':
+            fetched_refs['refs/heads/' + ref[len(prefix):]] = hexsha
+    remote_heads = {}
+    for ref, hexsha in remote_refs.items():
+        if ref.startswith('refs/tags/'):
+            # peeled annotated tags (^{}) are of no interest
+            if not ref.endswith('^{}') and tags.get(ref) != hexsha:
+                return False
+        else:
+            remote_heads[ref] = hexsha
+    if branch:
+        ref = 'refs/heads/%s' % branch
+        return ref in remote_heads and remote_heads[ref] == fetched_refs.get(ref)
+    return remote_heads == fetched_refs
@@ -14,11 +14,13 @@ __docformat__ = 'restructuredtext'
 
 import msgpack
 import os
+import threading
 import time
 
 from abc import ABCMeta, abstractmethod, abstractproperty
 from os.path import exists, join as opj, isdir
 from six import string_types, PY2
+from six.moves.urllib.parse import urlparse
 
 
 from .. import cfg
@@ -61,6 +63,9 @@ class BaseDownloader(object):
 
         self.authenticator = authenticator
         self._cache = None  # for fetches, not downloads
+        # downloader could be shared among threads (see download_url), so
+        # establishing the session and (re)authentication get serialized
+        self._session_lock = threading.RLock()
 
 
     def _access(self, method, url, allow_old_session=True, **kwargs):
@@ -96,7 +101,8 @@ class BaseDownloader(object):
             try:
                 used_old_session = False
                 access_denied = False
-                used_old_session = self._establish_session(url, allow_old=allow_old_session)
+                with self._session_lock:
+                    used_old_session = self._establish_session(url, allow_old=allow_old_session)
                 if not allow_old_session:
                     assert(not used_old_session)
                 lgr.log(5, "Calling out into %s for %s" % (method, url))
@@ -134,14 +140,15 @@ class BaseDownloader(object):
                         #  3. bug in out code which would render authentication/cookie handling
                         #     ineffective
                         #     - not sure what to do about it
-                        if ui.yesno(
-                                title="Authentication to access {url} has failed".format(url=url),
-                                text="Do you want to enter other credentials in case they were updated?"):
-                            self.credential.enter_new()
-                            allow_old_session = False
-                            continue
-                        else:
-                            raise DownloadError("Failed to download from %s given available credentials" % url)
+                        with self._session_lock:
+                            if ui.yesno(
+                                    title="Authentication to access {url} has failed".format(url=url),
+                                    text="Do you want to enter other credentials in case they were updated?"):
+                                self.credential.enter_new()
+                                allow_old_session = False
+                                continue
+                            else:
+                                raise DownloadError("Failed to download from %s given available credentials" % url)
                 else:  # None or False
                     if needs_authentication is False:
                         # those urls must or should NOT require authentication but we got denied
@@ -206,7 +213,8 @@ class BaseDownloader(object):
                                           % (downloaded_size, target_size))
 
 
-    def _download(self, url, path=None, overwrite=False, size=None, stats=None):
+    def _download(self, url, path=None, overwrite=False, size=None, stats=None,
+                  pbar=None):
         """Download content into a file
 
         Parameters
@@ -218,6 +226,9 @@ class BaseDownloader(object):
           filename deduced from the url and saved in curdir
         size: int, optional
           Limit in size to be downloaded
+        pbar: optional
+          Progressbar to report progress of the download to.  If None, a new
+          one is created and finished for this download
 
         Returns
         -------
@@ -261,11 +272,14 @@ class BaseDownloader(object):
             with open(temp_filepath, 'wb') as fp:
                 # TODO: url might be a bit too long for the beast.
                 # Consider to improve to make it animated as well, or shorten here
-                pbar = ui.get_progressbar(label=url, fill_text=filepath, maxval=target_size)
+                own_pbar = pbar is None
+                if own_pbar:
+                    pbar = ui.get_progressbar(label=url, fill_text=filepath, maxval=target_size)
                 t0 = time.time()
                 downloader(fp, pbar, size=size)
                 downloaded_time = time.time() - t0
-                pbar.finish()
+                if own_pbar:
+                    pbar.finish()
             downloaded_size = os.stat(temp_filepath).st_size
 
             # (headers.get('Content-type', "") and headers.get('Content-Type')).startswith('text/html')
@@ -281,10 +295,8 @@ class BaseDownloader(object):
             os.rename(temp_filepath, filepath)
 
             if stats:
-                stats.downloaded += 1
+                stats.add_download(urlparse(url).netloc, downloaded_size, downloaded_time)
                 stats.overwritten += int(existed)
-                stats.downloaded_size += downloaded_size
-                stats.downloaded_time += downloaded_time
         except (AccessDeniedError, IncompleteDownloadError) as e:
             raise
         except Exception as e:
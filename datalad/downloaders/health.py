@@ -0,0 +1,149 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Memory of how well downloads from different hosts went
+
+It is used to choose among multiple URLs for the same content, so fast hosts
+get tried first, and hosts which failed recently get tried last.
+"""
+
+import json
+import os
+import threading
+import time
+
+from os.path import dirname, exists, join as opj
+
+from six.moves.urllib.parse import urlparse
+
+from .. import cfg
+from ..dochelpers import exc_str
+
+from logging import getLogger
+lgr = getLogger('datalad.downloaders.health')
+
+# weight of the most recent download duration in the average
+_ALPHA = 0.3
+# number of consecutive failures for a host to be considered dead, and for how
+# long (doubled with every additional failure)
+_DEAD_FAILURES = 2
+_DEAD_PERIOD = 60
+_MAX_DEAD_PERIOD = 24 * 3600
+
+
+def get_default_hosts_health_path():
+    return opj(cfg.dirs.user_cache_dir, 'hosts_health.json')
+
+
+class HostsHealth(object):
+    """Average download durations and failures per host, stored in a file
+
+    Multiple processes (e.g. special remotes ran by `git annex get -J`) might
+    use the same file, so upon `save` records are merged with the ones on
+    disk, the most recently updated record per host winning, and file gets
+    replaced atomically.  Within a process it is safe to use from multiple
+    threads.
+    """
+
+    def __init__(self, path=None):
+        """
+        Parameters
+        ----------
+        path : str, optional
+          File to load from and save into.  If not specified, default one in
+          the user cache directory is used
+        """
+        self.path = path or get_default_hosts_health_path()
+        self._lock = threading.Lock()
+        self._hosts = self._load()
+
+    def _load(self):
+        if not exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except Exception as exc:
+            lgr.warning("Failed to load hosts health from %s: %s",
+                        self.path, exc_str(exc))
+            return {}
+
+    def save(self):
+        """Merge with the records on disk and store"""
+        with self._lock:
+            hosts = self._load()
+            for host, rec in self._hosts.items():
+                if rec['updated'] >= hosts.get(host, {}).get('updated', 0):
+                    hosts[host] = rec
+            self._hosts = hosts
+            d = dirname(self.path)
+            if d and not exists(d):
+                os.makedirs(d)
+            tmp_path = '%s.%d' % (self.path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(hosts, f)
+            # replaces atomically, so other processes never see partial file
+            os.rename(tmp_path, self.path)
+
+    @staticmethod
+    def _get_host(url):
+        return urlparse(url).netloc
+
+    def get(self, url):
+        """Return record (duration, failures, ...) for the host of the URL or None"""
+        return self._hosts.get(self._get_host(url))
+
+    def _update(self, url, **kwargs):
+        rec = self._hosts.setdefault(
+            self._get_host(url),
+            {'duration': None, 'failures': 0, 'last_failure': None})
+        rec.update(kwargs)
+        rec['updated'] = time.time()
+        return rec
+
+    def record_success(self, url, duration):
+        """Account for a successful download from the URL which took `duration`"""
+        with self._lock:
+            rec = self.get(url)
+            prev = rec['duration'] if rec else None
+            self._update(
+                url,
+                duration=duration if prev is None
+                else _ALPHA * duration + (1 - _ALPHA) * prev,
+                failures=0)
+
+    def record_failure(self, url):
+        """Account for a failed download from the URL"""
+        with self._lock:
+            rec = self.get(url)
+            self._update(url, failures=(rec['failures'] if rec else 0) + 1,
+                         last_failure=time.time())
+
+    def is_dead(self, url):
+        """Either host of the URL failed repeatedly and recently"""
+        rec = self.get(url)
+        if not rec or rec['failures'] < _DEAD_FAILURES:
+            return False
+        period = min(_DEAD_PERIOD * 2 ** (rec['failures'] - _DEAD_FAILURES),
+                     _MAX_DEAD_PERIOD)
+        return time.time() - rec['last_failure'] < period
+
+    def rank(self, urls):
+        """Return URLs sorted so the most promising come first
+
+        Hosts with shorter average durations come first, then the ones we
+        know nothing about (in the original order), and dead ones last
+        """
+        def key(url):
+            if self.is_dead(url):
+                return (2, 0)
+            rec = self.get(url)
+            if rec is None or rec['duration'] is None:
+                return (1, 0)
+            return (0, rec['duration'])
+        return sorted(urls, key=key)
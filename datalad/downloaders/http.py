@@ -32,6 +32,7 @@ from ..support.status import FileStatus
 from .base import Authenticator
 from .base import BaseDownloader
 from .base import DownloadError, AccessDeniedError, AccessFailedError, UnhandledRedirectError
+from .base import TargetFileAbsent
 
 from logging import getLogger
 from ..log import LoggerHelper
@@ -69,7 +70,7 @@ def check_response_status(response, err_prefix="", session=None):
     if response.status_code in {404}:
         # It could have been that form_url is wrong, so let's just say that
         # TODO: actually may be that is where we could use tagid and actually determine the form submission url
-        raise DownloadError(err_prefix + "not found")
+        raise TargetFileAbsent(err_prefix + "not found")
     elif 400 <= response.status_code < 500:
         raise AccessDeniedError(err_msg)
     elif response.status_code in {200}:
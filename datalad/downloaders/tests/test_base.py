@@ -8,5 +8,45 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 """Tests for downloaders base"""
 
+import threading
+import time
+
+from ..base import BaseDownloader
+from ...tests.utils import eq_
+
+
 def test_docstring():
     pass
+
+
+class _SessionsDownloader(BaseDownloader):
+    """Downloader tracking how many sessions get established at once"""
+
+    def __init__(self):
+        super(_SessionsDownloader, self).__init__()
+        self.establishing = self.max_establishing = 0
+
+    def _establish_session(self, url, allow_old=True):
+        self.establishing += 1
+        self.max_establishing = max(self.max_establishing, self.establishing)
+        time.sleep(0.01)
+        self.establishing -= 1
+        return False
+
+    def _get_download_details(self, url):
+        raise NotImplementedError
+
+    def _fetch(self, url):
+        return url
+
+
+def test_access_shared_among_threads():
+    downloader = _SessionsDownloader()
+    threads = [threading.Thread(target=downloader._access,
+                                args=(downloader._fetch, 'http://example.com/%d' % i))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    eq_(downloader.max_establishing, 1)
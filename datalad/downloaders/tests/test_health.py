@@ -0,0 +1,51 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Tests for hosts health memory"""
+
+from ..health import HostsHealth
+
+from ...tests.utils import eq_, ok_, assert_false
+from ...tests.utils import with_tempfile
+
+
+@with_tempfile
+def test_HostsHealth(path):
+    urls = ['http://slow.com/a', 'http://unknown.com/a', 'http://dead.com/a',
+            'http://fast.com/a']
+    health = HostsHealth(path)
+    eq_(health.rank(urls), urls)  # nothing known yet -- original order
+
+    health.record_success('http://slow.com/b', 10.)
+    health.record_success('http://fast.com/b', 1.)
+    health.record_success('http://dead.com/b', 0.1)
+    health.record_failure('http://dead.com/b')
+    # single failure is not enough to give up on a host
+    assert_false(health.is_dead('http://dead.com/b'))
+    health.record_failure('http://dead.com/c')
+    ok_(health.is_dead('http://dead.com/b'))
+    eq_(health.rank(urls), ['http://fast.com/a', 'http://slow.com/a',
+                            'http://unknown.com/a', 'http://dead.com/a'])
+
+    # success resets failures and durations get averaged
+    health.record_success('http://dead.com/b', 0.1)
+    assert_false(health.is_dead('http://dead.com/b'))
+    health.record_success('http://slow.com/b', 20.)
+    eq_(health.get('http://slow.com/a')['duration'], 13.)
+
+    # persisted and merged with the records of other processes
+    health.save()
+    other = HostsHealth(path)
+    eq_(other.get('http://fast.com/')['duration'], 1.)
+    other.record_failure('http://unknown.com/')
+    health.record_success('http://fast.com/', 2.)
+    other.save()
+    health.save()
+    merged = HostsHealth(path)
+    eq_(merged.get('http://unknown.com/')['failures'], 1)
+    eq_(merged.get('http://fast.com/')['duration'], 0.3 * 2 + 0.7 * 1)
@@ -255,9 +255,14 @@ class AddArchiveContent(Interface):
         else:
             lgr.debug("Special remote {} already exists".format(ARCHIVES_SPECIAL_REMOTE))
 
+        # Repository instances are shared (see FlyweightRepo), so instead of
+        # toggling always_commit of the given one, a private instance, which
+        # does not commit into git-annex branch after every command, is used
+        annex.precommit()
+        shared_annex, annex = annex, AnnexRepo(
+            annex.path, runner=annex.cmd_call_wrapper, always_commit=False,
+            create=False)
         try:
-            old_always_commit = annex.always_commit
-            annex.always_commit = False
             keys_to_drop = []
 
             if annex_options:
@@ -439,8 +444,7 @@ class AddArchiveContent(Interface):
                 stats.dropped += len(keys_to_drop)
                 annex.precommit()  # might need clean up etc again
 
-            annex.always_commit = old_always_commit
             # remove what is left and/or everything upon failure
             earchive.clean(force=True)
 
-        return annex
+        return shared_annex
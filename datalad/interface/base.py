@@ -51,6 +51,35 @@ def get_interface_groups():
     return grps
 
 
+def get_interface_spec(name, namefx=get_api_name):
+    """Return the specification of an interface given its name
+
+    Parameters
+    ----------
+    name: str
+    namefx: callable, optional
+      Function to obtain the name of an interface from its spec, e.g.
+      `get_api_name` (default) or `get_cmdline_command_name`
+
+    Returns
+    -------
+    tuple or None
+      None if no interface is known under that name
+    """
+    for grp_name, grp_descr, interfaces in get_interface_groups():
+        for intfspec in interfaces:
+            if namefx(intfspec) == name:
+                return intfspec
+    return None
+
+
+def load_interface(spec):
+    """Import the module of an interface and return the interface class"""
+    from importlib import import_module
+    mod = import_module(spec[0], package='datalad')
+    return getattr(mod, spec[1])
+
+
 def dedent_docstring(text):
     import textwrap
     """Remove uniform indentation from a multiline docstring"""
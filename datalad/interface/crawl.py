@@ -43,6 +43,17 @@ class Crawl(Interface):
             args=("-t", "--is-template"),
             action="store_true",
             doc="""Flag if provided value is the name of the template to use"""),
+        profile=Parameter(
+            args=("--profile",),
+            action="store_true",
+            doc="""Flag to collect and report timings of the pipeline nodes.
+            Could also be enabled via crawl.profile configuration"""),
+        profile_output=Parameter(
+            args=("--profile-output",),
+            metavar='file',
+            constraints=EnsureStr() | EnsureNone(),
+            doc="""File to store timings of the pipeline nodes into.  Chrome
+            trace format is used if the name ends with .trace, JSON otherwise"""),
         chdir=Parameter(
             args=("-C", "--chdir"),
             constraints=EnsureStr() | EnsureNone(),
@@ -57,12 +68,13 @@ class Crawl(Interface):
     )
 
     @staticmethod
-    def __call__(path=None, dry_run=False, is_pipeline=False, is_template=False, chdir=None):
+    def __call__(path=None, dry_run=False, is_pipeline=False, is_template=False,
+                 profile=False, profile_output=None, chdir=None):
         from datalad.crawler.pipeline import (
             load_pipeline_from_config, load_pipeline_from_module,
             get_repo_pipeline_config_path, get_repo_pipeline_script_path
         )
-        from datalad.crawler.pipeline import run_pipeline
+        from datalad.crawler.pipeline import consume_pipeline
         from datalad.utils import chpwd  # import late so we could mock during tests
         with chpwd(chdir):
 
@@ -79,6 +91,15 @@ class Crawl(Interface):
                     cfg.add_section('crawl')
                 cfg.set('crawl', 'dryrun', "True")
 
+            if profile or profile_output:
+                if not 'crawl' in cfg.sections():
+                    cfg.add_section('crawl')
+                cfg.set('crawl', 'profile', "True")
+                if profile_output:
+                    cfg.set('crawl', 'profile output', profile_output)
+                    cfg.set('crawl', 'profile format',
+                            'chrome' if profile_output.endswith('.trace') else 'json')
+
             if path is None:
 
                 # get config from the current repository/handle
@@ -106,7 +127,9 @@ class Crawl(Interface):
             # TODO: capture the state of all branches so in case of crash
             # we could gracefully reset back
             try:
-                run_pipeline(pipeline)
+                # outputs are of no interest here, so do not keep them all
+                # in memory for the duration of the crawl
+                consume_pipeline(pipeline)
             except Exception as exc:
                 # TODO: config.crawl.failure = full-reset | last-good-master
                 # probably ask via ui which action should be performed unless
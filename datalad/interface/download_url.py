@@ -16,14 +16,26 @@
 
 __docformat__ = 'restructuredtext'
 
-from os.path import isdir, curdir
+import threading
+import time
+
+from collections import deque
+from collections import OrderedDict
+from os.path import isdir, curdir, join as opj
+
+from six import iteritems
+from six.moves.urllib.parse import urlparse
 
 from .base import Interface
+from .. import cfg
 from ..ui import ui
 from ..utils import assure_list_from_str
 from ..dochelpers import exc_str
 from ..support.param import Parameter
 from ..support.constraints import EnsureStr, EnsureNone
+from ..support.constraints import EnsureInt
+from ..support.parallel import map_jobs
+from ..support.network import get_url_straight_filename
 
 from logging import getLogger
 lgr = getLogger('datalad.api.download-url')
@@ -60,11 +72,18 @@ class DownloadURL(Interface):
             doc="Path (filename or directory path) where to store downloaded file(s). "
                 "In case of multiple URLs provided, must point to a directory.  Otherwise current "
                 "directory is used",
-            constraints=EnsureStr() | EnsureNone())
+            constraints=EnsureStr() | EnsureNone()),
+        jobs=Parameter(
+            args=("-J", "--jobs"),
+            doc="""number of parallel downloads.  Downloads from the same host
+            are additionally limited by datalad.download host jobs
+            configuration (4 by default)""",
+            constraints=EnsureInt() | EnsureNone()),
     )
 
     @staticmethod
-    def __call__(urls, path=None, overwrite=False, stop_on_failure=False):
+    def __call__(urls, path=None, overwrite=False, stop_on_failure=False,
+                 jobs=None):
         """
         Returns
         -------
@@ -85,24 +104,176 @@ class DownloadURL(Interface):
         if not path:
             path = curdir
 
-        # TODO setup fancy ui.progressbars doing this in parallel and reporting overall progress
-        # in % of urls which were already downloaded
         providers = Providers.from_config_files()
         downloaded_paths, failed_urls = [], []
-        for url in urls:
-            # somewhat "ugly"
-            # providers.get_provider(url).get_downloader(url).download(url, path=path)
-            # for now -- via sugaring
-            try:
-                downloaded_path = providers.download(url, path=path, overwrite=overwrite)
-                downloaded_paths.append(downloaded_path)
-                # ui.message("%s -> %s" % (url, downloaded_path))
-            except Exception as e:
-                failed_urls.append(url)
-                ui.error(exc_str(e))
-                if stop_on_failure:
-                    break
+        if not jobs or jobs < 2 or len(urls) < 2:
+            for url in urls:
+                # somewhat "ugly"
+                # providers.get_provider(url).get_downloader(url).download(url, path=path)
+                # for now -- via sugaring
+                try:
+                    downloaded_path = providers.download(url, path=path, overwrite=overwrite)
+                    downloaded_paths.append(downloaded_path)
+                    # ui.message("%s -> %s" % (url, downloaded_path))
+                except Exception as e:
+                    failed_urls.append(url)
+                    ui.error(exc_str(e))
+                    if stop_on_failure:
+                        break
+        else:
+            for url, out in zip(urls, _download_parallel(
+                    providers, urls, path, overwrite, stop_on_failure, jobs)):
+                if isinstance(out, Exception):
+                    failed_urls.append(url)
+                elif out is not None:
+                    downloaded_paths.append(out)
         if failed_urls:
             raise RuntimeError("%d url(s) failed to download" % len(failed_urls))
         return downloaded_paths
 
+
+class _DownloadsProgress(object):
+    """A single progress line for multiple downloads running in parallel
+
+    `get_progressbar` provides progressbars for individual downloads, which
+    report to this one.
+    """
+
+    def __init__(self, nfiles, interval=0.5):
+        self.nfiles = nfiles
+        self.done = 0
+        self.failed = 0
+        self.size = 0
+        self._interval = interval
+        self._t0 = self._shown = time.time()
+        self._lock = threading.Lock()
+
+    def get_progressbar(self):
+        return _DownloadProgress(self)
+
+    def add(self, size=0, done=0, failed=0):
+        with self._lock:
+            self.size += size
+            self.done += done
+            self.failed += failed
+            now = time.time()
+            if now - self._shown < self._interval and not (done or failed):
+                return
+            self._shown = now
+            ui.message(self.as_str(), cr='\r')
+
+    def as_str(self):
+        import humanize
+        elapsed = time.time() - self._t0
+        s = "Downloaded %d/%d files, %s (%s/s)" % (
+            self.done, self.nfiles, humanize.naturalsize(self.size),
+            humanize.naturalsize(self.size / elapsed if elapsed else 0))
+        if self.failed:
+            s += ", %d failed" % self.failed
+        return s
+
+    def finish(self):
+        ui.message(self.as_str())
+
+
+class _DownloadProgress(object):
+    """Progressbar of a single download reporting to `_DownloadsProgress`"""
+
+    def __init__(self, progress):
+        self.progress = progress
+        self.currval = 0
+
+    def update(self, value):
+        # value might go down if download gets restarted
+        self.progress.add(size=value - self.currval)
+        self.currval = value
+
+    def finish(self):
+        pass
+
+
+def _download_parallel(providers, urls, path, overwrite, stop_on_failure, jobs):
+    """Download urls using `jobs` threads
+
+    Downloads from the same host are limited by datalad.download host jobs
+    configuration.  Downloaders (and thus their sessions) are shared among
+    the downloads from the same provider.  Urls which would be downloaded into
+    the same file (as judged by their names, since names provided by the
+    server are not known upfront) are downloaded after all others, in order.
+
+    Returns
+    -------
+    list
+      per each url either a downloaded path, an exception if it failed, or
+      None if it was not attempted since a previous one failed and
+      `stop_on_failure`
+    """
+    host_jobs = int(cfg.get('datalad', 'download host jobs', default=4))
+    stop = threading.Event()
+    progress = _DownloadsProgress(len(urls))
+    results = [None] * len(urls)
+
+    # Providers are not thread-safe, so figure out downloaders upfront
+    downloaders = []
+    for url in urls:
+        try:
+            downloaders.append(providers.get_provider(url).get_downloader(url))
+        except Exception as e:
+            downloaders.append(e)
+
+    # indexes of urls to download per each host, and those which would
+    # download into the same file as some preceding one
+    host_queues = OrderedDict()
+    deferred = []
+    targets = set()
+    for i, url in enumerate(urls):
+        target = opj(path, get_url_straight_filename(url)) \
+            if isdir(path) else path
+        if target in targets:
+            deferred.append(i)
+            continue
+        targets.add(target)
+        host_queues.setdefault(urlparse(url).netloc, deque()).append(i)
+
+    def download(i):
+        url, downloader = urls[i], downloaders[i]
+        if stop.is_set():
+            return None
+        try:
+            if isinstance(downloader, Exception):
+                raise downloader
+            out = downloader.download(
+                url, path=path, overwrite=overwrite,
+                pbar=progress.get_progressbar())
+        except Exception as e:
+            ui.error(exc_str(e))
+            progress.add(failed=1)
+            if stop_on_failure:
+                stop.set()
+            return e
+        progress.add(done=1)
+        return out
+
+    def download_from(host):
+        queue = host_queues[host]
+        while True:
+            try:
+                i = queue.popleft()
+            except IndexError:
+                return
+            results[i] = download(i)
+
+    # Every host gets up to host_jobs sequential "lanes" of downloads, so no
+    # thread sits waiting for a host while downloads from others are pending.
+    # First lanes of all hosts go first
+    lanes = []
+    for ilane in range(max(host_jobs, 1)):
+        lanes.extend(host for host, queue in iteritems(host_queues)
+                     if ilane < len(queue))
+    try:
+        map_jobs(download_from, lanes, jobs=jobs)
+        for i in deferred:
+            results[i] = download(i)
+        return results
+    finally:
+        progress.finish()
@@ -20,11 +20,11 @@ from ...tests.utils import assert_cwd_unchanged
 @assert_cwd_unchanged(ok_to_chdir=True)
 @patch('datalad.utils.chpwd')
 @patch('datalad.crawler.pipeline.load_pipeline_from_config', return_value=['pipeline'])
-@patch('datalad.crawler.pipeline.run_pipeline')
+@patch('datalad.crawler.pipeline.consume_pipeline')
 # Note that order of patched things as args is reverse for some reason :-/
-def test_crawl_api_chdir(run_pipeline_, load_pipeline_from_config_, chpwd_):
+def test_crawl_api_chdir(consume_pipeline_, load_pipeline_from_config_, chpwd_):
     crawl('some_path_not_checked', chdir='somedir')
 
     chpwd_.assert_called_with('somedir')
     load_pipeline_from_config_.assert_called_with('some_path_not_checked')
-    run_pipeline_.assert_called_with(['pipeline'])
+    consume_pipeline_.assert_called_with(['pipeline'])
@@ -12,14 +12,20 @@
 
 __docformat__ = 'restructuredtext'
 
+import threading
+
 from os.path import join as opj
 
 from ...api import download_url
+from ..download_url import _download_parallel
 from ...tests.utils import eq_, assert_cwd_unchanged, assert_raises, \
     with_tempfile
 from ...tests.utils import with_tree
 from ...tests.utils import serve_path_via_http
 from ...tests.utils import swallow_outputs
+from ...tests.utils import assert_in
+from ...tests.utils import ok_file_has_content
+from ...tests.utils import ok_
 
 
 def test_download_url_exceptions():
@@ -57,4 +63,82 @@ def test_download_url_return(toppath, topurl, outdir):
 
     with swallow_outputs() as cmo:
         out3 = download_url(urls, path=outdir, overwrite=True)
-    eq_(out3, outfiles)
\ No newline at end of file
+    eq_(out3, outfiles)
+
+@with_tree(tree=[
+    ('file1.txt', 'abc'),
+    ('file2.txt', 'abcd'),
+    ('file3.txt', 'abcde'),
+])
+@serve_path_via_http
+@with_tempfile(mkdir=True)
+def test_download_url_parallel(toppath, topurl, outdir):
+    files = ['file1.txt', 'file2.txt', 'file3.txt']
+    urls = [topurl + f for f in files]
+    outfiles = [opj(outdir, f) for f in files]
+
+    with swallow_outputs() as cmo:
+        eq_(download_url(urls, path=outdir, jobs=2), outfiles)
+        assert_in('Downloaded 3/3 files', cmo.out)
+    for f, content in zip(outfiles, ['abc', 'abcd', 'abcde']):
+        ok_file_has_content(f, content)
+
+    # failures do not stop other downloads
+    with swallow_outputs() as cmo:
+        with assert_raises(RuntimeError) as cm:
+            download_url([topurl + 'bogus'] + urls, path=outdir,
+                         overwrite=True, jobs=3)
+        eq_(str(cm.exception), "1 url(s) failed to download")
+        assert_in('Downloaded 3/4 files', cmo.out)
+        assert_in('1 failed', cmo.out)
+
+
+@with_tree(tree=[
+    ('d1', {'file.txt': 'abc'}),
+    ('d2', {'file.txt': 'abcd'}),
+])
+@serve_path_via_http
+@with_tempfile(mkdir=True)
+def test_download_url_parallel_same_target(toppath, topurl, outdir):
+    urls = [topurl + 'd1/file.txt', topurl + 'd2/file.txt']
+    # downloads into the same file are not done in parallel, but in order
+    with swallow_outputs():
+        eq_(download_url(urls, path=outdir, overwrite=True, jobs=2),
+            [opj(outdir, 'file.txt')] * 2)
+    ok_file_has_content(opj(outdir, 'file.txt'), 'abcd')
+    with swallow_outputs(), assert_raises(RuntimeError):
+        download_url(urls, path=outdir, jobs=2)
+    ok_file_has_content(opj(outdir, 'file.txt'), 'abcd')
+
+
+class _WaitingDownloader(object):
+    """Downloads from busy.com wait for a download from free.com to start"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.waited = []
+
+    def get_provider(self, url):
+        return self
+
+    def get_downloader(self, url):
+        return self
+
+    def download(self, url, path=None, overwrite=False, pbar=None):
+        if 'busy.com' in url:
+            self.waited.append(self.started.wait(5))
+        else:
+            self.started.set()
+        return url
+
+
+@with_tempfile(mkdir=True)
+def test_download_parallel_hosts(outdir):
+    # more downloads from busy.com than allowed per host (4) should not block
+    # the one from free.com
+    urls = ['http://busy.com/%d' % i for i in range(8)] + ['http://free.com/f']
+    providers = _WaitingDownloader()
+    with swallow_outputs():
+        eq_(_download_parallel(providers, urls, outdir, False, False, 5), urls)
+    eq_(len(providers.waited), 8)
+    ok_(all(providers.waited))
@@ -14,11 +14,14 @@ For further information on git-annex see https://git-annex.branchable.com/.
 
 from os import linesep
 from os.path import join as opj, exists, relpath, islink, realpath, lexists
+from os.path import abspath, normpath
 import logging
 import json
 import re
 import os
 import shlex
+import threading
+import weakref
 from subprocess import Popen, PIPE
 #import pexpect
 
@@ -26,12 +29,14 @@ from functools import wraps
 
 from six import string_types
 from six.moves import filter
-from six.moves.configparser import NoOptionError
 from six.moves.urllib.parse import quote as urlquote
 
 from ..dochelpers import exc_str
+from ..cmd import get_default_trace_protocol
+from . import profiling
 from ..utils import auto_repr
 from .gitrepo import GitRepo, normalize_path, normalize_paths, GitCommandError
+from .gitrepo import _get_git_dir
 from .exceptions import CommandNotAvailableError, CommandError, \
     FileNotInAnnexError, FileInGitError
 from .exceptions import AnnexBatchCommandError
@@ -77,7 +82,7 @@ class AnnexRepo(GitRepo):
     accepted either way.
     """
 
-    __slots__ = GitRepo.__slots__ + ['always_commit', '_batched', '_direct_mode']
+    __slots__ = ['always_commit', '_batched', '_direct_mode']
 
     # Web remote has a hard-coded UUID we might (ab)use
     WEB_UUID = "00000000-0000-0000-0000-000000000001"
@@ -182,7 +187,25 @@ class AnnexRepo(GitRepo):
             writer.set_value("annex", "backends", backend)
             writer.release()
 
-        self._batched = BatchedAnnexes(batch_size=batch_size)
+        self._batched = BatchedAnnexes.for_path(self.path, batch_size=batch_size)
+
+    @classmethod
+    def _flyweight_reusable(cls, path, url=None, runner=None,
+                            direct=False, backend=None, always_commit=True,
+                            create=True, init=False, batch_size=None):
+        """Either an existing instance could be returned for these arguments
+
+        Only a plain instantiation of an existing and initialized annex
+        qualifies
+        """
+        if url is not None or runner is not None or direct or backend \
+                or not always_commit or batch_size is not None:
+            return False
+        if create or init:
+            # we would need to initialize it if it was not yet
+            git_dir = _get_git_dir(abspath(normpath(path)))
+            return git_dir is not None and exists(opj(git_dir, 'annex'))
+        return True
 
     def __repr__(self):
         return "<AnnexRepo path=%s (%s)>" % (self.path, type(self))
@@ -229,6 +252,7 @@ class AnnexRepo(GitRepo):
             cmd_list = ['git-annex']
         cmd_list += [annex_cmd] + backend + debug + annex_options
 
+        self._flush_pending_add()
         try:
             return self.cmd_call_wrapper.run(cmd_list, **kwargs)
         except CommandError as e:
@@ -243,19 +267,14 @@ class AnnexRepo(GitRepo):
     def _is_direct_mode_from_config(self):
         """Figure out if in direct mode from the git config.
 
-        Since relies on reading config, expensive to be used often
-
         Returns
         -------
         True if in direct mode, False otherwise.
         """
 
-        try:
-            return self.repo.config_reader().get_value("annex", "direct")
-        except NoOptionError as e:
-            # If .git/config lacks an entry "direct",
-            # it's actually indirect mode.
-            return False
+        # If .git/config lacks an entry "direct",
+        # it's actually indirect mode.
+        return self.config.getbool("annex", "direct", default=False)
 
     def is_direct_mode(self):
         """Indicates whether or not annex is in direct mode
@@ -277,13 +296,10 @@ class AnnexRepo(GitRepo):
         True if on crippled filesystem, False otherwise
         """
 
-        try:
-            return self.repo.config_reader().get_value("annex",
-                                                       "crippledfilesystem")
-        except NoOptionError as e:
-            # If .git/config lacks an entry "crippledfilesystem",
-            # it's actually not crippled.
-            return False
+        # If .git/config lacks an entry "crippledfilesystem",
+        # it's actually not crippled.
+        return self.config.getbool("annex", "crippledfilesystem",
+                                   default=False)
 
     def set_direct_mode(self, enable_direct_mode=True):
         """Switch to direct or indirect mode
@@ -654,6 +670,7 @@ class AnnexRepo(GitRepo):
             options += ['--with-files']
             if backend:
                 options += ['--backend=%s' % backend]
+            self._flush_pending_add()
             # Initializes (if necessary) and obtains the batch process
             bcmd = self._batched.get(
                 # Since backend will be critical for non-existing files
@@ -738,6 +755,45 @@ class AnnexRepo(GitRepo):
             self._run_annex_command('drop', annex_options=options + files)
 
 
+    def drop(self, files, options=None, chunk_size=1000):
+        """Drop content of multiple files reporting the outcome per each file
+
+        Unlike `annex_drop`, failure to drop some files does not raise, and
+        files are dropped by as few annex calls as possible (`chunk_size` files
+        per call, to not exceed the limit on the length of the command line).
+
+        Parameters
+        ----------
+        files: list of str
+          Paths relative to the top of the repository
+
+        Returns
+        -------
+        dict
+          (success, note) per each file.  Files which had no content to drop
+          are reported as successful
+        """
+        options = options[:] if options else []
+        out = dict((f, (True, None)) for f in files)
+        for i in range(0, len(files), chunk_size):
+            chunk = files[i:i + chunk_size]
+            try:
+                stdout, _ = self._run_annex_command(
+                    'drop', annex_options=['--json'] + options + chunk,
+                    expect_stderr=True)
+            except CommandError as e:
+                # some failed to be dropped, but we still get records for all
+                stdout = e.stdout or ''
+                if not stdout.startswith('{'):
+                    raise
+            for line in stdout.splitlines():
+                if not line.startswith('{'):
+                    continue
+                j = json.loads(line)
+                if j.get('file') in out:
+                    out[j['file']] = (j.get('success', False), j.get('note'))
+        return out
+
     def annex_dropkey(self, keys, options=None, batch=False):
         """Drops the content of annexed files from this repository referenced by keys
 
@@ -879,6 +935,7 @@ class AnnexRepo(GitRepo):
         if not batch:
             json_objects = self._run_annex_command_json('info', args=options + files)
         else:
+            self._flush_pending_add()
             json_objects = self._batched.get('info', annex_options=options, json=True, path=self.path)(files)
 
         # Some aggressive checks. ATM info can be requested only per file
@@ -1083,13 +1140,10 @@ class AnnexRepo(GitRepo):
 
     @property
     def default_backends(self):
-        try:
-            backends = self.repo.config_reader().get_value("annex", "backends")
-            if backends:
-                return backends.split()
-            else:
-                return None
-        except NoOptionError:
+        backends = self.config.get("annex", "backends")
+        if backends:
+            return backends.split()
+        else:
             return None
 
     def annex_fsck(self):
@@ -1100,10 +1154,27 @@ class AnnexRepo(GitRepo):
 class BatchedAnnexes(dict):
     """Class to contain the registry of active batch'ed instances of annex for a repository
     """
+    # (path, batch_size): BatchedAnnexes shared among repository instances
+    _registry = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+
     def __init__(self, batch_size=0):
         self.batch_size = batch_size
         super(BatchedAnnexes, self).__init__()
 
+    @classmethod
+    def for_path(cls, path, batch_size=0):
+        """Return a set of batched annexes shared by all instances for a path
+
+        Batched processes go away whenever no repository instance uses them
+        """
+        key = (path, batch_size)
+        with cls._lock:
+            batched = cls._registry.get(key)
+            if batched is None:
+                batched = cls._registry[key] = cls(batch_size=batch_size)
+        return batched
+
     def get(self, codename, annex_cmd=None, **kwargs):
         if annex_cmd is None:
             annex_cmd = codename
@@ -1172,11 +1243,12 @@ class BatchedAnnex(object):
             output_proc = readline_json if json else readline_rstripped
         self.output_proc = output_proc
         self._process = None
+        # every request gets traced as a command if tracing is enabled
+        self._protocol = get_default_trace_protocol()
 
     def _initialize(self):
         lgr.debug("Initiating a new process for %s" % repr(self))
-        cmd = ['git'] + AnnexRepo._GIT_COMMON_OPTIONS + self.git_options + \
-              ['annex', self.annex_cmd] + self.annex_options + ['--batch'] # , '--debug']
+        cmd = self._get_cmd()
         lgr.log(5, "Command: %s" % cmd)
         # TODO: look into _run_annex_command  to support default options such as --debug
         #
@@ -1191,6 +1263,10 @@ class BatchedAnnex(object):
                               , universal_newlines=True #**kwargs
                               )
 
+    def _get_cmd(self):
+        return ['git'] + AnnexRepo._GIT_COMMON_OPTIONS + self.git_options + \
+               ['annex', self.annex_cmd] + self.annex_options + ['--batch'] # , '--debug']
+
     def _check_process(self, restart=False):
         """Check if the process was terminated and restart if restart
 
@@ -1232,24 +1308,40 @@ class BatchedAnnex(object):
                 entry = ' '.join(entry)
             entry = entry + '\n'
             lgr.log(5, "Sending %r to batched annex %s" % (entry, self))
-            # apparently communicate is just a one time show
-            # stdout, stderr = self._process.communicate(entry)
-            # according to the internet wisdom there is no easy way with subprocess
-            self._check_process(restart=True)
-            process = self._process  # _check_process might have restarted it
-            process.stdin.write(entry)#.encode())
-            process.stdin.flush()
-            lgr.log(5, "Done sending.")
-            # TODO: somehow do catch stderr which might be there or not
-            #stderr = str(process.stderr) if process.stderr.closed else None
-            self._check_process(restart=False)
-            # We are expecting a single line output
-            # TODO: timeouts etc
-            #import pdb; pdb.set_trace()
-            stdout = self.output_proc(process.stdout) if not process.stdout.closed else None
-            #if stderr:
-            #    lgr.warning("Received output in stderr: %r" % stderr)
-            lgr.log(5, "Received output: %r" % stdout)
+            if self._protocol is not None:
+                prot_id = self._protocol.start_section(self._get_cmd() + [entry.rstrip('\n')])
+            prot_exc = None
+            try:
+                # apparently communicate is just a one time show
+                # stdout, stderr = self._process.communicate(entry)
+                # according to the internet wisdom there is no easy way with subprocess
+                self._check_process(restart=True)
+                process = self._process  # _check_process might have restarted it
+                process.stdin.write(entry)#.encode())
+                process.stdin.flush()
+                lgr.log(5, "Done sending.")
+                # TODO: somehow do catch stderr which might be there or not
+                #stderr = str(process.stderr) if process.stderr.closed else None
+                self._check_process(restart=False)
+                # We are expecting a single line output
+                # TODO: timeouts etc
+                #import pdb; pdb.set_trace()
+                stdout = profiling.wait(['git', 'annex', self.annex_cmd],
+                                        self.output_proc, process.stdout) \
+                    if not process.stdout.closed else None
+                #if stderr:
+                #    lgr.warning("Received output in stderr: %r" % stderr)
+                lgr.log(5, "Received output: %r" % stdout)
+                if self._protocol is not None:
+                    self._protocol.add_details(
+                        prot_id, cwd=self.path, status=None,
+                        stdout=len(str(stdout)) if stdout is not None else 0, stderr=0)
+            except BaseException as e:
+                prot_exc = e
+                raise
+            finally:
+                if self._protocol is not None:
+                    self._protocol.end_section(prot_id, prot_exc)
             output.append(stdout)
 
         return output if input_multiple else output[0]
@@ -19,7 +19,9 @@ assert(StrictVersion(patoolib.__version__) >= "1.7")
 
 import os
 import tempfile
+import threading
 from os.path import join as opj, exists, abspath, basename, isabs, normpath, relpath, pardir, isdir
+from os.path import dirname
 from os.path import split as ops, sep as opsep
 from six import next
 from six.moves.urllib.parse import unquote as urlunquote
@@ -125,17 +127,25 @@ def decompress_file(archive, dir_, leading_directories='strip'):
         lgr.debug("Creating directory %s to extract archive into" % dir_)
         os.makedirs(dir_)
 
-    with swallow_outputs() as cmo:
+    def extract(verbosity):
         patoolib.util.check_existing_filename(archive)
         patoolib.util.check_existing_filename(dir_, onlyfiles=False)
         # Call protected one to avoid the checks on existence on unixified path
         patoolib._extract_archive(unixify_path(archive),
                                   outdir=unixify_path(dir_),
-                                  verbosity=100)
-        if cmo.out:
-            lgr.debug("patool gave stdout:\n%s" % cmo.out)
-        if cmo.err:
-            lgr.debug("patool gave stderr:\n%s" % cmo.err)
+                                  verbosity=verbosity)
+
+    if isinstance(threading.current_thread(), threading._MainThread):
+        with swallow_outputs() as cmo:
+            extract(100)
+            if cmo.out:
+                lgr.debug("patool gave stdout:\n%s" % cmo.out)
+            if cmo.err:
+                lgr.debug("patool gave stderr:\n%s" % cmo.err)
+    else:
+        # swallow_outputs replaces sys.stdout/stderr of the whole process, so
+        # could not be used from other threads.  Ask patool to be quiet instead
+        extract(-1)
 
     if leading_directories == 'strip':
         _, dirs, files = next(os.walk(dir_))
@@ -153,6 +163,56 @@ def decompress_file(archive, dir_, leading_directories='strip'):
         raise NotImplementedError("Not supported %s" % leading_directories)
 
 
+def extract_file(archive, afile, path):
+    """Extract a single `afile` from the `archive` into `path`
+
+    Only tar (possibly compressed) and zip archives are supported, for which
+    a single file could be extracted without extracting the entire archive.
+
+    Returns
+    -------
+    bool
+      Either the file was extracted.  False if archive type is not
+      supported or it has no such file
+    """
+    import shutil
+    import tarfile
+    import zipfile
+    afile = urlunquote(afile)
+    # archives might store paths prefixed with ./
+    names = (afile, './' + afile)
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            for name in names:
+                try:
+                    src = zf.open(name)
+                    break
+                except KeyError:
+                    pass
+            else:
+                return False
+            with src, open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            return True
+    elif tarfile.is_tarfile(archive):
+        with tarfile.open(archive) as tf:
+            # getmember would read through the entire (compressed) archive,
+            # while we could stop at the first match
+            for member in tf:
+                if member.name in names:
+                    break
+            else:
+                return False
+            src = tf.extractfile(member)
+            if src is None:
+                # not a regular file
+                return False
+            with open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            return True
+    return False
+
+
 def compress_files(files, archive, path=None, overwrite=True):
     """Compress `files` into an `archive` file
 
@@ -367,14 +427,21 @@ class ExtractedArchive(object):
         """
         path = self.path
         if not exists(path):
-            # we need to extract the archive
-            # TODO: extract to _tmp and then move in a single command so we
-            # don't end up picking up broken pieces
+            # we need to extract the archive.  Extract into a temporary
+            # directory and then move it in place, so we don't end up picking
+            # up broken pieces if extraction fails or is still in progress
             lgr.debug("Extracting {self._archive} under {path}".format(**locals()))
-            os.makedirs(path)
-            assert(exists(path))
-
-            decompress_file(self._archive, path, leading_directories=None)
+            if not exists(dirname(path)):
+                os.makedirs(dirname(path))
+            tmp_path = tempfile.mkdtemp(prefix=basename(path) + '.',
+                                        suffix='.extracting',
+                                        dir=dirname(path))
+            try:
+                decompress_file(self._archive, tmp_path, leading_directories=None)
+                os.rename(tmp_path, path)
+            finally:
+                if exists(tmp_path):
+                    rmtree(tmp_path)
 
             # TODO: must optional since we might to use this content, move it into the tree etc
             # lgr.debug("Adjusting permissions to R/O for the extracted content")
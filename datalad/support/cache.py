@@ -9,6 +9,11 @@
 """Simple constructs to be used as caches
 """
 
+import json
+import os
+import threading
+import time
+
 from collections import OrderedDict
 
 # based on http://stackoverflow.com/a/2437645/1265472
@@ -28,3 +33,65 @@ class DictCache(OrderedDict):
         if self.size_limit is not None:
             while len(self) > self.size_limit:
                 self.popitem(last=False)
+
+
+class PersistentCache(object):
+    """A cache of JSON-serializable values stored in an SQLite database
+
+    Could be shared by multiple processes (SQLite takes care about locking)
+    and threads.  Entries older than `ttl` seconds are considered expired.
+    """
+
+    def __init__(self, path, ttl=None):
+        """
+        Parameters
+        ----------
+        path : str
+          Database file
+        ttl : float, optional
+          Time (in seconds) for entries to stay valid.  If None, they never
+          expire
+        """
+        self.path = path
+        self.ttl = ttl
+        self._db = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        if self._db is None:
+            d = os.path.dirname(self.path)
+            if d and not os.path.exists(d):
+                os.makedirs(d)
+            import sqlite3
+            self._db = sqlite3.connect(self.path, timeout=60,
+                                       check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT, time REAL)")
+            self._db.commit()
+        return self._db
+
+    def get(self, key, default=None):
+        """Return value for the key, or `default` if it is absent or expired"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT value, time FROM cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return default
+        value, time_ = row
+        if self.ttl is not None and time.time() - time_ > self.ttl:
+            return default
+        return json.loads(value)
+
+    def set(self, key, value):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, time) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()))
+            self.db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
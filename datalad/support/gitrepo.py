@@ -14,7 +14,7 @@ For further information on GitPython see http://gitpython.readthedocs.org/
 
 from os import linesep
 from os.path import join as opj, exists, normpath, isabs, commonprefix, relpath, realpath, isdir, abspath
-from os.path import dirname, basename
+from os.path import dirname, basename, lexists, islink
 from os.path import curdir, pardir, sep
 # shortcuts
 _curdirsep = curdir + sep
@@ -22,17 +22,25 @@ _pardirsep = pardir + sep
 
 import logging
 import shlex
+import threading
+import weakref
+from os import stat
 from six import string_types
+from six import PY3
+from six import add_metaclass
+from six.moves.configparser import NoOptionError, NoSectionError
 
+from collections import namedtuple
 from functools import wraps
+from subprocess import Popen, PIPE
 
 import git
 from git.exc import GitCommandError, NoSuchPathError, InvalidGitRepositoryError
-from git.objects.blob import Blob
 
 from ..support.exceptions import CommandError
 from ..support.exceptions import FileNotInRepositoryError
 from ..cmd import Runner
+from ..dochelpers import exc_str
 from ..utils import optional_args, on_windows, getpwd
 from ..utils import swallow_logs
 from ..utils import swallow_outputs
@@ -257,6 +265,273 @@ def Repo(*args, **kwargs):
         kwargs['odbt'] = default_git_odbt
     return git.Repo(*args, **kwargs)
 
+def _get_git_dir(path):
+    """Return path to the .git directory of the repository at `path`
+
+    Takes care about .git being a file pointing to the actual directory (as
+    in the case of submodules).  Returns None if there is no .git
+    """
+    git_dir = opj(path, '.git')
+    if isdir(git_dir):
+        return git_dir
+    try:
+        with open(git_dir) as f:
+            line = f.readline()
+    except (IOError, OSError):
+        return None
+    if not line.startswith('gitdir:'):
+        return None
+    git_dir = line[7:].strip()
+    return git_dir if isabs(git_dir) else normpath(opj(path, git_dir))
+
+
+def _get_repo_signature(path):
+    """Return a signature of the repository state which would change if
+    repository's config, HEAD or index get modified
+
+    Returns None if there is no git repository at `path`
+    """
+    git_dir = _get_git_dir(path)
+    if git_dir is None:
+        return None
+    signature = [git_dir]
+    for f in ('config', 'HEAD', 'index'):
+        try:
+            st = stat(opj(git_dir, f))
+            signature.append((st.st_mtime, st.st_size, st.st_ino))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+GitStatus = namedtuple('GitStatus', ('staged', 'notstaged', 'untracked', 'deleted'))
+
+
+class FlyweightRepo(type):
+    """Metaclass to reuse existing instances of repositories for the same path
+
+    Constructing a repository instance is relatively expensive (GitPython
+    Repo, reading config, etc), so if an instance of the same class for the
+    same path is still alive and the repository's config, HEAD and index were
+    not modified since its creation, it gets returned instead of a new one.
+    A class decides itself which constructor arguments allow for reuse (see
+    `_flyweight_reusable`).  Only weak references are kept, so instances
+    which are no longer used by anyone go away as usual.
+
+    Since instances are shared process-wide (and possibly among threads),
+    their attributes (e.g. `AnnexRepo.always_commit`) must not be changed for
+    the duration of some operation -- a private instance, constructed with
+    the desired arguments, should be used instead.
+    """
+
+    _registry = {}  # (class, path): (signature, weakref to instance)
+    _lock = threading.Lock()
+
+    def __call__(cls, path, *args, **kwargs):
+        if not cls._flyweight_reusable(path, *args, **kwargs):
+            return type.__call__(cls, path, *args, **kwargs)
+
+        key = (cls, abspath(normpath(path)))
+        signature = _get_repo_signature(key[1])
+        if signature is not None:
+            with FlyweightRepo._lock:
+                registered = FlyweightRepo._registry.get(key)
+            instance = registered[1]() if registered is not None else None
+            if instance is not None:
+                if registered[0] == signature:
+                    return instance
+                # the instance gets replaced, so it must not keep anything
+                # for later (e.g. deferred additions)
+                flush = getattr(instance, '_flush_pending_add', None)
+                if flush is not None:
+                    flush()
+
+        instance = type.__call__(cls, path, *args, **kwargs)
+        # construction itself might have modified the repository
+        signature = _get_repo_signature(instance.path)
+        if signature is not None:
+            registry = FlyweightRepo._registry
+
+            def _remove(ref, key=key):
+                with FlyweightRepo._lock:
+                    if key in registry and registry[key][1] is ref:
+                        del registry[key]
+
+            with FlyweightRepo._lock:
+                registry[key] = (signature, weakref.ref(instance, _remove))
+        return instance
+
+
+class GitConfigSnapshot(object):
+    """Cached view of the git configuration of a repository
+
+    Configuration files (system, user and repository level, as read by
+    GitPython's config_reader) are parsed once, and parsed once again only
+    if any of them was modified since (judged by mtime and size).
+    """
+
+    def __init__(self, repo):
+        """
+        Parameters
+        ----------
+        repo: git.Repo
+        """
+        self._repo = repo
+        self._files = [repo._get_config_path(level)
+                       for level in repo.config_level]
+        self._reader = None
+        self._signature = None
+
+    def _get_signature(self):
+        signature = []
+        for f in self._files:
+            try:
+                st = stat(f)
+                signature.append((st.st_mtime, st.st_size))
+            except OSError:
+                signature.append(None)
+        return signature
+
+    @property
+    def reader(self):
+        """GitConfigParser (read-only) with up to date configuration"""
+        signature = self._get_signature()
+        if self._reader is None or signature != self._signature:
+            reader = git.GitConfigParser(self._files, read_only=True)
+            reader.read()
+            self._reader, self._signature = reader, signature
+        return self._reader
+
+    def get_value(self, section, option, default=None):
+        """Return the value of an option, converted to int, float or bool if
+        it looks like one, or `default` if there is no such option
+        """
+        try:
+            return self.reader.get_value(section, option)
+        except (NoOptionError, NoSectionError):
+            return default
+
+    def get(self, section, option, default=None):
+        """Return the value of an option as a string"""
+        value = self.get_value(section, option, default=None)
+        if value is None:
+            return default
+        if isinstance(value, bool):
+            return str(value).lower()
+        return str(value)
+
+    def getbool(self, section, option, default=None):
+        value = self.get_value(section, option, default=None)
+        if value is None:
+            return default
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, string_types):
+            value = value.strip().lower()
+            if value in ('yes', 'on', 'true'):
+                return True
+            if value in ('no', 'off', 'false', ''):
+                return False
+        return bool(value)
+
+    def getint(self, section, option, default=None):
+        value = self.get_value(section, option, default=None)
+        return default if value is None else int(value)
+
+
+class GitObjectReader(object):
+    """Reader of objects of a repository via persistent git processes
+
+    Blobs are read through a single `git cat-file --batch` process, so
+    reading many (possibly large) files does not require a new process or
+    any Python-level processing of their content.  Trees are listed via
+    `git ls-tree -r -z` as they get read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._process = None
+        self._lock = threading.Lock()
+
+    def _initialize(self):
+        lgr.debug("Initiating a new cat-file process for %s", self.path)
+        self._process = Popen(
+            ['git'] + GitRepo._GIT_COMMON_OPTIONS + ['cat-file', '--batch'],
+            stdin=PIPE, stdout=PIPE, cwd=self.path)
+
+    def read(self, spec):
+        """Return content of an object as bytes
+
+        Parameters
+        ----------
+        spec: str
+          Object specification, e.g. 'HEAD:path/to/file' or a hexsha
+
+        Raises
+        ------
+        KeyError
+          if there is no such object
+        """
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._initialize()
+            process = self._process
+            process.stdin.write(spec.encode('utf-8') + b'\n')
+            process.stdin.flush()
+            header = process.stdout.readline().decode('utf-8').split()
+            if header[-1] in ('missing', 'ambiguous'):
+                # <spec> missing or <spec> ambiguous, where spec might
+                # contain spaces
+                raise KeyError(spec)
+            size = int(header[2])
+            content = process.stdout.read(size)
+            process.stdout.read(1)  # trailing newline
+            return content
+
+    def iter_files(self, treeish):
+        """Generate paths of all files (blobs) within a tree
+
+        Parameters
+        ----------
+        treeish: str
+          E.g. a branch name or a commit hexsha
+        """
+        process = Popen(
+            ['git'] + GitRepo._GIT_COMMON_OPTIONS + ['ls-tree', '-r', '-z', treeish],
+            stdout=PIPE, cwd=self.path)
+        completed = False
+        try:
+            tail = b''
+            for chunk in iter(lambda: process.stdout.read(65536), b''):
+                records = (tail + chunk).split(b'\0')
+                tail = records.pop()
+                for record in records:
+                    # <mode> SP <type> SP <object> TAB <file>
+                    info, path = record.split(b'\t', 1)
+                    if info.split(b' ')[1] == b'blob':
+                        yield path.decode('utf-8')
+            completed = True
+        finally:
+            process.stdout.close()
+            # if consumer stopped early, git might have died of SIGPIPE
+            if process.wait() and completed:
+                raise CommandError(
+                    "git ls-tree", "Failed to list tree %s" % treeish,
+                    process.returncode)
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Close communication and wait for process to terminate"""
+        if self._process:
+            process = self._process
+            process.stdin.close()
+            process.wait()
+            self._process = None
+
+
+@add_metaclass(FlyweightRepo)
 class GitRepo(object):
     """Representation of a git repository
 
@@ -264,8 +539,11 @@ class GitRepo(object):
     control. Convention: method's names starting with 'git_' to not be
     overridden accidentally by AnnexRepo.
 
+    Instances are reused for the same path as long as the repository was not
+    modified (see `FlyweightRepo`).
     """
-    __slots__ = ['path', 'repo', 'cmd_call_wrapper']
+    __slots__ = ['path', 'repo', 'cmd_call_wrapper', '_config', '_status_cache',
+                 '_pending_add', '_object_reader', '__weakref__']
 
     # Disable automatic garbage and autopacking
     _GIT_COMMON_OPTIONS = ['-c', 'receive.autogc=0', '-c', 'gc.auto=0']
@@ -297,6 +575,10 @@ class GitRepo(object):
 
         self.path = abspath(normpath(path))
         self.cmd_call_wrapper = runner or Runner(cwd=self.path)
+        self._config = None
+        self._status_cache = None
+        self._pending_add = []
+        self._object_reader = None
         # TODO: Concept of when to set to "dry".
         #       Includes: What to do in gitrepo class?
         #       Now: setting "dry" means to give a dry-runner to constructor.
@@ -346,9 +628,44 @@ class GitRepo(object):
                 lgr.error("%s: %s" % (type(e), str(e)))
                 raise
 
+    @classmethod
+    def _flyweight_reusable(cls, path, url=None, runner=None, create=True):
+        """Either an existing instance could be returned for these arguments
+
+        Only a plain instantiation for an existing repository qualifies
+        """
+        return url is None and runner is None
+
     def __repr__(self):
         return "<GitRepo path=%s (%s)>" % (self.path, type(self))
 
+    def __del__(self):
+        # deferred additions must not get lost
+        if getattr(self, '_pending_add', None):
+            lgr.warning("%s is getting destroyed with %d deferred additions, "
+                        "staging them", self, len(self._pending_add))
+            try:
+                self._flush_pending_add()
+            except Exception as exc:
+                lgr.warning("Failed to stage deferred additions: %s",
+                            exc_str(exc))
+
+    @property
+    def object_reader(self):
+        """Reader of blobs and trees of the repository (`GitObjectReader`)
+        """
+        if self._object_reader is None:
+            self._object_reader = GitObjectReader(self.path)
+        return self._object_reader
+
+    @property
+    def config(self):
+        """Cached git configuration of the repository (`GitConfigSnapshot`)
+        """
+        if self._config is None:
+            self._config = GitConfigSnapshot(self.repo)
+        return self._config
+
     def __eq__(self, obj):
         """Decides whether or not two instances of this class are equal.
 
@@ -379,32 +696,60 @@ class GitRepo(object):
             return GitRepo.get_toppath(dirname(path))
 
     @normalize_paths
-    def git_add(self, files):
+    def git_add(self, files, defer=False):
         """Adds file(s) to the repository.
 
+        Files are staged in bulk via a single `git update-index` call, which
+        rewrites the index only once regardless of the number of files.
+
         Parameters
         ----------
         files: list
             list of paths to add
+        defer: bool, optional
+            Do not stage files right away but only along with the files to be
+            added later on, or before the next operation on the index (git or
+            git-annex command, commit, status, listing of indexed files, etc.)
+            gets invoked through this instance.  So many small additions
+            result in a single index rewrite
         """
 
         files = _remove_empty_items(files)
         if files:
-            try:
-                self.cmd_call_wrapper(self.repo.index.add, files, write=True)
-                # TODO: May be make use of 'fprogress'-option to indicate progress
-                # But then, we don't have it for git-annex add, anyway.
-                #
-                # TODO: Is write=True a reasonable way to do it?
-                # May be should not write until success of operation is confirmed?
-                # What's best in case of a list of files?
-            except OSError as e:
-                lgr.error("git_add: %s" % e)
-                raise
-
+            self._pending_add.extend(files)
+            if not defer:
+                self._flush_pending_add()
         else:
             lgr.warning("git_add was called with empty file list.")
 
+    def _flush_pending_add(self):
+        """Stage all files which were added with defer=True"""
+        if not self._pending_add:
+            return
+        files, self._pending_add = self._pending_add, []
+        # update-index takes only paths to files (or submodules), so
+        # (non-submodule) directories and globs are left to git add
+        pathspecs = [f for f in files
+                     if not lexists(opj(self.path, f))
+                     or (isdir(opj(self.path, f)) and not islink(opj(self.path, f))
+                         and not exists(opj(self.path, f, '.git')))]
+        if pathspecs:
+            pathspecs_ = set(pathspecs)
+            files = [f for f in files if f not in pathspecs_]
+        lgr.debug("Staging %d files and %d pathspecs", len(files), len(pathspecs))
+        try:
+            if files:
+                self.cmd_call_wrapper.run(
+                    ["git"] + self._GIT_COMMON_OPTIONS
+                    + ["update-index", "--add", "-z", "--stdin"],
+                    stdin=''.join(f + '\0' for f in files))
+            if pathspecs:
+                self.cmd_call_wrapper.run(
+                    ["git"] + self._GIT_COMMON_OPTIONS + ["add", "--"] + pathspecs)
+        except CommandError as e:
+            lgr.error("git_add: %s" % e)
+            raise
+
     @normalize_paths(match_return_type=False)
     def git_remove(self, files, **kwargs):
         """Remove files.
@@ -421,12 +766,13 @@ class GitRepo(object):
         """
 
         files = _remove_empty_items(files)
-
+        self._flush_pending_add()
         return self.repo.index.remove(files, working_tree=True, **kwargs)
 
     def precommit(self):
         """Perform pre-commit maintenance tasks
         """
+        self._flush_pending_add()
         self.repo.index.write()  # flush possibly cached in GitPython changes to index
 
     def git_commit(self, msg=None, options=None):
@@ -448,6 +794,7 @@ class GitRepo(object):
             msg = "Commit"  # there is no good default
         if options:
             raise NotImplementedError
+        self._flush_pending_add()
         lgr.debug("Committing with msg=%r" % msg)
         self.cmd_call_wrapper(self.repo.index.commit, msg)
         #
@@ -465,7 +812,7 @@ class GitRepo(object):
         list
             list of paths rooting in git's base dir
         """
-
+        self._flush_pending_add()
         return [x[0] for x in self.cmd_call_wrapper(
             self.repo.index.entries.keys)]
 
@@ -583,8 +930,7 @@ class GitRepo(object):
             # active branch can be queried way faster:
             return self.get_indexed_files()
         else:
-            return [item.path for item in self.repo.tree(branch).traverse()
-                    if isinstance(item, Blob)]
+            return list(self.object_reader.iter_files(branch))
 
     def git_get_file_content(self, file_, branch='HEAD'):
         """
@@ -595,24 +941,19 @@ class GitRepo(object):
           content of file_ as a list of lines.
         """
 
-        content_str = self.repo.commit(branch).tree[file_].data_stream.read()
+        content_str = self.object_reader.read('%s:%s' % (branch, file_))
 
         # in python3 a byte string is returned. Need to convert it:
-        from six import PY3
         if PY3:
-            conv_str = u''
-            for b in bytes(content_str):
-                conv_str += chr(b)
-            return conv_str.splitlines()
-        else:
-            return content_str.splitlines()
+            content_str = content_str.decode('utf-8')
+        return content_str.splitlines()
         # TODO: keep splitlines?
 
     @normalize_paths(match_return_type=False)
     def _git_custom_command(self, files, cmd_str,
                            log_stdout=True, log_stderr=True, log_online=False,
                            expect_stderr=True, cwd=None, env=None,
-                           shell=None, expect_fail=False):
+                           shell=None, expect_fail=False, stdin=None):
         """Allows for calling arbitrary commands.
 
         Helper for developing purposes, i.e. to quickly implement git commands
@@ -634,10 +975,12 @@ class GitRepo(object):
             else cmd_str + files
         assert(cmd[0] == 'git')
         cmd = cmd[:1] + self._GIT_COMMON_OPTIONS + cmd[1:]
+        self._flush_pending_add()
         return self.cmd_call_wrapper.run(cmd, log_stderr=log_stderr,
                                   log_stdout=log_stdout, log_online=log_online,
                                   expect_stderr=expect_stderr, cwd=cwd,
-                                  env=env, shell=shell, expect_fail=expect_fail)
+                                  env=env, shell=shell, expect_fail=expect_fail,
+                                  stdin=stdin)
 
 # TODO: --------------------------------------------------------------------
 
@@ -671,21 +1014,25 @@ class GitRepo(object):
         self._git_custom_command('', 'git remote %s update %s' % (name, v),
                                  expect_stderr=True)
 
-    def git_fetch(self, name, options=''):
+    def git_fetch(self, name, options='', env=None):
         """
         """
 
         self._git_custom_command('', 'git fetch %s %s' % (options, name),
-                                 expect_stderr=True)
+                                 expect_stderr=True, env=env)
 
     def git_get_remote_url(self, name, push=False):
         """We need to know, where to clone from, if a remote is
         requested
         """
 
-        remote = self.repo.remote(name)
-        return remote.config_reader.get(
-            'pushurl' if push and remote.config_reader.has_option('pushurl') else 'url')
+        section = 'remote "%s"' % name
+        url = self.config.get(section, 'url')
+        if url is None:
+            raise ValueError("Remote named %r didn't exist" % name)
+        if push:
+            return self.config.get(section, 'pushurl', default=url)
+        return url
 
     def git_get_branch_commits(self, branch, limit=None, stop=None, value=None):
         """Return GitPython's commits for the branch
@@ -758,17 +1105,105 @@ class GitRepo(object):
     def git_remove_branch(self, branch):
         self._git_custom_command('', 'git branch -D %s' % branch)
 
-    def git_ls_remote(self, remote, options=None):
-        self._git_custom_command('', 'git ls-remote %s %s' %
-                                 (options if options is not None else '',
-                                  remote))
-        # TODO: Return values?
+    def git_ls_remote(self, remote, options=None, env=None):
+        """List references available in a remote
+
+        Returns
+        -------
+        dict
+          hexsha for each reference (e.g. 'refs/heads/master') in the remote
+        """
+        out, err = self._git_custom_command('', 'git ls-remote %s %s' %
+                                            (options if options is not None else '',
+                                             remote), env=env)
+        refs = {}
+        for line in out.splitlines():
+            if not line.strip():
+                continue
+            hexsha, ref = line.split(None, 1)
+            refs[ref.strip()] = hexsha
+        return refs
     
     @property
     def dirty(self):
         """Returns true if there is uncommitted changes or files not known to index"""
+        self._flush_pending_add()
         return self.repo.is_dirty(untracked_files=True)
 
+    def get_status(self, paths=None, untracked='normal', cached=False):
+        """Return status of the files in the index and the work tree
+
+        Status is obtained via a single `git status --porcelain=v2` call
+        limited to `paths`.
+
+        Parameters
+        ----------
+        paths: list of str, optional
+          Paths (relative to the top of the repository) to limit the status to
+        untracked: {'no', 'normal', 'all'}, optional
+          How to report untracked files (see --untracked-files of git status)
+        cached: bool, optional
+          Reuse status obtained for the same arguments until the index, HEAD
+          or config of the repository get modified.  Modifications of the
+          work tree alone (e.g. new untracked files) go unnoticed, so it
+          should be used only by callers which stage all their changes
+
+        Returns
+        -------
+        GitStatus
+          Lists of paths (relative to the top of the repository) which are
+          staged, modified but not staged, untracked and deleted from the work
+          tree.  The same path might be listed as staged and as not staged
+        """
+        self._flush_pending_add()
+        if not cached:
+            return self._get_status(paths, untracked)
+        key = (tuple(paths) if paths else None, untracked)
+        signature = _get_repo_signature(self.path)
+        if self._status_cache is None or self._status_cache[0] != signature:
+            self._status_cache = (signature, {})
+        cache = self._status_cache[1]
+        if key not in cache:
+            status = self._get_status(paths, untracked)
+            # git status might have refreshed the index itself
+            signature = _get_repo_signature(self.path)
+            if self._status_cache[0] != signature:
+                self._status_cache = (signature, {})
+            self._status_cache[1][key] = status
+            return status
+        return cache[key]
+
+    def _get_status(self, paths, untracked):
+        out, err = self._git_custom_command(
+            list(paths or []),
+            ["git", "status", "--porcelain=v2", "-z",
+             "--untracked-files=%s" % untracked, "--"])
+        status = GitStatus([], [], [], [])
+        records = iter(out.split('\0'))
+        for record in records:
+            if not record:
+                continue
+            kind = record[0]
+            if kind == '?':
+                status.untracked.append(record[2:])
+            elif kind in '12':
+                # 1 XY sub mH mI mW hH hI path
+                # 2 XY sub mH mI mW hH hI Xscore path<NUL>origPath
+                fields = record.split(' ', 8 if kind == '1' else 9)
+                xy, path = fields[1], fields[-1]
+                if kind == '2':
+                    next(records)
+                if xy[0] != '.':
+                    status.staged.append(path)
+                if xy[1] == 'D':
+                    status.deleted.append(path)
+                elif xy[1] != '.':
+                    status.notstaged.append(path)
+            elif kind == 'u':
+                raise RuntimeError(
+                    "Unmerged entries are not yet supported: %s" % record)
+        return status
+
     def gc(self, allow_background=False, auto=False):
         """Perform house keeping (garbage collection, repacking)"""
         cmd_options = ['git']
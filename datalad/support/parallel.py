@@ -0,0 +1,76 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Helpers to run independent (mostly I/O bound) operations concurrently
+"""
+
+import logging
+
+from multiprocessing.pool import ThreadPool
+
+lgr = logging.getLogger('datalad.support.parallel')
+
+
+def get_njobs(jobs, nitems=None):
+    """Return effective number of parallel jobs to use
+
+    Parameters
+    ----------
+    jobs: int or None
+      Requested number of jobs.  None or anything below 2 means serial
+      execution
+    nitems: int, optional
+      Number of items to be processed, so we do not start more threads than
+      needed
+    """
+    if not jobs or jobs < 2:
+        return 1
+    if nitems is not None:
+        return max(1, min(jobs, nitems))
+    return jobs
+
+
+def map_jobs(func, items, jobs=None):
+    """Apply `func` to every item of `items` using up to `jobs` threads
+
+    Results are returned as a list in the order of `items`, regardless of
+    the order in which they were completed.  If any call raises an exception,
+    the first one (in the order of `items`) is re-raised after all calls
+    have finished, so no operation is left running in the background.
+
+    Parameters
+    ----------
+    func: callable
+    items: iterable
+    jobs: int or None, optional
+      Number of parallel jobs.  If None or 1, items are processed serially
+      within the calling thread
+    """
+    items = list(items)
+    njobs = get_njobs(jobs, len(items))
+    if njobs == 1:
+        return [func(item) for item in items]
+
+    def _call(item):
+        try:
+            return True, func(item)
+        except Exception as exc:
+            return False, exc
+
+    lgr.debug("Processing %d items using %d parallel jobs", len(items), njobs)
+    pool = ThreadPool(njobs)
+    try:
+        outs = pool.map(_call, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    for success, out in outs:
+        if not success:
+            raise out
+    return [out for _, out in outs]
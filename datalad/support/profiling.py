@@ -0,0 +1,235 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Profiling of the whole datalad process
+
+Two modes are supported:
+
+cprofile
+  deterministic profiling of the main thread by cProfile.  Stats are stored
+  in pstats format (see `python -m pstats` or e.g. snakeviz)
+sampling
+  stacks of all the threads get sampled periodically.  Stored as collapsed
+  stacks (a line per stack with the number of samples), as taken by
+  flamegraph.pl or speedscope
+
+Time spent waiting for external processes (ran by `Runner` or `BatchedAnnex`)
+is attributed to synthetic frames named after the command, e.g.
+``<wait: git annex info>``, so it could be told apart from time spent in
+Python.
+
+Profiling could be enabled by the --profile option of the datalad command,
+or by DATALAD_PROFILE environment variable (cprofile or sampling) for the
+processes not started by the datalad command, e.g. special remotes ran by
+git-annex.
+"""
+
+__docformat__ = 'restructuredtext'
+
+import os
+import shlex
+import sys
+import tempfile
+import threading
+import time
+
+from collections import Counter
+from os.path import basename, join as opj
+
+from six import string_types
+
+from logging import getLogger
+lgr = getLogger('datalad.profiling')
+
+MODES = ('cprofile', 'sampling')
+
+# the profiler currently running in this process
+_profiler = None
+# label: function to call the waiting within
+_wait_funcs = {}
+_wait_funcs_lock = threading.Lock()
+
+
+def get_profile_filename(mode):
+    """Return name of the file to store the profile of this process into
+
+    Prefix of the file could be specified via DATALAD_PROFILE_PREFIX
+    environment variable.  By default files are stored in the temporary
+    directory, so they do not end up within datasets
+    """
+    return '%s-%d.%s' % (
+        os.environ.get('DATALAD_PROFILE_PREFIX')
+        or opj(tempfile.gettempdir(), 'datalad-profile'),
+        os.getpid(),
+        'pstats' if mode == 'cprofile' else 'collapsed')
+
+
+def _get_cmd_label(cmd):
+    """Return a short label for the command: program and (sub)command"""
+    if isinstance(cmd, string_types):
+        cmd = shlex.split(cmd)
+    if not cmd:
+        return ''
+    words = [basename(cmd[0])]
+    args = iter(cmd[1:])
+    for arg in args:
+        if arg in ('-c', '-C'):
+            # git options with a value
+            next(args, None)
+        elif not arg.startswith('-'):
+            words.append(arg)
+            # annex commands are subcommands of git annex
+            if arg != 'annex':
+                break
+    return ' '.join(words)
+
+
+def _get_wait_func(label):
+    """Return function which calls the given one within a frame named by label"""
+    func = _wait_funcs.get(label)
+    if func is None:
+        with _wait_funcs_lock:
+            func = _wait_funcs.get(label)
+            if func is None:
+                namespace = {}
+                # the label becomes the "file name" of the code, so profilers
+                # show it as a separate function
+                exec(compile("def wait(func, args, kwargs):\n"
+                             "    return func(*args, **kwargs)\n",
+                             "<wait: %s>" % label, "exec"), namespace)
+                func = _wait_funcs[label] = namespace['wait']
+    return func
+
+
+def wait(cmd, func, *args, **kwargs):
+    """Call func, which waits for the external command, if profiled
+
+    If profiling is enabled, the call is done within a synthetic frame named
+    after the command.  Otherwise func is just called
+    """
+    if _profiler is None:
+        return func(*args, **kwargs)
+    return _get_wait_func(_get_cmd_label(cmd))(func, args, kwargs)
+
+
+def _get_frame_name(code):
+    if code.co_filename.startswith('<wait: '):
+        return code.co_filename[1:-1]
+    return '%s (%s:%d)' % (code.co_name, basename(code.co_filename),
+                           code.co_firstlineno)
+
+
+class _Sampler(threading.Thread):
+    """Thread sampling stacks of all the other threads"""
+
+    def __init__(self, interval):
+        super(_Sampler, self).__init__(name='datalad-profile-sampler')
+        self.daemon = True
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            time.sleep(self.interval)
+
+    def sample(self):
+        names = dict((t.ident, t.name) for t in threading.enumerate())
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_get_frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, 'thread-%s' % ident))
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler(object):
+    """Profiler of the process
+
+    Only a single profiler could be running in a process at a time
+    """
+
+    def __init__(self, mode='cprofile', interval=0.005):
+        """
+        Parameters
+        ----------
+        mode : {'cprofile', 'sampling'}
+        interval : float, optional
+          Seconds between samples in sampling mode
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown profiling mode %r. Known are: %s"
+                             % (mode, ', '.join(MODES)))
+        self.mode = mode
+        self.interval = interval
+        self._profile = None
+        self._sampler = None
+
+    def start(self):
+        global _profiler
+        if _profiler is not None:
+            raise RuntimeError("Profiler %s is already running" % _profiler)
+        _profiler = self
+        lgr.debug("Starting %s profiling", self.mode)
+        if self.mode == 'cprofile':
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _Sampler(self.interval)
+            self._sampler.start()
+
+    def stop(self):
+        global _profiler
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if _profiler is self:
+            _profiler = None
+
+    def save(self, filename=None):
+        """Store the profile, by default into the file named by
+        `get_profile_filename`
+
+        Returns
+        -------
+        str
+          Name of the file
+        """
+        if filename is None:
+            filename = get_profile_filename(self.mode)
+        if self.mode == 'cprofile':
+            self._profile.dump_stats(filename)
+        else:
+            with open(filename, 'w') as f:
+                for stack, count in sorted(self._sampler.stacks.items()):
+                    f.write('%s %d\n' % (stack, count))
+        lgr.info("Stored %s profile into %s", self.mode, filename)
+        return filename
+
+    @classmethod
+    def from_env(cls):
+        """Return started profiler if requested by DATALAD_PROFILE env variable
+
+        Returns None otherwise
+        """
+        mode = os.environ.get('DATALAD_PROFILE')
+        if not mode:
+            return None
+        profiler = cls(mode)
+        profiler.start()
+        return profiler
@@ -11,9 +11,15 @@
 
 from abc import ABCMeta, abstractmethod, abstractproperty
 from os import linesep
+from os.path import basename
+import json
 import logging
+import sys
+import threading
 import time
 
+from six import string_types
+
 lgr = logging.getLogger('datalad.protocol')
 
 
@@ -91,6 +97,14 @@ class ProtocolInterface(object):
         """
         raise NotImplementedError
 
+    def add_details(self, id_, **details):
+        """Adds details (e.g. exit code) on the command to the section `id`.
+
+        To call before the corresponding call of end_section().  By default
+        details get ignored.
+        """
+        pass
+
     @abstractmethod
     def add_section(self, cmd, exception):
         """Adds a section to the protocol.
@@ -325,3 +339,179 @@ class ExecutionTimeExternalsProtocol(ExecutionTimeProtocol):
     @property
     def records_callables(self):
         return False
+
+
+class TracingProtocol(ExecutionTimeExternalsProtocol):
+    """Protocol to trace external command calls.
+
+    In addition to ExecutionTimeExternalsProtocol sections contain the keys
+    'cwd', 'status' (exit code), 'stdout' and 'stderr' (number of bytes of
+    the outputs) as provided by the runner, and 'caller' -- the datalad
+    function (module:function:line) which has invoked the command.
+
+    If `filename` is provided, every section gets appended (as a line of
+    JSON) to that file as soon as it ends, and is not kept in memory.
+    See `summarize_trace` to get a summary of such a file.
+    """
+
+    def __init__(self, filename=None):
+        super(TracingProtocol, self).__init__()
+        self._title = "Tracing protocol:" + linesep
+        self.filename = filename
+        self._file = None
+        # sections which were not ended yet, to not keep ended ones in memory
+        self._open = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count if self.filename else len(self._sections)
+
+    def start_section(self, cmd):
+        section = {'command': cmd, 'start': time.time(),
+                   'caller': _get_caller()}
+        with self._lock:
+            id_ = self._count
+            self._count += 1
+            if self.filename:
+                self._open[id_] = section
+            else:
+                self._sections.append(section)
+        return id_
+
+    def _get_section(self, id_):
+        return self._open[id_] if self.filename else self._sections[id_]
+
+    def add_details(self, id_, **details):
+        self._get_section(id_).update(details)
+
+    def end_section(self, id_, exception):
+        section = self._get_section(id_)
+        section['end'] = t_end = time.time()
+        section['duration'] = t_end - section['start']
+        section['exception'] = exception
+        if self.filename:
+            self._write(self._open.pop(id_))
+
+    def add_section(self, cmd, exception):
+        if self.filename:
+            self._write({'command': cmd, 'start': None, 'end': None,
+                         'duration': None, 'exception': exception})
+            with self._lock:
+                self._count += 1
+        else:
+            super(TracingProtocol, self).add_section(cmd, exception)
+
+    def _write(self, section):
+        line = json.dumps(section, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.filename, 'a')
+            self._file.write(line)
+            self._file.flush()
+
+    def write_to_file(self, file_):
+        if self.filename:
+            # everything is written already
+            return
+        with open(file_, 'w') as f:
+            for section in self._sections:
+                f.write(json.dumps(section, default=str) + '\n')
+
+
+# modules which only run the commands, so not considered to be the callers
+_RUNNING_MODULES = ('cmd.py', 'protocol.py')
+
+
+def _get_caller():
+    """Return module:function:line of the datalad function running a command
+
+    Helpers of the repository classes (with names starting with _) and
+    decorators are skipped, so the "public" function gets reported
+    """
+    frame = sys._getframe(2)
+    first = None
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '')
+        if not basename(code.co_filename) in _RUNNING_MODULES:
+            caller = "%s:%s:%d" % (module, code.co_name, frame.f_lineno)
+            if first is None:
+                first = caller
+            if not module.startswith('datalad'):
+                # we left datalad -- report the last known one
+                break
+            if not (code.co_name.startswith('_') or code.co_name == 'newfunc'):
+                return caller
+        frame = frame.f_back
+    return first
+
+
+def get_command_type(cmd):
+    """Return a "type" of the command, e.g. 'git annex add' for a git call
+
+    Options (and values of -c and -C options) are skipped
+    """
+    if not isinstance(cmd, list):
+        cmd = cmd.split()
+    if not cmd:
+        return ''
+    words = [basename(cmd[0])]
+    skip = False
+    for arg in cmd[1:]:
+        if skip:
+            skip = False
+        elif arg in ('-c', '-C'):
+            skip = True
+        elif not arg.startswith('-'):
+            words.append(arg)
+            if words[-2:] != ['git', 'annex']:
+                break
+    return ' '.join(words)
+
+
+def summarize_trace(sections, top=None):
+    """Summarize durations of the traced commands per command type
+
+    Parameters
+    ----------
+    sections : iterable of dict or str
+      Sections of a TracingProtocol, or a name of a JSON lines file with them
+    top : int, optional
+      Number of the slowest (in total) command types to return
+
+    Returns
+    -------
+    list of (type, count, total, mean, max)
+      Sorted by the total duration, the slowest first
+    """
+    if isinstance(sections, string_types):
+        with open(sections) as f:
+            sections = [json.loads(line) for line in f if line.strip()]
+    durations = {}
+    for section in sections:
+        if section.get('duration') is None:
+            continue
+        durations.setdefault(
+            get_command_type(section['command']), []).append(section['duration'])
+    summary = sorted(
+        ((type_, len(d), sum(d), sum(d) / len(d), max(d))
+         for type_, d in durations.items()),
+        key=lambda x: x[2], reverse=True)
+    return summary[:top] if top else summary
+
+
+_trace_protocol = None
+_trace_protocol_lock = threading.Lock()
+
+
+def get_trace_protocol(filename):
+    """Return a TracingProtocol shared by all the runners of this process
+
+    All the traced commands get written into the same file
+    """
+    global _trace_protocol
+    with _trace_protocol_lock:
+        if _trace_protocol is None or _trace_protocol.filename != filename:
+            _trace_protocol = TracingProtocol(filename)
+        return _trace_protocol
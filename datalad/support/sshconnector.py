@@ -0,0 +1,320 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Interface to multiplexed SSH connections
+
+A single master connection (ControlMaster) per host and port is established
+and then used by all the commands to be ran on that host, so authentication
+is done only once and every command costs only a round trip.  Multiple
+commands could also be ran within a single round trip as a script (see
+`SSHConnection.run_batch`), or concurrently over the same connection (see
+`SSHConnection.run_concurrent`).
+"""
+
+__docformat__ = 'restructuredtext'
+
+import os
+import threading
+from os.path import exists, join as opj
+
+from six import string_types
+from six.moves import shlex_quote
+from six.moves.urllib.parse import urlparse
+
+from .. import cfg
+from ..cmd import Runner
+from ..dochelpers import exc_str
+from .exceptions import CommandError
+from .parallel import map_jobs
+
+from logging import getLogger
+lgr = getLogger('datalad.ssh')
+
+# to separate outputs of the commands ran within a single script
+_MARKER = '@@DATALAD-SSH-BATCH@@'
+
+
+def _get_cmd_str(cmd):
+    """Return command (list of arguments or a shell snippet) as a string"""
+    if isinstance(cmd, string_types):
+        return cmd
+    return ' '.join(shlex_quote(arg) for arg in cmd)
+
+
+def get_batch_script(cmds):
+    """Return a shell script running all the commands, separating their outputs
+
+    All the commands are ran (regardless of failures of the previous ones),
+    each with its stdin closed.  Closing markers are preceded by a newline,
+    so they start a line even if the output of the command does not end
+    with one.  See `parse_batch_output`
+    """
+    lines = []
+    for i, cmd in enumerate(cmds):
+        lines += [
+            "echo '%s %d'; echo '%s %d' >&2" % (_MARKER, i, _MARKER, i),
+            "( %s ) </dev/null" % _get_cmd_str(cmd),
+            "s=$?; echo; echo \"%s %d $s\"; echo >&2; echo '%s' >&2"
+            % (_MARKER, i, _MARKER),
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def _split_batch_stream(stream, n):
+    """Split output of a batch script into n outputs, plus statuses if any"""
+    outs = [''] * n
+    statuses = [None] * n
+    current = None
+    for line in stream.splitlines(True):
+        if line.startswith(_MARKER):
+            fields = line.split()
+            if len(fields) == 2:
+                current = int(fields[1])
+                continue
+            if len(fields) == 3:
+                statuses[int(fields[1])] = int(fields[2])
+            if current is not None:
+                # strip the newline emitted before the closing marker
+                outs[current] = outs[current][:-1]
+            current = None
+            continue
+        if current is not None:
+            outs[current] += line
+    return outs, statuses
+
+
+def parse_batch_output(out, err, n):
+    """Parse outputs of the script produced by `get_batch_script` for n commands
+
+    Returns
+    -------
+    list of (status, stdout, stderr)
+      Status is None for the commands which were not ran, e.g. since the
+      connection broke
+    """
+    outs, statuses = _split_batch_stream(out, n)
+    errs, _ = _split_batch_stream(err, n)
+    return list(zip(statuses, outs, errs))
+
+
+class SSHConnection(object):
+    """A multiplexed connection to a single host"""
+
+    def __init__(self, ctrl_path, host, port=None):
+        """
+        Parameters
+        ----------
+        ctrl_path : str
+          Path to the socket of the master connection
+        host : str
+          Host (possibly with a user, as in user@host) to connect to
+        port : int, optional
+        """
+        self.ctrl_path = ctrl_path
+        self.host = host
+        self.port = port
+        self.runner = Runner()
+        self._lock = threading.Lock()
+        self._opened = False
+        # either the master connection was started by us, and not reused
+        # from e.g. another datalad process
+        self._started = False
+
+    def __repr__(self):
+        return "%s(%r, port=%r)" % (self.__class__.__name__, self.host, self.port)
+
+    def _get_ssh_cmd(self, *opts):
+        cmd = ["ssh"] + list(opts) + ["-S", self.ctrl_path]
+        if self.port:
+            cmd += ["-p", str(self.port)]
+        return cmd + [self.host]
+
+    def get_git_env(self):
+        """Return environment for git to use the master connection"""
+        env = os.environ.copy()
+        env['GIT_SSH_COMMAND'] = "ssh -S %s" % shlex_quote(self.ctrl_path)
+        return env
+
+    def is_open(self):
+        """Either the master connection is running"""
+        if not exists(self.ctrl_path):
+            return False
+        try:
+            self.runner.run(self._get_ssh_cmd("-O", "check"),
+                            expect_fail=True, expect_stderr=True)
+        except CommandError:
+            return False
+        return True
+
+    def open(self):
+        """Start the master connection unless it is running already
+
+        Connection persists in the background (for datalad.ssh persist
+        time, 15m by default) after the last command, so it could be reused
+        by subsequent datalad invocations as well
+        """
+        with self._lock:
+            if self._opened and exists(self.ctrl_path):
+                return
+            if not self.is_open():
+                persist = cfg.get('datalad', 'ssh persist time', default='15m')
+                lgr.debug("Starting SSH master connection to %s", self)
+                # -f -N: go into background after authentication without
+                # running any command
+                self.runner.run(
+                    self._get_ssh_cmd("-fN", "-o", "ControlMaster=auto",
+                                      "-o", "ControlPersist=%s" % persist),
+                    expect_stderr=True)
+                self._started = True
+            self._opened = True
+
+    def close(self):
+        """Stop the master connection"""
+        with self._lock:
+            if not exists(self.ctrl_path):
+                self._opened = self._started = False
+                return
+            lgr.debug("Stopping SSH master connection to %s", self)
+            try:
+                self.runner.run(self._get_ssh_cmd("-O", "stop"),
+                                expect_fail=True, expect_stderr=True)
+            except CommandError as exc:
+                lgr.debug("Failed to stop SSH master connection to %s: %s",
+                          self, exc_str(exc))
+            self._opened = self._started = False
+
+    def __call__(self, cmd, **kwargs):
+        """Run a command on the host
+
+        Parameters
+        ----------
+        cmd : list or str
+          Command as a list of arguments, or a shell snippet
+        **kwargs
+          Passed into `Runner.run`
+
+        Returns
+        -------
+        (stdout, stderr)
+        """
+        self.open()
+        return self.runner.run(self._get_ssh_cmd() + [_get_cmd_str(cmd)],
+                               **kwargs)
+
+    def run_batch(self, cmds):
+        """Run multiple commands within a single round trip
+
+        Commands are ran in a single remote shell script one after another,
+        regardless of failures of the previous ones.
+
+        Parameters
+        ----------
+        cmds : list of (list or str)
+
+        Returns
+        -------
+        list of (status, stdout, stderr)
+          per each command
+        """
+        cmds = list(cmds)
+        if not cmds:
+            return []
+        self.open()
+        try:
+            out, err = self.runner.run(
+                self._get_ssh_cmd() + ["sh", "-s"],
+                stdin=get_batch_script(cmds), expect_stderr=True)
+        except CommandError as exc:
+            # connection (or shell) failed, so some commands might not have
+            # been ran
+            out, err = exc.stdout or '', exc.stderr or ''
+            lgr.debug("Batch of %d commands on %s failed: %s",
+                      len(cmds), self, exc_str(exc))
+        return parse_batch_output(out, err, len(cmds))
+
+    def run_concurrent(self, cmds, jobs=4):
+        """Run multiple commands concurrently over the connection
+
+        Returns
+        -------
+        list of (status, stdout, stderr)
+          per each command
+        """
+        self.open()
+
+        def run(cmd):
+            try:
+                out, err = self(cmd, expect_fail=True, expect_stderr=True)
+                return 0, out, err
+            except CommandError as exc:
+                return exc.code, exc.stdout or '', exc.stderr or ''
+        return map_jobs(run, cmds, jobs=jobs)
+
+
+class SSHManager(object):
+    """Keeps track of SSH connections, one per host and port
+
+    Sockets of the master connections are stored under the user cache
+    directory.
+    """
+
+    def __init__(self, socket_dir=None):
+        self.socket_dir = socket_dir or opj(cfg.dirs.user_cache_dir, 'sockets')
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_ssh_url(url):
+        """Return ssh:// URL for an SSH URL (possibly scp-like user@host:path)
+
+        Returns None if URL is not an SSH one
+        """
+        if url.startswith('ssh://'):
+            return url
+        if '://' in url or ':' not in url:
+            return None
+        host, path = url.split(':', 1)
+        if not host or '/' in host:
+            # local path
+            return None
+        # scp-like paths are relative to the home directory unless absolute
+        return 'ssh://%s%s' % (host, path if path.startswith('/') else '/~/' + path)
+
+    def get_connection(self, url):
+        """Return connection to the host of the URL (e.g. ssh://user@host:port/path)
+
+        Connection gets opened upon first use
+        """
+        parsed = urlparse(url)
+        if not parsed.netloc:
+            raise ValueError("Malformed SSH URL: %s" % url)
+        host, port = parsed.netloc, parsed.port
+        if port:
+            host = host.rsplit(':', 1)[0]
+        key = (host, port)
+        with self._lock:
+            if key not in self._connections:
+                if not exists(self.socket_dir):
+                    os.makedirs(self.socket_dir)
+                ctrl_path = opj(self.socket_dir,
+                                host + (":%s" % port if port else ""))
+                self._connections[key] = SSHConnection(ctrl_path, host, port)
+            return self._connections[key]
+
+    def close(self):
+        """Stop all the master connections started by this manager
+
+        Master connections which were already running (e.g. started by
+        another process) are left running
+        """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections = {}
+        for connection in connections:
+            if connection._started:
+                connection.close()
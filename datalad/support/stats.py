@@ -14,7 +14,11 @@ __docformat__ = 'restructuredtext'
 
 # TODO: we have already smth in progressbar...  check
 import humanize
-from ..utils import auto_repr
+import threading
+import time
+
+from logging import getLogger
+lgr = getLogger('datalad.stats')
 
 _COUNTS = (
     'files', 'urls',
@@ -33,19 +37,28 @@ _FORMATTERS = {
     'versions': lambda versions: ', '.join(versions)
 }
 
-# @auto_repr
+def _get_metric_default(m):
+    return [] if m in _LISTS else 0
+
+
 class ActivityStats(object):
     """Helper to collect/pass statistics on carried out actions
 
     It also keeps track of total counts, which do not get reset by
     reset() call, and "total" stat could be obtained by .get_total()
     Could be done so many other ways
+
+    Current values are stored in slots, so accessing and incrementing them
+    (e.g. `stats.files += 1`) is as cheap as for any attribute.  Such
+    increments are not atomic though, so parallel workers should collect
+    their own stats (or use `increment`) and merge them via `+=`, which is
+    thread-safe.
     """
     __metrics__ = _COUNTS + _LISTS
-    __slots__ = __metrics__ + ('_current', '_total')
+    __slots__ = __metrics__ + ('_total', '_providers', '_started', '_lock')
 
     def __init__(self, **vals):
-        self._current = {}
+        self._lock = threading.Lock()
         self._total = {}
         self.reset(full=True, vals=vals)
 
@@ -54,6 +67,10 @@ class ActivityStats(object):
         return "%s(%s)" % (self.__class__.__name__,
                            ", ".join(["%s=%s" % (k,v) for k, v in self._current.items() if v]))
 
+    @property
+    def _current(self):
+        return dict((m, getattr(self, m)) for m in self.__metrics__)
+
     # Comparisons operate solely on _current
     def __eq__(self, other):
         return (self._current == other._current)# and (self._total == other._total)
@@ -62,10 +79,18 @@ class ActivityStats(object):
         return (self._current != other._current)# or (self._total != other._total)
 
     def __iadd__(self, other):
-        for m in other.__metrics__:
-            # not inplace for increased paranoia for bloody lists, and dummy implementation of *add
-            self._current[m] = self._current[m] + other._current[m]
-            self._total[m] = self._total[m] + other._total[m]
+        # take a consistent snapshot of other first, since it might be in use
+        # by another thread, and lock only one at a time to avoid deadlocks
+        with other._lock:
+            current, total = other._current, other._total.copy()
+            providers = dict((k, list(v)) for k, v in other._providers.items())
+        with self._lock:
+            for m in self.__metrics__:
+                # not inplace for increased paranoia for bloody lists, and dummy implementation of *add
+                setattr(self, m, getattr(self, m) + current[m])
+                self._total[m] = self._total[m] + total[m]
+            for provider, values in providers.items():
+                self._add_provider(provider, *values)
         return self
 
     def __add__(self, other):
@@ -74,33 +99,67 @@ class ActivityStats(object):
         # so doing ugly way
         out = ActivityStats(**self._current)
         out._total = self._total.copy()
+        out._providers = self._copy_providers()
+        out._started = self._started
         out += other
         return out
 
-    def __setattr__(self, key, value):
-        if key in self.__metrics__:
-            self._current[key] = value
-        else:
-            return super(ActivityStats, self).__setattr__(key, value)
-
-    def __getattribute__(self, key):
-        if (not key.startswith('_')) and key in self.__metrics__:
-            return self._current[key]
-        else:
-            return super(ActivityStats, self).__getattribute__(key)
-
     def _get_updated_total(self):
         """Return _total updated with _current
         """
         out = self._total.copy()
-        for k, v in self._current.items():
+        for k in self.__metrics__:
             # not inplace + so we could create copies of lists
-            out[k] = out[k] + v
+            out[k] = out[k] + getattr(self, k)
         return out
 
     def increment(self, k, v=1):
-        """Helper for incrementing counters"""
-        self._current[k] += v
+        """Helper for incrementing counters (thread-safe)"""
+        with self._lock:
+            setattr(self, k, getattr(self, k) + v)
+
+    def _copy_providers(self):
+        """Return a copy of the downloads per provider (thread-safe)"""
+        with self._lock:
+            return dict((k, list(v)) for k, v in self._providers.items())
+
+    def _add_provider(self, provider, downloaded, size, time_):
+        values = self._providers.setdefault(provider, [0, 0, 0])
+        values[0] += downloaded
+        values[1] += size
+        values[2] += time_
+
+    def add_download(self, provider, size, time_):
+        """Account for a download of `size` bytes which took `time_` seconds
+
+        `provider` (e.g. a host name) is used for the breakdown of downloads
+        (see `get_providers`)
+        """
+        with self._lock:
+            self.downloaded += 1
+            self.downloaded_size += size
+            self.downloaded_time += time_
+            self._add_provider(provider, 1, size, time_)
+
+    def get_providers(self):
+        """Return {provider: (downloaded, size, time)} for all the downloads"""
+        return dict((k, tuple(v)) for k, v in self._copy_providers().items())
+
+    def get_rates(self):
+        """Return rates of the activities (per second)
+
+        Files and URLs are per wall time since the stats were created (or
+        fully reset), and download throughput (bytes/s) is per time spent
+        downloading
+        """
+        elapsed = time.time() - self._started
+        total = self._get_updated_total()
+        return {
+            'files': total['files'] / elapsed if elapsed else 0.,
+            'urls': total['urls'] / elapsed if elapsed else 0.,
+            'downloaded_size': total['downloaded_size'] / total['downloaded_time']
+                               if total['downloaded_time'] else 0.,
+        }
 
     def _reset_values(self, d, vals={}):
         for c in _COUNTS:
@@ -112,23 +171,32 @@ class ActivityStats(object):
         # Initialize
         if not full:
             self._total = self._get_updated_total()
-        self._reset_values(self._current, vals=vals)
+        for m in self.__metrics__:
+            setattr(self, m, vals.get(m, _get_metric_default(m)))
         if full:
             self._reset_values(self._total, vals=vals)
+            self._providers = {}
+            self._started = time.time()
 
     def get_total(self):
         """Return a copy of total stats (for convenience)"""
-        return self.__class__(**self._get_updated_total())
+        out = self.__class__(**self._get_updated_total())
+        out._providers = self._copy_providers()
+        out._started = self._started
+        return out
 
     def as_dict(self):
-        return self._current.copy()
+        return self._current
 
-    def as_str(self, mode='full'):
+    def as_str(self, mode='full', rates=False):
         """
 
         Parameters
         ----------
         mode : {'full', 'line'}
+        rates : bool, optional
+          Either to include rates (see `get_rates`) and breakdown of downloads
+          per provider
         """
 
         # Example
@@ -169,6 +237,15 @@ Branches merged:
         ]
         # Filter out empty/0 ones
         out = ["%s: " % s + str(entries[m]) for s, m in out_formats if entries[m]]
+        if rates:
+            rates_ = self.get_rates()
+            out.append("Rates: %.2f files/s, %.2f URLs/s, %s/s downloads"
+                       % (rates_['files'], rates_['urls'],
+                          humanize.naturalsize(rates_['downloaded_size'])))
+            for provider, (downloaded, size, time_) in sorted(self._copy_providers().items()):
+                out.append(" %s: %d downloaded, %s, %s/s"
+                           % (provider, downloaded, humanize.naturalsize(size),
+                              humanize.naturalsize(size / time_ if time_ else 0)))
         if mode == 'full':
             return '\n'.join(out)
         elif mode == 'line':
@@ -181,3 +258,47 @@ Branches merged:
                     **entries)
         else:
             raise ValueError("Unknown mode %s" % mode)
+
+
+class StatsReporter(object):
+    """Log progress of the (total) stats periodically from a background thread
+
+    To be used as a context manager around a long running activity::
+
+        with StatsReporter(stats, interval=60):
+            run_pipeline(...)
+    """
+
+    def __init__(self, stats, interval=60, logger=None):
+        self.stats = stats
+        self.interval = interval
+        self.logger = logger or lgr
+        self._stop = threading.Event()
+        self._thread = None
+
+    def report(self):
+        self.logger.info("Progress: %s",
+                         self.stats.get_total().as_str(mode='line', rates=True))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="StatsReporter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -8,7 +8,9 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
 from ..cache import DictCache
+from ..cache import PersistentCache
 from ...tests.utils import assert_equal
+from ...tests.utils import with_tempfile
 
 
 def test_DictCache():
@@ -21,3 +23,17 @@ def test_DictCache():
 
     d['c'] = 2
     assert_equal(d, {'c': 2, 'b': 1})
+
+
+@with_tempfile
+def test_PersistentCache(path):
+    c = PersistentCache(path, ttl=100)
+    assert_equal(c.get('a'), None)
+    assert_equal(c.get('a', 1), 1)
+    c.set('a', {'b': [1, 2]})
+    assert_equal(c.get('a'), {'b': [1, 2]})
+    c.close()
+    # shared with other instances, e.g. in other processes
+    assert_equal(PersistentCache(path).get('a'), {'b': [1, 2]})
+    # expired
+    assert_equal(PersistentCache(path, ttl=0).get('a'), None)
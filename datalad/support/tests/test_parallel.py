@@ -0,0 +1,54 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import threading
+import time
+
+from ..parallel import map_jobs, get_njobs
+from ...tests.utils import assert_equal, assert_raises
+
+
+def test_get_njobs():
+    assert_equal(get_njobs(None), 1)
+    assert_equal(get_njobs(1), 1)
+    assert_equal(get_njobs(4), 4)
+    assert_equal(get_njobs(4, 2), 2)
+    assert_equal(get_njobs(4, 0), 1)
+
+
+def test_map_jobs():
+    def f(x):
+        # sleep so later items would be done first if run in parallel
+        time.sleep(0.01 * (5 - x))
+        return x, threading.current_thread().name
+
+    out = map_jobs(f, range(5))
+    assert_equal([o[0] for o in out], list(range(5)))
+    assert_equal(set(o[1] for o in out), {threading.current_thread().name})
+
+    out = map_jobs(f, range(5), jobs=3)
+    assert_equal([o[0] for o in out], list(range(5)))
+    assert(threading.current_thread().name not in set(o[1] for o in out))
+
+
+def test_map_jobs_exception():
+    done = []
+
+    def f(x):
+        if x == 1:
+            raise ValueError(x)
+        time.sleep(0.01)
+        done.append(x)
+        return x
+
+    for jobs in (None, 2):
+        del done[:]
+        assert_raises(ValueError, map_jobs, f, range(4), jobs)
+    # all but failed ones were completed in the parallel case
+    assert_equal(sorted(done), [0, 2, 3])
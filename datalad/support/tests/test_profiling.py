@@ -0,0 +1,85 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import pstats
+import sys
+
+from mock import patch
+
+from .. import profiling
+from ..profiling import Profiler, _get_cmd_label
+from ...cmd import Runner
+from ...tests.utils import eq_, ok_, assert_raises, assert_in
+from ...tests.utils import with_tempfile
+
+
+def test_get_cmd_label():
+    eq_(_get_cmd_label(['/usr/bin/git', 'commit', '-m', 'msg']), 'git commit')
+    eq_(_get_cmd_label(['git', '-c', 'annex.x=1', 'annex', 'info', 'f']),
+        'git annex info')
+    eq_(_get_cmd_label('git annex whereis --json file'), 'git annex whereis')
+    eq_(_get_cmd_label(['ls']), 'ls')
+
+
+def _run_python():
+    # a slow enough command, so it gets sampled
+    Runner().run([sys.executable, '-c', 'import time; time.sleep(0.2)'])
+
+
+@with_tempfile
+def test_cprofile(filename):
+    profiler = Profiler('cprofile')
+    profiler.start()
+    try:
+        # only a single one at a time
+        assert_raises(RuntimeError, Profiler('sampling').start)
+        _run_python()
+    finally:
+        profiler.stop()
+    eq_(profiler.save(filename), filename)
+    stats = pstats.Stats(filename)
+    files = set(f for f, _, _ in stats.stats)
+    # waiting for the command is shown as a separate function
+    assert_in('<wait: %s>' % _get_cmd_label([sys.executable]), files)
+    # and nothing is done when not profiling
+    with patch.object(profiling, '_get_wait_func') as get_wait_func:
+        _run_python()
+    ok_(not get_wait_func.called)
+
+
+@with_tempfile
+def test_sampling(filename):
+    profiler = Profiler('sampling', interval=0.001)
+    profiler.start()
+    try:
+        _run_python()
+    finally:
+        profiler.stop()
+    profiler.save(filename)
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    ok_(lines)
+    # collapsed stacks with a count
+    ok_(all(int(l.rsplit(' ', 1)[1]) > 0 for l in lines))
+    assert_in('wait: %s' % _get_cmd_label([sys.executable]),
+              ';'.join(lines))
+    assert_raises(ValueError, Profiler, 'unknown')
+
+
+def test_from_env():
+    with patch.dict('os.environ', {'DATALAD_PROFILE': ''}):
+        eq_(Profiler.from_env(), None)
+    with patch.dict('os.environ', {'DATALAD_PROFILE': 'sampling'}):
+        profiler = Profiler.from_env()
+    try:
+        eq_(profiler.mode, 'sampling')
+        ok_(profiling._profiler is profiler)
+    finally:
+        profiler.stop()
+    ok_(profiling._profiler is None)
@@ -0,0 +1,127 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+from os.path import join as opj, exists
+
+from ...cmd import Runner
+from ..exceptions import CommandError
+from ..sshconnector import SSHManager
+from ..sshconnector import get_batch_script, parse_batch_output
+from ...tests.utils import eq_, ok_
+from ...tests.utils import assert_raises
+from ...tests.utils import assert_false
+from ...tests.utils import with_tempfile
+from ...tests.utils import skip_if, skip_if_on_windows
+
+
+@skip_if_on_windows
+def test_batch_script():
+    # a local shell stands in for the remote one
+    cmds = [["echo", "a b"],
+            "echo err >&2; exit 3",
+            ["printf", "multi\nline\n"],
+            ["test", "-e", "/nonexistent path"],
+            # outputs without trailing newlines
+            "printf x; printf y >&2; exit 4"]
+    out, err = Runner().run(["sh", "-s"], stdin=get_batch_script(cmds),
+                            expect_stderr=True)
+    eq_(parse_batch_output(out, err, len(cmds)),
+        [(0, "a b\n", ""),
+         (3, "", "err\n"),
+         (0, "multi\nline\n", ""),
+         (1, "", ""),
+         (4, "x", "y")])
+    # if script got interrupted, statuses of the rest are unknown
+    eq_(parse_batch_output(out[:out.index('multi')], '', len(cmds))[2:],
+        [(None, '', '')] * 3)
+
+
+@with_tempfile(mkdir=True)
+def test_SSHManager(d):
+    manager = SSHManager(socket_dir=opj(d, 'sockets'))
+    c1 = manager.get_connection('ssh://user@example.com/path')
+    ok_(manager.get_connection('ssh://user@example.com/other') is c1)
+    eq_((c1.host, c1.port), ('user@example.com', None))
+    c2 = manager.get_connection('ssh://example.com:2222/path')
+    eq_((c2.host, c2.port), ('example.com', 2222))
+    eq_(c2.ctrl_path, opj(d, 'sockets', 'example.com:2222'))
+    ok_(not c2.is_open())
+    assert_raises(ValueError, manager.get_connection, 'example.com')
+    for url, ssh_url in (('ssh://host/path', 'ssh://host/path'),
+                         ('user@host:path', 'ssh://user@host/~/path'),
+                         ('host:/abs/path', 'ssh://host/abs/path'),
+                         ('/local/path', None),
+                         ('./local:path', None),
+                         ('http://host/path', None)):
+        eq_(SSHManager.get_ssh_url(url), ssh_url)
+    # nothing was opened, so nothing to close
+    manager.close()
+
+
+class _FakeRunner(object):
+    """Pretends to run ssh, with a master connection running or not"""
+
+    def __init__(self, ctrl_path, running):
+        self.ctrl_path = ctrl_path
+        self.running = running
+        self.cmds = []
+
+    def run(self, cmd, **kwargs):
+        self.cmds.append(cmd)
+        if '-O' in cmd:
+            if not self.running:
+                raise CommandError(cmd=str(cmd), code=255)
+            if 'stop' in cmd:
+                os.unlink(self.ctrl_path)
+                self.running = False
+        elif '-fN' in cmd:
+            open(self.ctrl_path, 'w').close()
+            self.running = True
+        return '', ''
+
+
+@with_tempfile(mkdir=True)
+def test_SSHManager_close_started_only(d):
+    manager = SSHManager(socket_dir=d)
+    # master connection started by another process gets reused, but not
+    # stopped upon close
+    shared = manager.get_connection('ssh://shared.com/path')
+    open(shared.ctrl_path, 'w').close()
+    shared.runner = _FakeRunner(shared.ctrl_path, running=True)
+    shared.open()
+    assert_false(any('-fN' in cmd for cmd in shared.runner.cmds))
+    # the one we started ourselves gets stopped
+    own = manager.get_connection('ssh://own.com/path')
+    own.runner = _FakeRunner(own.ctrl_path, running=False)
+    own.open()
+    ok_(own.runner.running)
+    manager.close()
+    ok_(shared.runner.running)
+    ok_(exists(shared.ctrl_path))
+    assert_false(own.runner.running)
+
+
+@skip_if(cond=not os.environ.get('DATALAD_TESTS_SSH'),
+         msg="Run this test by setting the DATALAD_TESTS_SSH")
+@skip_if_on_windows
+@with_tempfile(mkdir=True)
+def test_ssh_localhost(d):
+    manager = SSHManager(socket_dir=opj(d, 'sockets'))
+    ssh = manager.get_connection('ssh://localhost')
+    out, err = ssh(["echo", "a b"])
+    eq_(out, "a b\n")
+    ok_(ssh.is_open())
+    eq_(ssh.run_batch([["echo", "1"], "exit 2"]),
+        [(0, "1\n", ""), (2, "", "")])
+    eq_([r[:2] for r in ssh.run_concurrent(
+        [["echo", str(i)] for i in range(5)], jobs=3)],
+        [(0, "%d\n" % i) for i in range(5)])
+    manager.close()
+    ok_(not exists(ssh.ctrl_path))
@@ -7,12 +7,20 @@
 #
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
+import logging
+import threading
+import time
+
 from ..stats import ActivityStats, _COUNTS
+from ..stats import StatsReporter
 
 from ...tests.utils import assert_equal
 from ...tests.utils import assert_not_equal
 from ...tests.utils import assert_raises
 from ...tests.utils import assert_in
+from ...tests.utils import assert_not_in
+from ...tests.utils import assert_true
+from ...tests.utils import swallow_logs
 
 def test_ActivityStats_basic():
     stats = ActivityStats()
@@ -91,3 +99,62 @@ def test_add():
     assert_equal(stats1.get_total(), ActivityStats(files=2, urls=1))
     assert_equal(stats2, ActivityStats(files=1, urls=1))
     assert_equal(stats3.get_total(), ActivityStats(files=3, urls=2))
+
+
+def test_downloads_and_rates():
+    stats = ActivityStats()
+    stats.files += 2
+    stats.add_download('example.com', 2000000, 2.)
+    stats.add_download('example.com', 1000000, 1.)
+    stats.add_download('other.org', 100, 1.)
+    assert_equal(stats.downloaded, 3)
+    assert_equal(stats.downloaded_size, 3000100)
+    assert_equal(stats.get_providers(),
+                 {'example.com': (2, 3000000, 3.), 'other.org': (1, 100, 1.)})
+    rates = stats.get_rates()
+    assert_equal(rates['downloaded_size'], 3000100 / 4.)
+    assert_true(rates['files'] > 0)
+
+    # breakdown survives totals and merges
+    stats.reset()
+    total = stats.get_total()
+    assert_equal(total.get_providers(), stats.get_providers())
+    total += total.get_total()
+    assert_equal(total.get_providers()['other.org'], (2, 200, 2.))
+
+    # rates are not reported by default
+    assert_not_in('Rates', stats.get_total().as_str())
+    s = stats.get_total().as_str(rates=True)
+    assert_in('Rates: ', s)
+    assert_in(' example.com: 2 downloaded, 3.0 MB, 1.0 MB/s', s)
+    assert_equal(len(stats.get_total().as_str(mode='line', rates=True).split('\n')), 1)
+
+
+def test_merge_threads():
+    stats = ActivityStats()
+
+    def work(i):
+        local = ActivityStats()
+        for j in range(100):
+            local.files += 1
+            stats.increment('urls')
+        local.versions.append(str(i))
+        stats.__iadd__(local)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert_equal(stats.files, 800)
+    assert_equal(stats.urls, 800)
+    assert_equal(sorted(stats.versions), [str(i) for i in range(8)])
+
+
+def test_StatsReporter():
+    stats = ActivityStats(files=3)
+    with swallow_logs(new_level=logging.INFO) as cml:
+        with StatsReporter(stats, interval=0.01):
+            time.sleep(0.1)
+        assert_in('Progress:', cml.out)
+        assert_in('Files processed: ', cml.out)
@@ -473,6 +473,24 @@ def test_dropkey(batch, direct, path):
     annex.annex_dropkey(list(tree1_md5e_keys.values()), **kw)
 
 
+@with_tree(**tree1args)
+def test_AnnexRepo_drop(path):
+    annex = AnnexRepo(path, init=True, backend='MD5E')
+    files = sorted(tree1_md5e_keys)
+    annex.add_to_annex(files)
+    # the only copies -- none could be dropped, but all are reported
+    res = annex.drop(files)
+    eq_(set(res), set(files))
+    ok_(not any(success for success, _ in res.values()))
+    assert_true(all(annex.file_has_content(f) for f in files))
+    # and many could be dropped in multiple chunks
+    res = annex.drop(files, options=['--force'], chunk_size=3)
+    ok_(all(success for success, _ in res.values()))
+    assert_false(any(annex.file_has_content(f) for f in files))
+    # nothing left to drop is fine as well
+    eq_(annex.drop(files[:1])[files[0]][0], True)
+
+
 @with_tree(**tree1args)
 @serve_path_via_http()
 def test_AnnexRepo_backend_option(path, url):
@@ -815,3 +833,27 @@ def test_annex_backends(path):
     # persists
     repo = AnnexRepo(path)
     eq_(repo.default_backends, ['MD5E'])
+
+
+@with_tree(tree={'ingit': 'git', 'inannex': 'annex'})
+def test_AnnexRepo_add_defer(path):
+    repo = AnnexRepo(path, create=True)
+    repo.git_add('ingit', defer=True)
+    # annex commands see deferred additions
+    repo.annex_add('inannex')
+    eq_(sorted(repo.get_indexed_files()), ['inannex', 'ingit'])
+    ok_file_under_git(path, 'ingit', annexed=False)
+    ok_file_under_git(path, 'inannex', annexed=True)
+
+
+def test_BatchedAnnexes_for_path():
+    from ..support.annexrepo import BatchedAnnexes
+    b = BatchedAnnexes.for_path('/some/path')
+    ok_(BatchedAnnexes.for_path('/some/path') is b)
+    ok_(BatchedAnnexes.for_path('/some/path', batch_size=10) is not b)
+    ok_(BatchedAnnexes.for_path('/other/path') is not b)
+    key = ('/some/path', 0)
+    assert_in(key, BatchedAnnexes._registry)
+    del b
+    gc.collect()
+    assert_not_in(key, BatchedAnnexes._registry)
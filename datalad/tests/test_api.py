@@ -23,3 +23,13 @@ def test_basic_setup():
     # make sure all helper utilities do not pollute the namespace
     # and we end up only with __...__ attributes
     assert_false(list(filter(lambda s: s.startswith('_') and not re.match('__.*__', s), dir(api))))
+
+
+def test_lazy_access():
+    from datalad import api
+    assert_true('publish' in api.__all__)
+    assert_true('publish' in dir(api))
+    # docstrings get generated upon access
+    assert_true('Parameters' in api.publish.__doc__)
+    assert_true(hasattr(api.Dataset('/nonexistent'), 'update'))
+    assert_false(hasattr(api, 'nonexistent_command'))
@@ -17,6 +17,7 @@ from .utils import assert_equal
 
 from ..support.archives import decompress_file, compress_files, unixify_path
 from ..support.archives import ExtractedArchive, ArchivesCache
+from ..support.archives import extract_file
 
 from .utils import get_most_obscure_supported_name, assert_raises
 from .utils import assert_in
@@ -130,6 +131,19 @@ def test_ExtractedArchive(path):
     if not os.environ.get('DATALAD_TESTS_KEEPTEMP'):
         assert_false(exists(earchive.path))
 
+@with_tree(**tree_simplearchive)
+def test_extract_file(path):
+    archive = opj(path, fn_archive_obscure_ext)
+    target = opj(path, 'extracted')
+    assert_true(extract_file(archive, opj(fn_archive_obscure, '3.txt'), target))
+    with open(target) as f:
+        eq_(f.read(), '3 load')
+    assert_false(extract_file(archive, 'absent', target))
+    # not an archive we know how to handle
+    assert_false(extract_file(target, '3.txt', target + '2'))
+    assert_false(exists(target + '2'))
+
+
 #@with_tree(**tree_simplearchive)
 #@with_tree(**tree_simplearchive)
 def test_ArchivesCache():
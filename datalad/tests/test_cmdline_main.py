@@ -8,6 +8,7 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 """Test functioning of the datalad main cmdline utility """
 
+import os
 import re
 import sys
 from six.moves import StringIO
@@ -16,6 +17,7 @@ from mock import patch
 import datalad
 from ..cmdline.main import main
 from .utils import assert_equal, ok_, assert_raises, in_, ok_startswith
+from .utils import with_tempfile
 
 def run_main(args, exit_code=0, expect_stderr=False):
     """Run main() of the datalad, do basic checks and provide outputs
@@ -87,3 +89,47 @@ def test_help_np():
 def test_usage_on_insufficient_args():
     stdout, stderr = run_main(['install'], exit_code=1)
     ok_startswith(stdout, 'usage:')
+
+
+def test_setup_parser_only_requested_command():
+    from ..cmdline.main import setup_parser
+
+    def get_commands(args):
+        parser = setup_parser(args)
+        return set(parser._subparsers._group_actions[0].choices)
+
+    all_commands = get_commands(None)
+    assert_equal(get_commands([]), all_commands)
+    assert_equal(get_commands(['--help']), all_commands)
+    assert_equal(get_commands(['unknown-command']), all_commands)
+    assert_equal(get_commands(['ls']), {'ls'})
+    # option values are not mistaken for a command
+    assert_equal(get_commands(['-C', 'install', '-l', 'debug', 'ls', '-r']),
+                 {'ls'})
+
+
+@with_tempfile(mkdir=True)
+def test_profile(tdir):
+    from ..cmdline.main import _expand_profile_arg, setup_parser
+    cmd_names = ['ls', 'crawl']
+    assert_equal(_expand_profile_arg(['--profile', 'ls'], cmd_names),
+                 ['--profile=cprofile', 'ls'])
+    assert_equal(_expand_profile_arg(['--profile', 'sampling', 'ls'], cmd_names),
+                 ['--profile', 'sampling', 'ls'])
+    # options of the command are not touched
+    assert_equal(_expand_profile_arg(['ls', '--profile'], cmd_names),
+                 ['ls', '--profile'])
+    assert_equal(
+        _expand_profile_arg(['--profile', 'crawl', '--profile'], cmd_names),
+        ['--profile=cprofile', 'crawl', '--profile'])
+    # so crawl --profile still parses
+    args = setup_parser(['crawl', '--profile']).parse_args(['crawl', '--profile'])
+    ok_(args.profile)
+    assert_equal(args.common_profile, None)
+
+    with patch.dict('os.environ', {'DATALAD_PROFILE_PREFIX': tdir + '/prof'}):
+        run_main(['--profile', 'install'], exit_code=1)
+    # profile is stored even if command failed
+    files = os.listdir(tdir)
+    assert_equal(len(files), 1)
+    ok_(files[0].endswith('.pstats'))
@@ -10,6 +10,8 @@
 
 """
 
+import gc
+import logging
 import os
 from os.path import join as opj, exists, realpath, curdir, pardir
 
@@ -29,6 +31,7 @@ from .utils import swallow_logs
 from .utils import local_testrepo_flavors
 from .utils import skip_if_no_network
 from .utils import assert_re_in
+from .utils import assert_not_in
 from .utils import ok_
 from .utils import SkipTest
 from .utils_testrepos import BasicAnnexTestRepo
@@ -311,6 +314,21 @@ def test_GitRepo_remote_remove(orig_path, path):
     assert_in('origin', out)
 
 
+@with_tempfile
+@with_tempfile
+def test_GitRepo_ls_remote(orig_path, path):
+
+    orig = GitRepo(orig_path, create=True)
+    with open(opj(orig_path, 'file.txt'), 'w') as f:
+        f.write("content")
+    orig.git_add('file.txt')
+    orig.git_commit("committing")
+    gr = GitRepo(path, orig_path)
+    refs = gr.git_ls_remote('origin')
+    eq_(refs['refs/heads/master'], orig.git_get_hexsha('master'))
+    assert_in('HEAD', refs)
+
+
 @with_testrepos(flavors=local_testrepo_flavors)
 @with_tempfile
 def test_GitRepo_remote_show(orig_path, path):
@@ -575,3 +593,157 @@ def test_GitRepo_git_get_branch_commits(src):
 # TODO:
 #   def git_fetch(self, name, options=''):
 
+
+
+@with_tempfile(mkdir=True)
+def test_GitRepo_flyweight(path):
+    import gc
+    repo = GitRepo(path, create=True)
+    # the same instance while nothing has changed
+    ok_(GitRepo(path) is repo)
+    ok_(GitRepo(path, create=False) is repo)
+    # but not if asked for something special
+    ok_(GitRepo(path, runner=Runner()) is not repo)
+
+    with open(opj(path, 'file.txt'), 'w') as f:
+        f.write("content")
+    repo.git_add('file.txt')
+    # index was modified
+    repo2 = GitRepo(path)
+    ok_(repo2 is not repo)
+    ok_(GitRepo(path) is repo2)
+
+    # only weak references are kept
+    from ..support.gitrepo import FlyweightRepo
+    key = (GitRepo, repo2.path)
+    assert_in(key, FlyweightRepo._registry)
+    del repo, repo2
+    gc.collect()
+    assert_not_in(key, FlyweightRepo._registry)
+
+
+@with_tempfile(mkdir=True)
+def test_GitRepo_config(path):
+    repo = GitRepo(path, create=True)
+    config = repo.config
+    ok_(repo.config is config)
+    eq_(config.get('datalad', 'some'), None)
+    eq_(config.get('datalad', 'some', default='def'), 'def')
+    eq_(config.getbool('core', 'bare'), False)
+    reader = config.reader
+    # no re-reading if nothing has changed
+    ok_(config.reader is reader)
+
+    writer = repo.repo.config_writer()
+    writer.set_value('datalad', 'some', 'value')
+    writer.set_value('datalad', 'flag', 'yes')
+    writer.set_value('datalad', 'number', '10')
+    writer.release()
+
+    eq_(config.get('datalad', 'some'), 'value')
+    eq_(config.getbool('datalad', 'flag'), True)
+    eq_(config.getint('datalad', 'number'), 10)
+    eq_(config.get('datalad', 'number'), '10')
+    ok_(config.reader is not reader)
+
+
+@with_tree(tree={'committed': 'c',
+                 'modified': 'm',
+                 'removed': 'r',
+                 'sub': {'staged': 's', 'untracked': 'u'}})
+def test_GitRepo_get_status(path):
+    repo = GitRepo(path, create=True)
+    repo.git_add(['committed', 'modified', 'removed'])
+    repo.git_commit("initial")
+    with open(opj(path, 'modified'), 'a') as f:
+        f.write('+')
+    os.unlink(opj(path, 'removed'))
+    repo.git_add([opj('sub', 'staged')])
+
+    status = repo.get_status(untracked='all')
+    eq_(status.staged, [opj('sub', 'staged')])
+    eq_(status.notstaged, ['modified'])
+    eq_(status.untracked, [opj('sub', 'untracked')])
+    eq_(status.deleted, ['removed'])
+    # changes to the work tree alone are reflected
+    with open(opj(path, 'new'), 'w') as f:
+        f.write('n')
+    status = repo.get_status(untracked='all')
+    eq_(sorted(status.untracked), ['new', opj('sub', 'untracked')])
+    os.unlink(opj(path, 'new'))
+    eq_(repo.get_status(untracked='all').untracked, [opj('sub', 'untracked')])
+
+    # limited to the paths
+    eq_(repo.get_status(['sub'], untracked='all'),
+        ([opj('sub', 'staged')], [], [opj('sub', 'untracked')], []))
+    eq_(repo.get_status(['committed']), ([], [], [], []))
+
+    # cached status is reused until the index changes
+    status = repo.get_status(['modified'], cached=True)
+    eq_(status.notstaged, ['modified'])
+    ok_(repo.get_status(['modified'], cached=True) is status)
+    ok_(repo.get_status(['modified']) is not status)
+    repo.git_add(['modified'])
+    status = repo.get_status(['modified'], cached=True)
+    eq_(status.staged, ['modified'])
+    eq_(status.notstaged, [])
+
+
+@with_tree(tree={'f1': '1', 'f2': '2', 'd': {'f3': '3'}})
+def test_GitRepo_add_defer(path):
+    repo = GitRepo(path, create=True)
+    repo.git_add('f1', defer=True)
+    repo.git_add(['f2'], defer=True)
+    # nothing staged yet
+    eq_(repo.repo.git.ls_files(), '')
+    # but would be as soon as we look
+    eq_(sorted(repo.get_status().staged), ['f1', 'f2'])
+    eq_(sorted(repo.get_indexed_files()), ['f1', 'f2'])
+
+    # directories are added entirely
+    repo.git_add('d')
+    eq_(sorted(repo.get_indexed_files()), [opj('d', 'f3'), 'f1', 'f2'])
+
+
+@with_tree(tree={'f1': '1', 'f2': '2', 'f3': '3'})
+def test_GitRepo_add_defer_flushed(path):
+    repo = GitRepo(path, create=True)
+    repo.git_add('f1', defer=True)
+    eq_(repo.get_indexed_files(), ['f1'])
+    repo.git_add(['f2'], defer=True)
+    # forced, since there is no commit yet
+    repo.git_remove('f1', f=True)
+    eq_(repo.get_indexed_files(), ['f2'])
+    # not lost if the instance goes away
+    repo.git_add(['f3'], defer=True)
+    with swallow_logs(new_level=logging.WARNING) as cml:
+        del repo
+        gc.collect()
+        assert_in('deferred additions', cml.out)
+    eq_(sorted(GitRepo(path).get_indexed_files()), ['f2', 'f3'])
+
+
+@with_tree(tree={'f1': 'line1\nline2\n', 'd': {'f2': 'content2'}})
+def test_GitRepo_object_reader(path):
+    repo = GitRepo(path, create=True)
+    repo.git_add(['f1', opj('d', 'f2')])
+    repo.git_commit("added")
+    reader = repo.object_reader
+    ok_(repo.object_reader is reader)
+    eq_(reader.read('HEAD:f1'), b'line1\nline2\n')
+    eq_(reader.read('HEAD:d/f2'), b'content2')
+    assert_raises(KeyError, reader.read, 'HEAD:nonexistent')
+    assert_raises(KeyError, reader.read, 'HEAD:no such')
+    # process stays usable after a miss
+    eq_(reader.read('HEAD:f1'), b'line1\nline2\n')
+    eq_(repo.git_get_file_content('f1'), ['line1', 'line2'])
+
+    repo.git_checkout('other', '-b')
+    eq_(sorted(repo.git_get_files('other')), [opj('d', 'f2'), 'f1'])
+    eq_(sorted(reader.iter_files('master')), [opj('d', 'f2'), 'f1'])
+    # consumer could stop early
+    files = reader.iter_files('master')
+    next(files)
+    files.close()
+    reader.close()
+    eq_(reader.read('master:d/f2'), b'content2')
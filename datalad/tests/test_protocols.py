@@ -12,6 +12,7 @@ Note: DryRunProtocol and NullProtocol are already (kind of) tested within
       test_cmd.py
 """
 
+import json
 import os
 from os.path import normpath
 from nose.tools import ok_, eq_, assert_is, assert_equal, assert_greater, \
@@ -20,6 +21,9 @@ from nose.tools import ok_, eq_, assert_is, assert_equal, assert_greater, \
 from ..support.protocol import DryRunProtocol, DryRunExternalsProtocol, \
     NullProtocol, ExecutionTimeProtocol, ExecutionTimeExternalsProtocol, \
     ProtocolInterface
+from ..support.protocol import TracingProtocol, get_command_type, \
+    summarize_trace
+from ..support.exceptions import CommandError
 from ..support.gitrepo import GitRepo
 from ..cmd import Runner
 from .utils import with_tempfile
@@ -31,7 +35,8 @@ def test_protocol_commons(protocol_file):
 
     for protocol_class in [DryRunProtocol, DryRunExternalsProtocol,
                            ExecutionTimeProtocol,
-                           ExecutionTimeExternalsProtocol, NullProtocol]:
+                           ExecutionTimeExternalsProtocol, NullProtocol,
+                           TracingProtocol]:
         protocol = protocol_class()
         assert_is_instance(protocol, ProtocolInterface)
         assert_equal(len(protocol), 0)
@@ -49,6 +54,10 @@ def test_protocol_commons(protocol_file):
         for item in range(len(protocol)):
             assert_is_instance(protocol.__getitem__(item), dict)
 
+        if protocol_class is TracingProtocol:
+            # written as JSON lines
+            continue
+
         # test __str__:
         str_ = str(protocol)
 
@@ -146,6 +155,49 @@ def test_ExecutionTimeExternalsProtocol(path1, path2):
     assert_equal(len(timer_protocol), 2)
 
 
+@with_tempfile(mkdir=True)
+@with_tempfile
+def test_TracingProtocol(path, trace_file):
+
+    protocol = TracingProtocol(trace_file)
+    runner = Runner(cwd=path, protocol=protocol)
+    runner.run(['git', 'init'])
+    with swallow_logs():
+        assert_raises(CommandError, runner.run, ['git', 'nonexisting'],
+                      expect_fail=True)
+    assert_equal(len(protocol), 2)
+    # nothing is kept in memory
+    assert_equal(list(protocol), [])
+
+    with open(trace_file) as f:
+        sections = [json.loads(l) for l in f]
+    assert_equal(len(sections), 2)
+    init, failed = sections
+    assert_equal(init['command'], ['git', 'init'])
+    assert_equal(init['cwd'], path)
+    assert_equal(init['status'], 0)
+    assert_greater(init['stdout'], 0)
+    assert_equal(init['exception'], None)
+    ok_(init['duration'] >= 0)
+    assert_in('test_TracingProtocol', init['caller'])
+    assert_equal(failed['status'], 1)
+    assert_in('CommandError', failed['exception'])
+
+    summary = summarize_trace(trace_file)
+    assert_equal(sorted(s[0] for s in summary), ['git init', 'git nonexisting'])
+    assert_equal(summary[0][1], 1)
+    assert_equal(len(summarize_trace(sections, top=1)), 1)
+
+
+def test_get_command_type():
+    assert_equal(get_command_type(['git', '-c', 'a=b', 'annex', '--debug', 'add', 'x']),
+                 'git annex add')
+    assert_equal(get_command_type(['/usr/bin/git', '-C', 'path', 'commit', '-m', 'msg']),
+                 'git commit')
+    assert_equal(get_command_type('ls -l dir'), 'ls dir')
+    assert_equal(get_command_type([]), '')
+
+
 @with_tempfile
 def test_DryRunProtocol(path):
 
@@ -182,4 +234,15 @@ def test_DryRunExternalsProtocol(path):
     git_repo = GitRepo(path, runner=runner)
     assert_true(os.path.exists(path))
     assert_true(os.path.exists(os.path.join(path, '.git')))
-    assert_equal(len(protocol), 1)
\ No newline at end of file
+    assert_equal(len(protocol), 1)
+
+def test_ExecutionTimeProtocol_interrupted():
+    from mock import patch
+    timer_protocol = ExecutionTimeProtocol()
+    runner = Runner(protocol=timer_protocol)
+    # section gets closed even if we got interrupted while waiting
+    with patch('datalad.cmd.profiling.wait', side_effect=KeyboardInterrupt):
+        assert_raises(KeyboardInterrupt, runner.run, ['git', '--version'])
+    assert_equal(len(timer_protocol), 1)
+    ok_(timer_protocol[0]['end'] >= timer_protocol[0]['start'])
+    assert_is_instance(timer_protocol[0]['exception'], KeyboardInterrupt)
@@ -9,13 +9,21 @@
 """Tests for test repositories
 
 """
-from os.path import join as pathjoin
+import os
+import stat
+from os.path import join as pathjoin, exists, realpath
 
 from .utils_testrepos import BasicAnnexTestRepo, BasicGitTestRepo
+from .utils_testrepos import TestReposTemplates
 from .utils import with_tempfile, assert_true, ok_clean_git, \
     ok_clean_git_annex_proxy, eq_
 from .utils import ok_file_under_git, ok_broken_symlink, ok_good_symlink
 from .utils import swallow_outputs
+from .utils import assert_false
+from .utils import assert_raises
+from .utils import assert_in
+from .utils import assert_not_equal
+from ..utils import get_local_file_url
 from .utils import on_windows
 from .utils import SkipTest
 
@@ -39,6 +47,11 @@ def _test_BasicAnnexTestRepo(repodir):
         trepo.repo.annex_get('test-annex.dat')
     if not trepo.repo.is_crippled_fs():
         ok_good_symlink(pathjoin(trepo.path, 'test-annex.dat'))
+    # content comes from this very repository
+    whereis = trepo.repo.annex_whereis(['test-annex.dat'], output='full')
+    assert_in(get_local_file_url(realpath(pathjoin(trepo.path, 'test.dat'))),
+              [url for remote in whereis['test-annex.dat'].values()
+               for url in remote.get('urls', [])])
 
 
 # Use of @with_tempfile() apparently is not friendly to test generators yet
@@ -59,3 +72,74 @@ def test_BasicGitTestRepo(path):
     ok_clean_git(trepo.path, annex=False)
     ok_file_under_git(trepo.path, 'test.dat')
     ok_file_under_git(trepo.path, 'INFO.txt')
+
+
+@with_tempfile()
+@with_tempfile()
+@with_tempfile()
+def test_TestReposTemplates(tdir, sdir, path):
+    templates = TestReposTemplates(tdir, session_path=sdir)
+    template = templates.get_template(BasicGitTestRepo)
+    ok_clean_git(template, annex=False)
+    # persistent template could not be modified
+    for p in template, pathjoin(template, 'test.dat'):
+        assert_false(os.stat(p).st_mode & stat.S_IWRITE)
+    mtime = os.stat(template).st_mtime
+    # built only once
+    eq_(templates.get_template(BasicGitTestRepo), template)
+    eq_(os.stat(template).st_mtime, mtime)
+
+    templates.copy(BasicGitTestRepo, path)
+    ok_clean_git(path, annex=False)
+    ok_file_under_git(path, 'test.dat')
+    # modifications do not affect the template
+    with open(pathjoin(path, 'test.dat'), 'w') as f:
+        f.write('changed')
+    with open(pathjoin(template, 'test.dat')) as f:
+        eq_(f.read(), '123\n')
+    ok_clean_git(template, annex=False)
+
+    # submodules get cloned from a copy made for the session
+    source = templates.get_source(BasicGitTestRepo)
+    eq_(source, pathjoin(sdir, 'sources', 'BasicGitTestRepo'))
+    ok_clean_git(source, annex=False)
+    eq_(templates.get_source(BasicGitTestRepo), source)
+
+    # templates referring to other repositories are built for the session
+    class SessionGitTestRepo(BasicGitTestRepo):
+        PERSISTENT_TEMPLATE = False
+    eq_(templates.get_template(SessionGitTestRepo),
+        pathjoin(sdir, 'SessionGitTestRepo'))
+
+    # failed builds leave nothing behind
+    class FailingGitTestRepo(BasicGitTestRepo):
+        def populate(self):
+            super(FailingGitTestRepo, self).populate()
+            raise RuntimeError("failed")
+    assert_raises(RuntimeError, templates.get_template, FailingGitTestRepo)
+    eq_(os.listdir(templates.path), ['BasicGitTestRepo'])
+
+
+@with_tempfile()
+@with_tempfile()
+def test_TestReposTemplates_annex(tdir, path):
+    templates = TestReposTemplates(tdir, session_path=tdir)
+    templates.copy(BasicAnnexTestRepo, path)
+    # copy is an annex of its own
+    template_repo = BasicAnnexTestRepo(
+        templates.get_template(BasicAnnexTestRepo), puke_if_exists=False).repo
+    copy_repo = BasicAnnexTestRepo(path, puke_if_exists=False).repo
+    assert_not_equal(copy_repo.repo.config_reader().get_value('annex', 'uuid'),
+                     template_repo.repo.config_reader().get_value('annex', 'uuid'))
+
+
+@with_tempfile()
+def test_TestRepo_create_failed(path):
+    class FailingGitTestRepo(BasicGitTestRepo):
+        def populate(self):
+            super(FailingGitTestRepo, self).populate()
+            raise RuntimeError("failed")
+    trepo = FailingGitTestRepo(path)
+    with swallow_outputs():
+        assert_raises(RuntimeError, trepo.create)
+    assert_false(exists(path))
@@ -571,7 +571,7 @@ def _get_testrepos_uris(regex, flavors):
         _submodule_annex_test_repo = SubmoduleDataset()
         _nested_submodule_annex_test_repo = NestedDataset()
         _inner_submodule_annex_test_repo = InnerSubmodule()
-        _TESTREPOS = {'basic_annex':
+        testrepos = {'basic_annex':
                         {'network': 'git://github.com/datalad/testrepo--basic--r1',
                          'local': _basic_annex_test_repo.path,
                          'local-url': _basic_annex_test_repo.url},
@@ -600,6 +600,9 @@ def _get_testrepos_uris(regex, flavors):
             _submodule_annex_test_repo.create()
             _nested_submodule_annex_test_repo.create()
             _inner_submodule_annex_test_repo.create()
+        # only now, so failed creation would be retried (and fail) next time
+        # instead of pointing to the repositories which do not exist
+        _TESTREPOS = testrepos
     uris = []
     for name, spec in iteritems(_TESTREPOS):
         if not re.match(regex, name):
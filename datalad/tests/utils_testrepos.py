@@ -7,27 +7,234 @@
 #
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
+import hashlib
+import inspect
+import os
+import shutil
+import stat
+import sys
 import tempfile
 
 from abc import ABCMeta, abstractmethod
-from os.path import dirname, join as opj, exists, pardir, realpath
+from os.path import dirname, join as opj, exists, lexists, pardir, realpath
+from os.path import abspath, normpath, islink, isdir, relpath
 
+from .. import cfg
 from ..support.gitrepo import GitRepo
 from ..support.annexrepo import AnnexRepo
 from ..cmd import Runner
+from ..dochelpers import exc_str
+from ..support.exceptions import CommandError
 from ..utils import get_local_file_url
+from ..utils import rmtree
+from ..utils import rotree
 from ..utils import swallow_outputs
 from ..utils import swallow_logs
 
 from ..version import __version__
 from . import _TEMP_PATHS_GENERATED
 
+from logging import getLogger
+lgr = getLogger('datalad.tests.testrepos')
+
+
+def _is_immutable(path):
+    """Either the file (relative path) is an object of git or git-annex
+
+    Those never get modified in place, so could be shared among copies of a
+    repository
+    """
+    parts = path.split(os.sep)
+    return '.git' in parts and 'objects' in parts[parts.index('.git'):]
+
+
+def copy_repo_tree(src, dst):
+    """Copy a repository tree, hardlinking objects of git and git-annex
+
+    All other files (config, index, work tree, ...) are copied, and made
+    writable, so the copy could be modified without affecting the original
+    (which might be read-only).  If hardlinking is not possible (e.g. `dst`
+    is on another file system), objects get copied as well
+    """
+    def copy(spath, dpath):
+        shutil.copy2(spath, dpath)
+        os.chmod(dpath, os.stat(dpath).st_mode | stat.S_IWUSR)
+
+    link = hasattr(os, 'link')
+    for root, dirs, files in os.walk(src):
+        droot = opj(dst, relpath(root, src))
+        if not exists(droot):
+            os.makedirs(droot)
+        for name in dirs + files:
+            spath, dpath = opj(root, name), opj(droot, name)
+            if islink(spath):
+                os.symlink(os.readlink(spath), dpath)
+            elif isdir(spath):
+                continue
+            elif link and _is_immutable(relpath(spath, src)):
+                try:
+                    os.link(spath, dpath)
+                except OSError:
+                    link = False
+                    shutil.copy2(spath, dpath)
+            else:
+                copy(spath, dpath)
+        # do not descend into symlinked directories
+        dirs[:] = [d for d in dirs if not islink(opj(root, d))]
+
+
+def reinit_annexes(path):
+    """Give the annexes of a copied repository (and its submodules) new UUIDs
+
+    Otherwise all copies of a repository would be the same annex as far as
+    git-annex is concerned
+    """
+    runner = Runner(cwd=path)
+    out, _ = runner.run(
+        ["git", "submodule", "--quiet", "foreach", "--recursive", "pwd"],
+        expect_stderr=True)
+    for repo_path in [path] + out.splitlines():
+        try:
+            runner.run(["git", "config", "--unset", "annex.uuid"],
+                       cwd=repo_path, expect_fail=True)
+        except CommandError:
+            # not an annex
+            continue
+        runner.run(["git", "annex", "init"], cwd=repo_path, expect_stderr=True)
+
+
+def _get_tools_versions():
+    versions = []
+    for cmd in (["git", "--version"], ["git", "annex", "version"]):
+        try:
+            versions.append(Runner().run(
+                cmd, expect_fail=True, expect_stderr=True)[0].split('\n')[0])
+        except Exception as exc:
+            versions.append(exc_str(exc))
+    return versions
+
+
+class TestReposTemplates(object):
+    """Test repositories built once and then copied for every use
+
+    Templates are built under a directory specific to the versions of
+    datalad, git, git-annex and of this module, so they are reused across
+    test sessions (and benchmark runs) until any of those changes.  Those
+    templates are made read-only, so nothing could modify them.  Templates
+    are built aside and then renamed into place, so concurrent sessions
+    never see a partially built one.  Copies are made with `copy_repo_tree`,
+    so are cheap, and then adjusted (see `TestRepo.adjust_copy`), e.g. to
+    get annex UUIDs of their own.
+
+    Submodules of the test repositories get cloned from copies made once per
+    session (see `get_source`), so pushes etc into them do not affect the
+    templates.  Templates of such repositories (see
+    `TestRepo.PERSISTENT_TEMPLATE`) are thus built once per session as well.
+    """
+
+    def __init__(self, path=None, session_path=None):
+        """
+        Parameters
+        ----------
+        path : str, optional
+          Directory to keep templates under.  By default, the one specified
+          by DATALAD_TESTS_TEMPLATES_DIR environment variable or within the
+          user cache directory
+        session_path : str, optional
+          Directory to keep templates and sources of this session under.  By
+          default, a temporary directory removed upon teardown
+        """
+        if path is None:
+            path = os.environ.get('DATALAD_TESTS_TEMPLATES_DIR') \
+                or opj(cfg.dirs.user_cache_dir, 'testrepos')
+        key = hashlib.md5(
+            '\n'.join([__version__, inspect.getsource(sys.modules[__name__])]
+                      + _get_tools_versions()).encode('utf-8')).hexdigest()
+        self.path = opj(path, key[:12])
+        self._session_path = session_path
+
+    @property
+    def session_path(self):
+        if self._session_path is None:
+            from .utils import get_tempfile_kwargs
+            self._session_path = tempfile.mkdtemp(
+                **get_tempfile_kwargs({}, prefix='testrepos'))
+            # to be removed upon teardown
+            _TEMP_PATHS_GENERATED.append(self._session_path)
+        return self._session_path
+
+    def get_template(self, cls):
+        """Return path to the template of the test repository class
+
+        Template gets built if it was not yet
+        """
+        persistent = cls.PERSISTENT_TEMPLATE
+        topdir = self.path if persistent else self.session_path
+        path = opj(topdir, cls.__name__)
+        if exists(path):
+            return path
+        if not exists(topdir):
+            os.makedirs(topdir)
+        build_path = tempfile.mkdtemp(dir=topdir, prefix=cls.__name__ + '.build-')
+        lgr.info("Building template of %s under %s", cls.__name__, build_path)
+        try:
+            trepo = cls(build_path, puke_if_exists=False)
+            with swallow_outputs():
+                trepo.populate()
+            if persistent:
+                rotree(build_path)
+            try:
+                os.rename(build_path, path)
+            except OSError:
+                if not exists(path):
+                    raise
+                lgr.debug("Template of %s was built by another session",
+                          cls.__name__)
+        finally:
+            if lexists(build_path):
+                rmtree(build_path)
+        return path
+
+    def copy(self, cls, path):
+        """Copy the template of the test repository class into path"""
+        copy_repo_tree(self.get_template(cls), path)
+        cls(path, puke_if_exists=False).adjust_copy()
+
+    def get_source(self, cls):
+        """Return path to the repository of the class to clone submodules from
+
+        It is a copy of the template, made once per session
+        """
+        path = opj(self.session_path, 'sources', cls.__name__)
+        if not exists(path):
+            self.copy(cls, path)
+        return path
+
+
+_TEMPLATES = None
+
+
+def get_testrepos_templates():
+    """Return templates of test repositories, or None if disabled
+
+    Disabled if DATALAD_TESTS_NOTEMPLATES environment variable is set
+    """
+    global _TEMPLATES
+    if os.environ.get('DATALAD_TESTS_NOTEMPLATES'):
+        return None
+    if _TEMPLATES is None:
+        _TEMPLATES = TestReposTemplates()
+    return _TEMPLATES
+
 
 class TestRepo(object):
 
     __metaclass__ = ABCMeta
 
     REPO_CLASS = None # Assign to the class to be used in the subclass
+    # Either the template could persist across sessions.  Not the case if
+    # populate() refers to other repositories of the session
+    PERSISTENT_TEMPLATE = True
 
     def __init__(self, path=None, puke_if_exists=True):
         if not path:
@@ -37,35 +244,70 @@ class TestRepo(object):
             _TEMP_PATHS_GENERATED.append(path)
         if puke_if_exists and exists(path):
             raise RuntimeError("Directory %s for test repo already exist" % path)
-        # swallow logs so we don't print all those about crippled FS etc
-        with swallow_logs():
-            self.repo = self.REPO_CLASS(path)
-        self.runner = Runner(cwd=self.repo.path)
+        self._path = abspath(normpath(path))
+        self._repo = None
+        self.runner = Runner(cwd=self._path)
         self._created = False
 
+    @property
+    def repo(self):
+        # instantiated upon first use, so the repository could be copied from
+        # the template instead of being initialized
+        if self._repo is None:
+            # swallow logs so we don't print all those about crippled FS etc
+            with swallow_logs():
+                self._repo = self.REPO_CLASS(self._path)
+        return self._repo
+
     @property
     def path(self):
-        return self.repo.path
+        return self._path
 
     @property
     def url(self):
         return get_local_file_url(self.path)
 
     def create_file(self, name, content, add=True, annex=False):
+        repo = self.repo  # initializes the repository if not yet
         filename = opj(self.path, name)
         with open(filename, 'wb') as f:
             f.write(content.encode())
         if add:
-            (self.repo.annex_add if annex else self.repo.git_add)(name)
+            (repo.annex_add if annex else repo.git_add)(name)
 
     def create(self):
         if self._created:
             assert(exists(self.path))
             return  # was already done
-        with swallow_outputs():  # we don't need those outputs at this point
-            self.populate()
+        templates = get_testrepos_templates()
+        try:
+            if templates is not None and self._repo is None:
+                templates.copy(self.__class__, self.path)
+            else:
+                with swallow_outputs():  # we don't need those outputs at this point
+                    self.populate()
+        except Exception:
+            # do not leave a partial repository behind, so it could be retried
+            self._repo = None
+            if lexists(self.path):
+                rmtree(self.path)
+            raise
         self._created = True
 
+    def adjust_copy(self):
+        """Adjust the repository copied from the template to be a repository of its own"""
+        reinit_annexes(self.path)
+
+    @staticmethod
+    def get_source_url(repo_cls):
+        """Return URL of a test repository of repo_cls to add as a submodule"""
+        templates = get_testrepos_templates()
+        if templates is not None:
+            return get_local_file_url(templates.get_source(repo_cls))
+        trepo = repo_cls()
+        trepo.create()
+        return trepo.url
+
     @abstractmethod
     def populate(self):
         raise NotImplementedError("Should be implemented in sub-classes")
@@ -80,15 +322,32 @@ class BasicAnnexTestRepo(TestRepo):
         self.create_info_file()
         self.create_file('test.dat', '123\n', annex=False)
         self.repo.git_commit("Adding a basic INFO file and rudimentary load file for annex testing")
-        # even this doesn't work on bloody Windows
-        from .utils import on_windows
-        fileurl = get_local_file_url(realpath(opj(self.path, 'test.dat'))) \
-                  if not on_windows \
-                  else "https://raw.githubusercontent.com/datalad/testrepo--basic--r1/master/test.dat"
-        self.repo.annex_addurl_to_file("test-annex.dat", fileurl)
+        self.repo.annex_addurl_to_file("test-annex.dat", self._get_load_file_url())
         self.repo.git_commit("Adding a rudimentary git-annex load file")
         self.repo.annex_drop("test-annex.dat")  # since available from URL
 
+    def _get_load_file_url(self):
+        # even this doesn't work on bloody Windows
+        from .utils import on_windows
+        return get_local_file_url(realpath(opj(self.path, 'test.dat'))) \
+            if not on_windows \
+            else "https://raw.githubusercontent.com/datalad/testrepo--basic--r1/master/test.dat"
+
+    def adjust_copy(self):
+        super(BasicAnnexTestRepo, self).adjust_copy()
+        # load file should come from test.dat of this copy, not of the
+        # template (which was built elsewhere)
+        fileurl = self._get_load_file_url()
+        if not fileurl.startswith('file:'):
+            return
+        whereis = self.repo.annex_whereis(['test-annex.dat'], output='full')
+        for remote in whereis['test-annex.dat'].values():
+            for url in remote.get('urls', []):
+                if url.startswith('file:') and url != fileurl:
+                    self.repo.annex_rmurl('test-annex.dat', url)
+        self.repo.annex_addurl_to_file(
+            'test-annex.dat', fileurl, options=['--relaxed'])
+
     def create_info_file(self):
         runner = Runner()
         annex_version = runner.run("git annex version")[0].split()[2]
@@ -124,17 +383,18 @@ class BasicGitTestRepo(TestRepo):
 
 class SubmoduleDataset(BasicAnnexTestRepo):
 
+    PERSISTENT_TEMPLATE = False
+
     def populate(self):
 
         super(SubmoduleDataset, self).populate()
         # add submodules
-        annex = BasicAnnexTestRepo()
-        annex.create()
+        url = self.get_source_url(BasicAnnexTestRepo)
         from datalad.cmd import Runner
         runner = Runner()
         kw = dict(cwd=self.path, expect_stderr=True)
-        runner.run(['git', 'submodule', 'add', annex.url, 'sub1'], **kw)
-        runner.run(['git', 'submodule', 'add', annex.url, 'sub2'], **kw)
+        runner.run(['git', 'submodule', 'add', url, 'sub1'], **kw)
+        runner.run(['git', 'submodule', 'add', url, 'sub2'], **kw)
         runner.run(['git', 'commit', '-m', 'Added sub1 and sub2.'], **kw)
         runner.run(['git', 'submodule', 'update', '--init', '--recursive'], **kw)
         # init annex in subdatasets
@@ -145,16 +405,17 @@ class SubmoduleDataset(BasicAnnexTestRepo):
 
 class NestedDataset(BasicAnnexTestRepo):
 
+    PERSISTENT_TEMPLATE = False
+
     def populate(self):
         super(NestedDataset, self).populate()
-        ds = SubmoduleDataset()
-        ds.create()
+        url = self.get_source_url(SubmoduleDataset)
         from datalad.cmd import Runner
         runner = Runner()
         kw = dict(expect_stderr=True)
-        runner.run(['git', 'submodule', 'add', ds.url, 'subdataset'],
+        runner.run(['git', 'submodule', 'add', url, 'subdataset'],
                    cwd=self.path, **kw)
-        runner.run(['git', 'submodule', 'add', ds.url, 'subsubdataset'],
+        runner.run(['git', 'submodule', 'add', url, 'subsubdataset'],
                    cwd=opj(self.path, 'subdataset'), **kw)
         runner.run(['git', 'commit', '-m', 'Added subdataset.'],
                    cwd=opj(self.path, 'subdataset'), **kw)